@@ -0,0 +1,65 @@
+import time
+from multiprocessing import Condition, Value, Array
+
+class RoundBarrier():
+    ## A reusable barrier shared by all vehicle processes.
+    ## The last process that arrives in a round bumps the generation counter
+    ## and wakes up all the others, so nobody has to poll.
+    def __init__(self, parties: int):
+        self.cond = Condition()
+        self.parties = Value('i', parties, lock=False) # processes that still take part
+        self.arrived = Value('i', 0, lock=False)
+        self.generation = Value('i', 0, lock=False)
+        self.first_arrival = Value('d', 0, lock=False)
+        self.arrival_times = Array('d', [0]*parties, lock=False) # when each process arrived in the current round
+        self.arrival_generations = Array('i', [-1]*parties, lock=False) # the round each process last arrived in
+        # statistics of the last released round, written by the release, before anybody goes on
+        self.last_straggler = Value('i', -1, lock=False)
+        self.last_spread = Value('d', 0, lock=False)
+        self.wait_times = Array('d', [0]*parties, lock=False)
+
+    def wait(self, pid: int) -> float:
+        ## block until every remaining process has arrived
+        ## return: the time (in seconds) this process waited
+        start = time.monotonic()
+        with self.cond:
+            generation = self.generation.value
+            if self.arrived.value == 0:
+                self.first_arrival.value = start
+            self.arrival_times[pid] = start
+            self.arrival_generations[pid] = generation
+            self.arrived.value += 1
+            if self.arrived.value >= self.parties.value:
+                self._release(pid, start)
+            else:
+                while self.generation.value == generation:
+                    self.cond.wait()
+        return time.monotonic() - start
+
+    def leave(self, pid: int):
+        ## a finished vehicle does not take part in the following rounds
+        ## (to be called instead of wait, by a process that has not arrived in the current round)
+        with self.cond:
+            self.parties.value -= 1
+            if self.arrived.value > 0 and self.arrived.value >= self.parties.value:
+                self._release(pid, time.monotonic())
+
+    def _release(self, pid: int, now: float):
+        # must be called with self.cond held
+        # the wait of every process of the round is recorded here, so that report() describes
+        # this round to any process once it is released (a process that left has waited 0)
+        generation = self.generation.value
+        for i in range(len(self.wait_times)):
+            arrived = self.arrival_generations[i] == generation
+            self.wait_times[i] = now - self.arrival_times[i] if arrived else 0
+        self.last_straggler.value = pid
+        self.last_spread.value = now - self.first_arrival.value
+        self.arrived.value = 0
+        self.generation.value += 1
+        self.cond.notify_all()
+
+    def report(self) -> str:
+        ## the statistics of the last released round (the waits until the release, the wake-up excluded)
+        return f"barrier released {round(self.last_spread.value,3)} seconds after the first arrival, " + \
+            f"straggler: pid {self.last_straggler.value}, " + \
+            f"max wait: {round(max(self.wait_times),3)} seconds"
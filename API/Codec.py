@@ -0,0 +1,151 @@
+import struct
+from typing import Dict, List, Set, Tuple
+
+## Binary wire format of the messages exchanged between vehicles.
+## Every message starts with a header (version, message type) followed by a
+## fixed-layout body; variable-length messages carry an entry count and an array
+## of fixed-size entries. Decoding reads the payload in place through a memoryview.
+WIRE_VERSION = 1
+
+MSG_STATE = 1
+MSG_SCHEDULE_MAP = 2
+MSG_PROPOSAL = 3
+MSG_SCORE = 4
+MSG_FINAL = 5
+MSG_FLEET_STATE = 6
+
+HEADER = struct.Struct("<BB")
+# lane_id, fleet_id, vehicle_id, location, velocity, acceleration, des_lane_id, finish
+STATE = struct.Struct("<iii6diB")
+# vehicle_id, location, velocity, acceleration, des_lane_id, finish
+VEH_STATE = struct.Struct("<i6diB")
+# sender lane_id, number of entries
+MAP_HEADER = struct.Struct("<iI")
+# lane_id, des_lane_id, fleet_id, fleet_length
+MAP_ENTRY = struct.Struct("<iiii")
+# sender lane_id, sender fleet_id, number of entries
+FLEET_HEADER = struct.Struct("<iiI")
+# lane_id, fleet_id, vehicle_id, 4 deadlines
+SLOT_ENTRY = struct.Struct("<iii4d")
+# lane_id, fleet_id, score
+SCORE_ENTRY = struct.Struct("<iid")
+# number of entries
+COUNT = struct.Struct("<I")
+
+
+def _header(msg_type: int) -> bytes:
+    return HEADER.pack(WIRE_VERSION, msg_type)
+
+def _body(payload, msg_type: int) -> memoryview:
+    buf = memoryview(payload)
+    version, rec_type = HEADER.unpack_from(buf, 0)
+    if version != WIRE_VERSION:
+        raise ValueError(f"unsupported wire format version {version}")
+    if rec_type != msg_type:
+        raise ValueError(f"expected message type {msg_type}, got {rec_type}")
+    return buf[HEADER.size:]
+
+def _entries(buf: memoryview, entry: struct.Struct, count: int):
+    return entry.iter_unpack(buf[:count*entry.size])
+
+
+def encode_state(lane_id: int, fleet_id: int, vehicle_id: int, location: Tuple,
+                 velocity: Tuple, acceleration: Tuple, des_lane_id: int, finish: bool) -> bytes:
+    return _header(MSG_STATE) + STATE.pack(lane_id, fleet_id, vehicle_id,
+        location[0], location[1], velocity[0], velocity[1],
+        acceleration[0], acceleration[1], des_lane_id, 1 if finish else 0)
+
+def decode_state(payload):
+    ## return: (lane_id, fleet_id, vehicle_id, state, finish)
+    r = STATE.unpack_from(_body(payload, MSG_STATE))
+    state = {
+        "location": (r[3], r[4]),
+        "velocity": (r[5], r[6]),
+        "acceleration": (r[7], r[8]),
+        "des_lane_id": r[9]
+    }
+    return r[0], r[1], r[2], state, r[10]
+
+
+def encode_fleet_state(lane_id: int, fleet_id: int, states: List[Tuple]) -> bytes:
+    ## the snapshot of a fleet, states: a list of (vehicle_id, state, finish)
+    ## (the state of a vehicle that has finished may be None)
+    entries = []
+    for vehicle_id, state, finish in states:
+        if state is None:
+            entries.append(VEH_STATE.pack(vehicle_id, 0, 0, 0, 0, 0, 0, -1, 1 if finish else 0))
+            continue
+        location, velocity, acceleration = state["location"], state["velocity"], state["acceleration"]
+        entries.append(VEH_STATE.pack(vehicle_id, location[0], location[1], velocity[0], velocity[1],
+            acceleration[0], acceleration[1], state["des_lane_id"], 1 if finish else 0))
+    return _header(MSG_FLEET_STATE) + FLEET_HEADER.pack(lane_id, fleet_id, len(entries)) + b"".join(entries)
+
+def decode_fleet_state(payload):
+    ## return: (lane_id, fleet_id, a list of (vehicle_id, state, finish))
+    buf = _body(payload, MSG_FLEET_STATE)
+    lane_id, fleet_id, count = FLEET_HEADER.unpack_from(buf)
+    states = []
+    for r in _entries(buf[FLEET_HEADER.size:], VEH_STATE, count):
+        state = {
+            "location": (r[1], r[2]),
+            "velocity": (r[3], r[4]),
+            "acceleration": (r[5], r[6]),
+            "des_lane_id": r[7]
+        }
+        states.append((r[0], state, r[8]))
+    return lane_id, fleet_id, states
+
+
+def encode_schedule_map(lane_id: int, schedule_map: Set[Tuple]) -> bytes:
+    ## schedule_map: a set of (lane_id, des_lane_id, fleet_id, fleet_length)
+    return _header(MSG_SCHEDULE_MAP) + MAP_HEADER.pack(lane_id, len(schedule_map)) + \
+        b"".join(MAP_ENTRY.pack(*fleet_info) for fleet_info in schedule_map)
+
+def decode_schedule_map(payload):
+    ## return: (sender lane_id, schedule_map)
+    buf = _body(payload, MSG_SCHEDULE_MAP)
+    lane_id, count = MAP_HEADER.unpack_from(buf)
+    return lane_id, set(_entries(buf[MAP_HEADER.size:], MAP_ENTRY, count))
+
+
+def _encode_slots(time_slot: Dict) -> bytes:
+    entries = []
+    for veh, deadlines in time_slot.items():
+        assert len(veh) == 3 and len(deadlines) == 4
+        entries.append(SLOT_ENTRY.pack(veh[0], veh[1], veh[2], *deadlines))
+    return b"".join(entries)
+
+def _decode_slots(buf: memoryview, count: int) -> Dict:
+    return {(r[0], r[1], r[2]): list(r[3:]) for r in _entries(buf, SLOT_ENTRY, count)}
+
+def encode_proposal(lane_id: int, fleet_id: int, proposal: Dict) -> bytes:
+    ## proposal: (lane_id, fleet_id, veh_id) -> [deadline, deadline, deadline, deadline]
+    return _header(MSG_PROPOSAL) + FLEET_HEADER.pack(lane_id, fleet_id, len(proposal)) + \
+        _encode_slots(proposal)
+
+def decode_proposal(payload):
+    ## return: (sender lane_id, sender fleet_id, proposal)
+    buf = _body(payload, MSG_PROPOSAL)
+    lane_id, fleet_id, count = FLEET_HEADER.unpack_from(buf)
+    return lane_id, fleet_id, _decode_slots(buf[FLEET_HEADER.size:], count)
+
+
+def encode_score(lane_id: int, fleet_id: int, scores: List[Tuple]) -> bytes:
+    ## scores: a list of (proposer lane_id, proposer fleet_id, score)
+    return _header(MSG_SCORE) + FLEET_HEADER.pack(lane_id, fleet_id, len(scores)) + \
+        b"".join(SCORE_ENTRY.pack(*score) for score in scores)
+
+def decode_score(payload):
+    ## return: (sender lane_id, sender fleet_id, scores)
+    buf = _body(payload, MSG_SCORE)
+    lane_id, fleet_id, count = FLEET_HEADER.unpack_from(buf)
+    return lane_id, fleet_id, list(_entries(buf[FLEET_HEADER.size:], SCORE_ENTRY, count))
+
+
+def encode_final_assignment(final_assignment: Dict) -> bytes:
+    return _header(MSG_FINAL) + COUNT.pack(len(final_assignment)) + _encode_slots(final_assignment)
+
+def decode_final_assignment(payload) -> Dict:
+    buf = _body(payload, MSG_FINAL)
+    (count,) = COUNT.unpack_from(buf)
+    return _decode_slots(buf[COUNT.size:], count)
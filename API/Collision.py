@@ -0,0 +1,44 @@
+import math
+from typing import List, Tuple
+from .math_utils import euclidean_dist
+
+class CollisionDetector():
+    ## Uniform-grid (spatial hash) collision detection.
+    ## The cell size equals the collision threshold, so a colliding pair is always
+    ## in the same or in adjacent cells and only those have to be compared.
+    def __init__(self, threshold: float = 1):
+        self.threshold = threshold
+        self.collisions = [] # every collision found so far: (tick, i, j, location_i, location_j)
+
+    def detect(self, location_info, finished_list, tick: float) -> List[Tuple]:
+        ## location_info: flat list [x_0, y_0, x_1, y_1, ...]
+        ## finished_list: finished_list[i] == 1 if vehicle i has crossed the intersection
+        ## return: all colliding pairs (tick, i, j, location_i, location_j) with i < j
+        grid = dict()
+        for i in range(len(finished_list)):
+            if finished_list[i] == 1:
+                continue
+            cell = (math.floor(location_info[2*i]/self.threshold), math.floor(location_info[2*i+1]/self.threshold))
+            if cell not in grid:
+                grid[cell] = [i]
+            else:
+                grid[cell].append(i)
+
+        collisions = []
+        for (cx, cy), members in grid.items():
+            for dx in (-1, 0, 1):
+                for dy in (-1, 0, 1):
+                    neighbours = grid.get((cx+dx, cy+dy))
+                    if neighbours is None:
+                        continue
+                    for i in members:
+                        location1 = (location_info[2*i], location_info[2*i+1])
+                        for j in neighbours:
+                            if j <= i:
+                                continue
+                            location2 = (location_info[2*j], location_info[2*j+1])
+                            if euclidean_dist(location1, location2) <= self.threshold:
+                                collisions.append((tick, i, j, location1, location2))
+        collisions.sort()
+        self.collisions.extend(collisions)
+        return collisions
@@ -0,0 +1,102 @@
+import numpy as np
+from typing import Tuple
+from .math_utils import X_MIN, X_MAX, Y_MIN, Y_MAX
+
+class KinematicsStore():
+    ## Struct-of-arrays storage of the kinematic state of many vehicles.
+    ## Row i holds the state of the vehicle that was added i-th;
+    ## MyVehicle objects only keep their row index and read/write through it.
+    def __init__(self, max_speed: float, conflict_zones: list, capacity: int = 1):
+        self.max_speed = max_speed
+        self.conflict_zones = conflict_zones
+        self.size = 0
+        self.location = np.zeros((capacity, 2))
+        self.velocity = np.zeros((capacity, 2))
+        self.acceleration = np.zeros((capacity, 2))
+        self.tick = np.zeros(capacity)
+        self.delta = np.zeros(capacity)
+        self.finish = np.zeros(capacity, dtype=bool)
+        self.des_lane_id = np.zeros(capacity, dtype=np.int64)
+
+    def add(self, location: Tuple, velocity: Tuple, acceleration: Tuple, des_lane_id: int, delta: float) -> int:
+        if self.size == len(self.tick):
+            self._grow(2*len(self.tick))
+        idx = self.size
+        self.location[idx] = location
+        self.velocity[idx] = velocity
+        self.acceleration[idx] = acceleration
+        self.tick[idx] = 0
+        self.delta[idx] = delta
+        self.finish[idx] = False
+        self.des_lane_id[idx] = des_lane_id
+        self.size += 1
+        return idx
+
+    def _grow(self, capacity: int):
+        for name in ["location", "velocity", "acceleration", "tick", "delta", "finish", "des_lane_id"]:
+            old = getattr(self, name)
+            new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+
+    def finish_cross(self, indices) -> np.ndarray:
+        ## vectorized MyVehicle.finish_cross
+        zones = self.conflict_zones
+        x = self.location[indices, 0]
+        y = self.location[indices, 1]
+        des_lane_id = self.des_lane_id[indices]
+        return np.where(des_lane_id == 0, x >= zones[3][X_MAX],
+               np.where(des_lane_id == 1, y >= zones[0][Y_MAX],
+               np.where(des_lane_id == 2, x <= zones[1][X_MIN],
+                        y <= zones[2][Y_MIN])))
+
+    def step(self, indices):
+        ## vectorized MyVehicle.step_vehicle for all the given rows
+        indices = np.asarray(indices, dtype=np.int64)
+        indices = indices[~self.finish[indices]]
+        if len(indices) == 0:
+            return
+        delta = self.delta[indices][:, None]
+        original_velocity = self.velocity[indices]
+        velocity = original_velocity + self.acceleration[indices]*delta
+
+        # remove the component against the original direction of motion
+        reverse = np.einsum('ij,ij->i', original_velocity, velocity) < 0
+        if reverse.any():
+            v = velocity[reverse]
+            ov = original_velocity[reverse]
+            scalar = np.einsum('ij,ij->i', v, ov)/np.sqrt(ov[:, 0]**2 + ov[:, 1]**2)
+            velocity[reverse] = v - ov*scalar[:, None]
+
+        speed = np.sqrt(velocity[:, 0]**2 + velocity[:, 1]**2)
+        too_fast = speed > self.max_speed
+        if too_fast.any():
+            velocity[too_fast] *= (self.max_speed/speed[too_fast])[:, None]
+
+        displacement = ((velocity + original_velocity)*0.5)*delta
+        self.velocity[indices] = velocity
+        self.location[indices] += displacement
+        self.tick[indices] += delta[:, 0]
+        self.finish[indices] |= self.finish_cross(indices)
+
+    def add_turning_acceleration(self, indices, targets, turning_radius: float):
+        ## add the normal acceleration needed to turn toward the targets (one per row)
+        indices = np.asarray(indices, dtype=np.int64)
+        if len(indices) == 0:
+            return
+        velocity = self.velocity[indices]
+        target_direction = _unit(np.asarray(targets, dtype=float) - self.location[indices])
+        speed = np.sqrt(velocity[:, 0]**2 + velocity[:, 1]**2)
+        tan_direction = np.where((speed < 0.001)[:, None], target_direction, _unit(velocity))
+        a_normal = speed*speed/turning_radius
+        direction = _unit(tan_direction)
+        left = tan_direction[:, 0]*target_direction[:, 1] - tan_direction[:, 1]*target_direction[:, 0] >= 0
+        normal_direction = np.where(left[:, None],
+                                    np.stack([-direction[:, 1], direction[:, 0]], axis=1),
+                                    np.stack([direction[:, 1], -direction[:, 0]], axis=1))
+        self.acceleration[indices] += normal_direction*a_normal[:, None]
+
+def _unit(x: np.ndarray) -> np.ndarray:
+    # same as math_utils.get_unit_vector, row by row
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return x*(1/np.sqrt(x[:, 0]**2 + x[:, 1]**2))[:, None]
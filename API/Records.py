@@ -0,0 +1,56 @@
+import threading
+from typing import Dict
+
+REMOVED = object() # the update of a key removed by discard
+
+class SnapshotStore():
+    ## A dict written by the listeners (on the threads of the session) and read by the main loop
+    ## of a vehicle. The listeners only queue their updates, holding a lock for one dict
+    ## assignment; the main loop applies all the updates at once with sync(), once per round,
+    ## and in between reads data as a plain dict: it does not change, so it can be iterated
+    ## without lock nor copy. The queued updates are coalesced per key (the last one wins), so
+    ## they stay bounded even if the main loop stops syncing.
+    ## version: increased by every sync (or reset) that changes data
+    def __init__(self):
+        self.data = dict()
+        self.version = 0
+        self._updates = dict()
+        self._lock = threading.Lock()
+
+    def put(self, key, value):
+        ## listener side
+        with self._lock:
+            self._updates[key] = value
+
+    def discard(self, key):
+        ## listener side
+        with self._lock:
+            self._updates[key] = REMOVED
+
+    def sync(self) -> Dict:
+        ## main loop side: apply the updates queued since the last sync, in the order in which
+        ## their keys were first updated
+        ## return: the updates, key -> value (REMOVED for a removed key)
+        with self._lock:
+            updates, self._updates = self._updates, dict()
+        changed = False
+        data = self.data
+        for key, value in updates.items():
+            if value is REMOVED:
+                if key in data:
+                    del data[key]
+                    changed = True
+            elif key not in data or data[key] != value:
+                data[key] = value
+                changed = True
+        if changed:
+            self.version += 1
+        return updates
+
+    def reset(self):
+        ## main loop side: forget data and the queued updates
+        with self._lock:
+            self._updates = dict()
+        if self.data:
+            self.data.clear()
+            self.version += 1
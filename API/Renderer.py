@@ -0,0 +1,124 @@
+import threading
+from collections import deque
+
+RENDER_MODES = ["none", "png", "gif", "mp4"]
+
+class TrajectoryRenderer():
+    ## Draws vehicle locations in a background thread.
+    ## The simulation only calls feed(), which pushes a snapshot into a ring buffer;
+    ## the thread keeps one figure alive and only moves the scatter artist.
+    ## mode:
+    ##   none: do nothing (matplotlib is not even imported)
+    ##   png:  overwrite output_file with the newest snapshot
+    ##   gif:  keep at most max_frames snapshots (every other one is dropped when there are more,
+    ##         see keep_frame) and encode an animation into output_file on close()
+    ##   mp4:  stream every snapshot to ffmpeg as a frame of output_file, finished on close()
+    ## interval: simulated seconds between two snapshots
+    def __init__(self, mode: str = "png", output_file: str = "figure.png",
+                 interval: float = 0.5, buffer_size: int = 64, max_frames: int = 1000):
+        assert mode in RENDER_MODES
+        self.mode = mode
+        self.output_file = output_file
+        self.interval = interval
+        self.buffer = deque(maxlen=buffer_size) # the oldest snapshots are dropped when full
+        self.max_frames = max_frames
+        self.frames = [] # gif: the snapshots kept, one every stride
+        self.stride = 1
+        self.num_snapshots = 0
+        self.cond = threading.Condition()
+        self.stopped = False
+        self.last_time = None
+        self.thread = None
+        if self.mode != "none":
+            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread.start()
+
+    def feed(self, sim_time: float, location_info, finished_list):
+        if self.thread is None:
+            return
+        if self.last_time is not None and sim_time - self.last_time < self.interval - 1e-9:
+            return
+        self.last_time = sim_time
+        snapshot = (sim_time, [(location_info[2*i], location_info[2*i+1])
+                               for i in range(len(finished_list)) if finished_list[i] == 0])
+        with self.cond:
+            self.buffer.append(snapshot)
+            self.cond.notify()
+
+    def close(self):
+        if self.thread is None:
+            return
+        with self.cond:
+            self.stopped = True
+            self.cond.notify()
+        self.thread.join()
+        self.thread = None
+
+    def keep_frame(self, snapshot):
+        ## gif: keep one snapshot every stride, halve the frames (and double the stride) past max_frames,
+        ## so that the animation covers the whole run at an even pace in bounded memory
+        if self.num_snapshots % self.stride == 0:
+            self.frames.append(snapshot)
+            if len(self.frames) > self.max_frames:
+                self.frames = self.frames[::2]
+                self.stride *= 2
+        self.num_snapshots += 1
+
+    def get_fps(self) -> float:
+        fps = max(1, round(1/self.interval)) if self.interval > 0 else 10
+        return fps / self.stride
+
+    def _run(self):
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        fig = Figure()
+        FigureCanvasAgg(fig)
+        ax = fig.add_subplot()
+        ax.set_xlim(-10,10)
+        ax.set_ylim(-10,10)
+        ax.plot([-10,10],[4,4])
+        ax.plot([4,4],[10,-10])
+        ax.plot([10,-10],[-4,-4])
+        ax.plot([-4,-4],[-10,10])
+        ax.plot([-10,10],[0,0],linestyle='dashed')
+        ax.plot([0,0],[-10,10],linestyle='dashed')
+        scatter = ax.scatter([], [])
+        title = ax.set_title("")
+
+        def draw(snapshot):
+            sim_time, locations = snapshot
+            scatter.set_offsets(locations if locations else [[float("nan"), float("nan")]])
+            title.set_text(f"{round(sim_time,2)} s")
+
+        writer = None # mp4: set up with the first snapshot
+        while True:
+            with self.cond:
+                while not self.buffer and not self.stopped:
+                    self.cond.wait()
+                snapshots = list(self.buffer)
+                self.buffer.clear()
+                stopped = self.stopped
+            if self.mode == "png":
+                if snapshots:
+                    draw(snapshots[-1])
+                    fig.savefig(self.output_file)
+            elif self.mode == "mp4":
+                for snapshot in snapshots:
+                    if writer is None:
+                        from matplotlib.animation import FFMpegWriter
+                        writer = FFMpegWriter(fps=self.get_fps())
+                        writer.setup(fig, self.output_file)
+                    draw(snapshot)
+                    writer.grab_frame()
+            else:
+                for snapshot in snapshots:
+                    self.keep_frame(snapshot)
+            if stopped:
+                break
+
+        if writer is not None:
+            writer.finish()
+        if self.mode == "gif" and self.frames:
+            from matplotlib.animation import FuncAnimation, PillowWriter
+            animation = FuncAnimation(fig, lambda k: draw(self.frames[k]), frames=len(self.frames))
+            animation.save(self.output_file, writer=PillowWriter(fps=self.get_fps()))
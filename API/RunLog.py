@@ -0,0 +1,161 @@
+import json
+import queue
+import threading
+import multiprocessing
+from typing import List, Dict
+
+LOG_FORMATS = ["jsonl", "parquet", "arrow"]
+
+## Every record of the run log is a flat row with the columns below, so that
+## the same file can be loaded as a table (e.g. pandas.read_json(lines=True)).
+##   crossing:   time = the time the vehicle crossed the intersection
+##   assignment: one row per (vehicle, zone) of the final assignment, time = deadline
+##   waypoint:   one row per waypoint, index = waypoint index, time/x/y = waypoint
+##   state:      per-tick state (only with --log_states)
+##   collision:  pid and other_pid collided at time
+RUN_LOG_SCHEMA = [
+    ("run_id", "string"),
+    ("type", "string"),
+    ("lane_id", "int64"),
+    ("fleet_id", "int64"),
+    ("vehicle_id", "int64"),
+    ("pid", "int64"),
+    ("other_pid", "int64"),
+    ("index", "int64"),
+    ("time", "float64"),
+    ("x", "float64"),
+    ("y", "float64"),
+    ("vx", "float64"),
+    ("vy", "float64"),
+    ("ax", "float64"),
+    ("ay", "float64"),
+]
+COLUMNS = [name for name, _ in RUN_LOG_SCHEMA]
+BATCH_SIZE = 1024
+
+class RunLogClient():
+    ## used by the vehicles to send records to the writer
+    def __init__(self, log_queue, run_id: str, log_states: bool = False):
+        self.queue = log_queue
+        self.run_id = run_id
+        self.log_states = log_states
+
+    def log(self, type: str, **fields):
+        record = dict.fromkeys(COLUMNS)
+        record["run_id"] = self.run_id
+        record["type"] = type
+        record.update(fields)
+        self.queue.put(record)
+
+    def log_crossing(self, vehicle, pid: int):
+        self.log("crossing", lane_id=vehicle.lane_id, fleet_id=vehicle.fleet_id,
+                 vehicle_id=vehicle.vehicle_id, pid=pid, time=vehicle.tick)
+
+    def log_assignment(self, final_assignment: Dict, pid: int):
+        for (lane_id, fleet_id, vehicle_id), deadlines in final_assignment.items():
+            for zone_idx, deadline in enumerate(deadlines):
+                if deadline >= 0:
+                    self.log("assignment", lane_id=lane_id, fleet_id=fleet_id,
+                             vehicle_id=vehicle_id, pid=pid, index=zone_idx, time=deadline)
+
+    def log_waypoints(self, vehicle, waypoints: List[Dict], pid: int):
+        for idx, waypt in enumerate(waypoints):
+            self.log("waypoint", lane_id=vehicle.lane_id, fleet_id=vehicle.fleet_id,
+                     vehicle_id=vehicle.vehicle_id, pid=pid, index=idx, time=waypt.get("time"),
+                     x=waypt["location"][0], y=waypt["location"][1])
+
+    def log_state(self, vehicle, pid: int):
+        if not self.log_states:
+            return
+        location, velocity, acceleration = vehicle.location, vehicle.velocity, vehicle.acceleration
+        self.log("state", lane_id=vehicle.lane_id, fleet_id=vehicle.fleet_id,
+                 vehicle_id=vehicle.vehicle_id, pid=pid, time=vehicle.tick,
+                 x=location[0], y=location[1], vx=velocity[0], vy=velocity[1],
+                 ax=acceleration[0], ay=acceleration[1])
+
+    def log_collision(self, tick: float, pid: int, other_pid: int):
+        self.log("collision", pid=pid, other_pid=other_pid, time=tick)
+
+
+class RunLog():
+    ## Owns the queue and the single writer that batches the records into output_file.
+    ## use_process: run the writer in its own process (for the multi-process engine),
+    ##              otherwise in a thread of the current process
+    def __init__(self, output_file: str, log_format: str = "jsonl", use_process: bool = True):
+        assert log_format in LOG_FORMATS
+        if log_format != "jsonl":
+            import pyarrow # fail early if the optional dependency is missing
+        self.output_file = output_file
+        self.log_format = log_format
+        if use_process:
+            self.queue = multiprocessing.Queue()
+            self.writer = multiprocessing.Process(target=write_records,
+                args=(self.queue, output_file, log_format), daemon=True)
+        else:
+            self.queue = queue.Queue()
+            self.writer = threading.Thread(target=write_records,
+                args=(self.queue, output_file, log_format), daemon=True)
+        self.writer.start()
+
+    def client(self, run_id: str, log_states: bool = False) -> RunLogClient:
+        return RunLogClient(self.queue, run_id, log_states)
+
+    def close(self):
+        self.queue.put(None)
+        self.writer.join()
+
+
+def write_records(log_queue, output_file: str, log_format: str):
+    ## writer loop: block for one record, then drain whatever else is queued
+    if log_format == "jsonl":
+        sink = JsonLinesSink(output_file)
+    else:
+        sink = ArrowSink(output_file, log_format)
+    stopped = False
+    while not stopped:
+        batch = []
+        record = log_queue.get()
+        while True:
+            if record is None:
+                stopped = True
+                break
+            batch.append(record)
+            if len(batch) >= BATCH_SIZE:
+                break
+            try:
+                record = log_queue.get_nowait()
+            except queue.Empty:
+                break
+        if batch:
+            sink.write(batch)
+    sink.close()
+
+
+class JsonLinesSink():
+    def __init__(self, output_file: str):
+        self.f = open(output_file, "a")
+
+    def write(self, batch: List[Dict]):
+        self.f.write("".join(json.dumps(record) + "\n" for record in batch))
+        self.f.flush()
+
+    def close(self):
+        self.f.close()
+
+
+class ArrowSink():
+    def __init__(self, output_file: str, log_format: str):
+        import pyarrow as pa
+        self.pa = pa
+        self.schema = pa.schema([(name, getattr(pa, dtype)()) for name, dtype in RUN_LOG_SCHEMA])
+        if log_format == "parquet":
+            import pyarrow.parquet as pq
+            self.writer = pq.ParquetWriter(output_file, self.schema)
+        else:
+            self.writer = pa.ipc.new_file(output_file, self.schema)
+
+    def write(self, batch: List[Dict]):
+        self.writer.write_table(self.pa.Table.from_pylist(batch, schema=self.schema))
+
+    def close(self):
+        self.writer.close()
@@ -0,0 +1,155 @@
+import math
+import random
+from typing import List, Tuple
+from .Vehicle import MAX_FLEET_SIZE
+
+## Synthetic workloads in the layout of input_format, as the fleet dicts of main.read_input.
+## Fleets arrive on every lane as a Poisson process (or from a trace file): an arrival is a fleet
+## whose leader is ENTRY_DIST from the center of the intersection at its arrival time, followed
+## by its members HEADWAY apart. arrivals feed the streaming mode of the in-process engine;
+## layout turns them into one static batch (a later arrival starts farther upstream, one fleet per lane).
+ENTRY_DIST = 18 # m from the center of the intersection (the leaders of sample_input)
+HEADWAY = 15 # m between two consecutive vehicles of a lane
+TURNS = (1, 2, 3) # (des_lane_id - lane_id) % 4: right turn, straight on, left turn
+TRACE_FORMAT = "<arrival_time> <lane_id> <des_lane_id> <fleet_length> <speed>" # one fleet per line
+
+
+def lane_location(lane_id: int, dist: float) -> Tuple[float, float]:
+    ## the point of the incoming lane lane_id at dist from the center
+    if lane_id == 0:
+        return (dist, 2)
+    elif lane_id == 1:
+        return (-2, dist)
+    elif lane_id == 2:
+        return (-dist, -2)
+    else:
+        return (2, -dist)
+
+def lane_velocity(lane_id: int, speed: float) -> Tuple[float, float]:
+    ## driving toward the intersection on lane lane_id
+    if lane_id == 0:
+        return (-speed, 0)
+    elif lane_id == 1:
+        return (0, -speed)
+    elif lane_id == 2:
+        return (speed, 0)
+    else:
+        return (0, speed)
+
+def make_fleet(lane_id: int, des_lane_id: int, fid: int, fleet_len: int, speed: float, dist: float = ENTRY_DIST) -> dict:
+    ## a fleet whose leader is dist from the center, all its vehicles at speed
+    if not 1 <= fleet_len <= MAX_FLEET_SIZE:
+        raise ValueError(f"fleet length {fleet_len} is not in [1, {MAX_FLEET_SIZE}]")
+    if (des_lane_id - lane_id) % 4 not in TURNS:
+        raise ValueError(f"no route from lane {lane_id} to lane {des_lane_id}")
+    vehicles = []
+    for vid in range(fleet_len):
+        vehicles.append({'vid': vid, 'location': lane_location(lane_id, dist + vid*HEADWAY),
+                         'velocity': lane_velocity(lane_id, speed), 'acceleration': (0, 0)})
+    return {'lane_id': lane_id, 'des_lane_id': des_lane_id, 'fid': fid, 'fleet_len': fleet_len, 'vehicles': vehicles}
+
+def fleet_speed(fleet: dict) -> float:
+    velocity = fleet['vehicles'][0]['velocity']
+    return math.sqrt(velocity[0]**2 + velocity[1]**2)
+
+
+class ScenarioGenerator():
+    ## Poisson arrivals of fleets, reproducible with a seed
+    def __init__(self, arrival_rate=0.2, turn_mix=(1, 1, 1), fleet_sizes=(1, 2, 3, 4),
+                 speed_range=(8, 12), seed: int = None):
+        ## arrival_rate: fleets per second on each lane, a number or a list of 4 (one per lane)
+        ## turn_mix: relative weights of TURNS
+        ## fleet_sizes: the sizes a fleet is drawn from uniformly (repeat a size to weight it)
+        ## speed_range: (min, max) speed of a fleet in m/s, drawn uniformly
+        if isinstance(arrival_rate, (int, float)):
+            arrival_rate = [arrival_rate]*4
+        if len(arrival_rate) != 4 or min(arrival_rate) < 0 or max(arrival_rate) == 0:
+            raise ValueError(f"invalid arrival rates {arrival_rate}")
+        if len(turn_mix) != len(TURNS) or min(turn_mix) < 0 or sum(turn_mix) == 0:
+            raise ValueError(f"invalid turn mix {turn_mix}")
+        if len(fleet_sizes) == 0 or not all(1 <= size <= MAX_FLEET_SIZE for size in fleet_sizes):
+            raise ValueError(f"fleet sizes must be in [1, {MAX_FLEET_SIZE}]")
+        if not 0 < speed_range[0] <= speed_range[1]:
+            raise ValueError(f"invalid speed range {speed_range}")
+        self.arrival_rate = list(arrival_rate)
+        self.turn_mix = list(turn_mix)
+        self.fleet_sizes = list(fleet_sizes)
+        self.speed_range = tuple(speed_range)
+        self.rng = random.Random(seed)
+
+    def next_gap(self, lane_id: int) -> float:
+        rate = self.arrival_rate[lane_id]
+        return self.rng.expovariate(rate) if rate > 0 else math.inf
+
+    def arrivals(self, num_veh: int, every_lane: bool = False) -> List[Tuple[float, dict]]:
+        ## fleets arrive until there are num_veh vehicles (the last fleet is cut to fit)
+        ## every_lane: keep a vehicle for each lane without a fleet yet, so that every lane gets one
+        ## return: a list of (arrival time, fleet) sorted by arrival time
+        if every_lane and (num_veh < 4 or min(self.arrival_rate) == 0):
+            raise ValueError("a fleet on every lane needs 4 vehicles and arrivals on every lane")
+        next_time = [self.next_gap(lane_id) for lane_id in range(4)]
+        fid = [0]*4
+        arrivals = []
+        total = 0
+        while total < num_veh:
+            lanes = range(4)
+            missing = [lane for lane in lanes if fid[lane] == 0] if every_lane else []
+            if num_veh - total == len(missing):
+                lanes = missing
+            lane_id = min(lanes, key=lambda lane: next_time[lane])
+            reserve = len(missing) - (lane_id in missing)
+            fleet_len = min(self.rng.choice(self.fleet_sizes), num_veh - total - reserve)
+            des_lane_id = (lane_id + self.rng.choices(TURNS, weights=self.turn_mix)[0]) % 4
+            speed = self.rng.uniform(*self.speed_range)
+            arrivals.append((next_time[lane_id], make_fleet(lane_id, des_lane_id, fid[lane_id], fleet_len, speed)))
+            fid[lane_id] += 1
+            total += fleet_len
+            next_time[lane_id] += self.next_gap(lane_id)
+        return arrivals
+
+    def fleets(self, num_veh: int) -> List[dict]:
+        ## one static batch of num_veh vehicles with a fleet on every lane, see layout
+        return layout(self.arrivals(num_veh, every_lane=True))
+
+
+def layout(arrivals: List[Tuple[float, dict]]) -> List[dict]:
+    ## all the fleets of arrivals at time 0: a fleet starts where it would be at time 0 driving at its speed
+    ## The static protocol agrees on the schedule group lane by lane, so each lane needs exactly one
+    ## fleet: the fleets arriving later on a lane need the streaming mode.
+    fleets = []
+    for arrival_time, fleet in arrivals:
+        lane_id = fleet['lane_id']
+        if any(placed['lane_id'] == lane_id for placed in fleets):
+            raise ValueError(f"more than one fleet on lane {lane_id}, the static protocol takes one per lane "
+                             f"(run the scenario in streaming mode)")
+        dist = ENTRY_DIST + fleet_speed(fleet)*arrival_time
+        fleets.append(make_fleet(lane_id, fleet['des_lane_id'], fleet['fid'], fleet['fleet_len'], fleet_speed(fleet), dist))
+    missing = [lane_id for lane_id in range(4) if lane_id not in set(fleet['lane_id'] for fleet in fleets)]
+    if missing:
+        raise ValueError(f"no fleet on lanes {missing}, the static protocol needs one on every lane")
+    return fleets
+
+def read_trace(trace_file: str) -> List[Tuple[float, dict]]:
+    ## arrivals recorded in trace_file, one fleet per line in TRACE_FORMAT ('#' starts a comment)
+    arrivals = []
+    fid = [0]*4
+    with open(trace_file, 'r') as f:
+        for line in f:
+            line = line.split('#')[0].split()
+            if not line:
+                continue
+            arrival_time, lane_id, des_lane_id, fleet_len, speed = float(line[0]), int(line[1]), int(line[2]), int(line[3]), float(line[4])
+            arrivals.append((arrival_time, make_fleet(lane_id, des_lane_id, fid[lane_id], fleet_len, speed)))
+            fid[lane_id] += 1
+    arrivals.sort(key=lambda arrival: arrival[0])
+    return arrivals
+
+def write_input(fleets: List[dict], input_file: str):
+    ## write fleets in the layout of input_format
+    lines = [f"{len(fleets)} {sum(fleet['fleet_len'] for fleet in fleets)}"]
+    for fleet in fleets:
+        lines.append(f"{fleet['lane_id']} {fleet['des_lane_id']} {fleet['fid']} {fleet['fleet_len']}")
+        for veh in fleet['vehicles']:
+            lines.append(" ".join(str(round(value, 6)) for value in (veh['vid'],) + veh['location'] + veh['velocity'] + veh['acceleration']))
+    with open(input_file, 'w') as f:
+        f.write("\n".join(lines) + "\n")
@@ -3,6 +3,10 @@ from typing import List, Dict
 from copy import *
 import random
 import queue
+import time
+from collections import OrderedDict
+from abc import ABC, abstractmethod
+from concurrent.futures import ProcessPoolExecutor
 from . import math_utils
 from . import Simulator
 
@@ -11,6 +15,9 @@ FLEET_DIRECTION = ['right', 'down']
 # right: toward the direction of positive x-axis
 # down: toward the direction of negative y-axis
 MAX_ACCELERATE = 1 #max acceleration of each vehicle
+ROLLOUT_CACHE_SIZE = 4096 # completed rollouts kept per scheduler
+PRUNE_TARGET = 0.75 # pruning shrinks the tree to this fraction of the node budget
+MACRO_REFINE_VEH = 6 # with macro actions, single vehicles are scheduled once this few vehicles are left
 
 def arrival_time(distance: float, speed: float, acceleration: float):
     t = math_utils.quadratic(acceleration/2, speed, -distance)
@@ -18,14 +25,51 @@ def arrival_time(distance: float, speed: float, acceleration: float):
 
 
 class Node():
-    def __init__(self, passing_order):
-        self.passing_order = passing_order
-        self.parent = None
+    __slots__ = ("parent", "action", "depth", "placed", "progress", "children",
+                 "visits", "score", "total_delay", "best_total_delay", "sim_state")
+
+    def __init__(self, parent=None, action = None, placed: int = 0, progress: tuple = ()):
+        ## A node only stores the vehicles it appends to its parent's passing order,
+        ## the order itself is recovered by following the parent pointers.
+        ## action: index (in Scheduler.all_veh) of the vehicle appended to the parent's order,
+        ##         or a tuple of indices for a macro action (consecutive vehicles of a fleet)
+        ## depth: number of vehicles in the passing order
+        ## placed: bitmask of the vehicles in the passing order
+        ## progress: for each fleet, how many of its vehicles are in the passing order
+        self.parent = parent
+        self.action = action
+        if parent is None:
+            self.depth = 0
+        else:
+            self.depth = parent.depth + (len(action) if type(action) is tuple else 1)
+        self.placed = placed
+        self.progress = progress
         self.children = []
         self.visits = 0
         self.score = 0
         self.total_delay = -1
         self.best_total_delay = -1
+        self.sim_state = None # Simulator state after the passing order, see Simulator.init_sim_state
+
+    def get_path(self) -> list:
+        ## the actions from the root to this node
+        path = []
+        node = self
+        while node.parent is not None:
+            path.append(node.action)
+            node = node.parent
+        path.reverse()
+        return path
+
+    def get_order(self) -> List[int]:
+        ## the passing order as vehicle indices
+        order = []
+        for action in self.get_path():
+            if type(action) is tuple:
+                order.extend(action)
+            else:
+                order.append(action)
+        return order
 
     def get_all_siblings(self):
         if self.parent == None:
@@ -70,10 +114,12 @@ class Node():
                 best_child = child
         return best_child
     
-    def expand(self, passing_order):
-        new_child = Node(passing_order)
+    def expand(self, action, progress: tuple):
+        placed = self.placed
+        for idx in (action if type(action) is tuple else (action,)):
+            placed |= 1 << idx
+        new_child = Node(self, action, placed, progress)
         self.children.append(new_child)
-        new_child.parent = self
 
     def normalize_delay(self):
         '''
@@ -98,21 +144,52 @@ class Node():
             return (score1+score2)/2
         '''
         if self.parent != None:
-            return self.best_total_delay + 5*self.total_delay/len(self.passing_order)
+            return self.best_total_delay + 5*self.total_delay/self.depth
         assert 0
 
     def backpropagate(self, score):
-        self.visits += 1
-        self.score = score
-        if self.parent != None:
-            self.parent.backpropagate(score)
+        node = self
+        while node != None:
+            node.visits += 1
+            node.score = score
+            node = node.parent
+
+
+_pools = dict() # workers -> ProcessPoolExecutor, shared by all the searches of a process
+
+def get_pool(workers: int) -> ProcessPoolExecutor:
+    if workers not in _pools:
+        _pools[workers] = ProcessPoolExecutor(max_workers=workers)
+    return _pools[workers]
+
+def search_worker(conflict_zones, states, safety_gap, my_lane_id, my_fleet_id, alpha, seed, node_budget, macro_chunk,
+                  t_now, committed, num_iter, time_budget=None, statistics=()):
+    ## grow a tree in a worker process, starting from the statistics of the caller's tree
+    ## return: its statistics, the iterations it achieved and its best completed rollout
+    scheduler = Scheduler(conflict_zones, states, safety_gap, my_lane_id, my_fleet_id, alpha, seed, node_budget, macro_chunk,
+                          t_now, committed)
+    scheduler.import_statistics(statistics)
+    scheduler.search(num_iter, time_budget=time_budget)
+    return scheduler.export_statistics(), scheduler.last_iterations, scheduler.best_rollout
+
 
+class BaseScheduler(ABC):
+    ## What every search strategy shares: the vehicles of the schedule group, their fleets and
+    ## the simulation of passing orders. A strategy implements search(num_iter, workers, time_budget),
+    ## which returns a passing order of (lane_id, des_lane_id, fleet_id, vehicle_id); a class that
+    ## does not cannot be instantiated.
+    name = None
 
-class Scheduler():
-    def __init__(self, conflict_zones: list, states: dict, safety_gap: float, my_lane_id: int, my_fleet_id: int, alpha: float):
+    def __init__(self, conflict_zones: list, states: dict, safety_gap: float, my_lane_id: int, my_fleet_id: int, alpha: float,
+                 seed: int = None, node_budget: int = None, macro_chunk: int = None, t_now: float = 0, committed: list = None):
         ## states: (lane_id, fleet_id, veh_id) -> state
+        ## t_now: the time of the states, the time slots are absolute times from it
+        ## committed: t_max of the time slots already committed to vehicles outside the group
+        ##            (see Simulator.committed_t_max), every passing order starts after them
         self.conflict_zones = conflict_zones
-        self.states = states
+        self.t_now = t_now
+        self.committed = None if committed is None else tuple(committed)
+        self.states = dict(states) # the caller may keep updating its own dict
         self.safety_gap = safety_gap
         self.my_lane_id = my_lane_id
         self.my_fleet_id = my_fleet_id
@@ -121,75 +198,386 @@ class Scheduler():
         for veh in states.keys():
             self.all_veh.append((veh[0],self.states[veh]["des_lane_id"],veh[1],veh[2]))
         self.num_veh = len(states.keys())
-        self.root = Node([])
+        # vehicles are referred to by their index in all_veh inside the tree
+        fleets = dict()
+        for idx, veh in enumerate(self.all_veh):
+            fleets.setdefault((veh[0],veh[1],veh[2]), []).append(idx)
+        fleets = [sorted(members, key=lambda idx: self.all_veh[idx][3]) for members in fleets.values()]
+        # the vehicles of a lane queue up behind each other: a fleet cannot pass before the fleets ahead
+        # of it on its lane, so the fleets of a lane are chained (closest to the center first) and
+        # self.fleets holds one chain per lane, whose order every passing order keeps. This is stricter
+        # than keeping the order within every fleet (vehicle veh_id after veh_id-1) on purpose: with
+        # several fleets on a lane (streaming mode), an order letting the fleet behind pass first
+        # cannot be driven and left the vehicles behind in the conflict zones of the others
+        fleets.sort(key=lambda members: math_utils.euclidean_dist((0,0), self.states[self.get_key(members[0])]["location"]))
+        lanes = dict()
+        self.fleet_end = [0]*self.num_veh # the position in its chain right after the last vehicle of its fleet
+        for members in fleets:
+            chain = lanes.setdefault(self.all_veh[members[0]][0], [])
+            chain.extend(members)
+            for idx in members:
+                self.fleet_end[idx] = len(chain)
+        self.fleets = list(lanes.values())
+        self.fleet_of = [0]*self.num_veh
+        for fleet_idx, members in enumerate(self.fleets):
+            for idx in members:
+                self.fleet_of[idx] = fleet_idx
+        self.build_vehicle_table()
+        self.node_budget = node_budget
+        self.macro_chunk = macro_chunk
+        self.iterations = 0 # iterations searched on the current states
+        self.last_iterations = 0 # iterations achieved by the last call of search
+        self.exhausted = False # the search cannot improve its result on the current states any more
+        self.seed = seed
+
+    def same_vehicles(self, states: dict) -> bool:
+        ## whether the search built for self.states is still valid for states
+        if states.keys() != self.states.keys():
+            return False
+        for veh in states:
+            if states[veh]["des_lane_id"] != self.states[veh]["des_lane_id"]:
+                return False
+        return True
+
+    def reset_statistics(self, states: dict) -> List[int]:
+        ## forget every result computed with the old states
+        ## return: the indices (in all_veh) of the vehicles whose state changed, nothing is
+        ##         forgotten if there are none
+        assert self.same_vehicles(states)
+        changed = [idx for idx in range(self.num_veh) if states[self.get_key(idx)] != self.states[self.get_key(idx)]]
+        if not changed:
+            return changed
+        self.states = dict(states)
+        self.build_vehicle_table()
+        self.iterations = 0
+        self.exhausted = False
+        return changed
+
+    def get_key(self, idx):
+        ## the key of the vehicle all_veh[idx] in states
+        veh = self.all_veh[idx]
+        return (veh[0],veh[2],veh[3])
 
     def get_state(self, veh):
         return self.states[(veh[0],veh[2],veh[3])]
     
     def get_dist_to_center(self, veh):
-        return math_utils.euclidean_dist((0,0),self.get_state(veh)["location"])
-    
+        return float(self.vehicle_table.dist_to_center[self.vehicle_table.index[(veh[0],veh[2],veh[3])]])
+
+    def build_vehicle_table(self):
+        ## the constants of every vehicle under the current states, read by all the simulations
+        self.vehicle_table = Simulator.VehicleTable(self.all_veh,self.conflict_zones,[self.get_state(veh) for veh in self.all_veh],
+                                                    self.my_lane_id,self.my_fleet_id,self.alpha,self.t_now)
+        dist_to_center = self.vehicle_table.dist_to_center.tolist()
+        # the order of the rollouts: closest to the center first, but every lane keeps its order
+        # (a vehicle closer to the center than one ahead of it on its lane passes right after it)
+        progress = [0]*len(self.fleets)
+        self.dist_order = []
+        for idx in sorted(range(self.num_veh), key=lambda idx: dist_to_center[idx]):
+            fleet_idx = self.fleet_of[idx]
+            self.dist_order.append(self.fleets[fleet_idx][progress[fleet_idx]])
+            progress[fleet_idx] += 1
+
+    def init_sim_state(self):
+        ## the simulator state of the empty passing order
+        return Simulator.init_sim_state(self.conflict_zones, self.committed)
+
+    def extend_sim_state(self, sim_state, idx):
+        ## let the vehicle all_veh[idx] pass after the order summarized by sim_state
+        return Simulator.extend_from_table(sim_state,idx,self.vehicle_table,self.safety_gap)
+
+    def evaluate_orders(self, orders, sim_state=None, return_t_assign=False):
+        ## total delays (and time assignments) of many passing orders at once, see Simulator.simulate_orders
+        ## orders: (orders x positions) matrix of vehicle indices (in all_veh)
+        ## The scheduling protocol does not call it: it pays off from a few dozen orders
+        ## (bench_batch_simulation.py), while a tree node has at most one child per lane and a
+        ## leader scores at most one proposal per lane, so the search stays on extend_sim_state.
+        ## It is kept as the batch API for offline sweeps over many orders (bench_batch_simulation.py)
+        ## and as the reference the scalar recurrences are checked against (test_simulator.py).
+        if sim_state is None:
+            sim_state = self.init_sim_state()
+        return Simulator.simulate_orders(orders,self.vehicle_table,self.safety_gap,sim_state,return_t_assign)
+
+    def passing_order_to_time_slot(self, passing_order):
+        sim_state = self.init_sim_state()
+        time_slot = dict()
+        for veh in passing_order:
+            key = (veh[0],veh[2],veh[3])
+            sim_state, time_slot[key] = self.extend_sim_state(sim_state, self.vehicle_table.index[key])
+        return time_slot
+
+    @abstractmethod
+    def search(self, num_iter, workers=1, time_budget=None):
+        ## run the search (num_iter iterations more, on workers processes, for at most time_budget
+        ## seconds, as far as the strategy supports them) and return the best passing order
+        pass
+
+
+class Scheduler(BaseScheduler):
+    ## Monte Carlo tree search over passing orders
+    name = "mcts"
+
+    def __init__(self, conflict_zones: list, states: dict, safety_gap: float, my_lane_id: int, my_fleet_id: int, alpha: float,
+                 seed: int = None, node_budget: int = None, macro_chunk: int = None, t_now: float = 0, committed: list = None):
+        ## seed: makes the search deterministic (the global random module is used if None)
+        ## node_budget: max number of nodes in the tree, low-visit subtrees are pruned beyond it
+        ## macro_chunk: if set, an action admits the next macro_chunk vehicles of a fleet at once
+        ##              (fewer if the fleet has fewer left) until MACRO_REFINE_VEH vehicles are
+        ##              left, so the tree grows with the number of fleets rather than vehicles
+        super().__init__(conflict_zones, states, safety_gap, my_lane_id, my_fleet_id, alpha, seed, node_budget, macro_chunk,
+                         t_now, committed)
+        self.root = Node(progress=tuple([0]*len(self.fleets)))
+        self.num_nodes = 1
+        self.best_rollout = None # (total delay, passing order prefix) of the best completed rollout so far
+        self.rng = random if seed is None else random.Random(seed)
+        self.rollout_cache = OrderedDict() # passing order prefix -> delay of its completed rollout
+
+    def reset_statistics(self, states: dict) -> List[int]:
+        ## keep the expanded tree (passing orders only depend on the set of vehicles) but forget
+        ## the results simulated with the old states. The statistics of every node come from
+        ## complete rollouts, which place every vehicle, so they are all forgotten; the simulated
+        ## prefix (sim_state) of a node only depends on the vehicles it places, so it is kept by
+        ## the nodes that place none of the changed vehicles.
+        changed = super().reset_statistics(states)
+        if not changed:
+            return changed
+        changed_mask = 0
+        for idx in changed:
+            changed_mask |= 1 << idx
+        self.best_rollout = None
+        self.rollout_cache.clear()
+        pool = [self.root]
+        while pool:
+            node = pool.pop()
+            node.visits = 0
+            node.score = 0
+            node.total_delay = -1
+            node.best_total_delay = -1
+            if node.placed & changed_mask:
+                node.sim_state = None
+            pool.extend(node.children)
+        return changed
+
+    def get_passing_order(self, node):
+        return [self.all_veh[idx] for idx in node.get_order()]
+
     def get_possible_next_veh(self, node):
-        remain_veh = list(filter(lambda veh: veh not in node.passing_order, self.all_veh))
-        if len(remain_veh) == 0:
-            return []
+        ## the first vehicle of every fleet that still has vehicles to schedule
+        ## return: vehicle indices
         possible_next_veh = []
-        for veh in remain_veh:
-            if veh[3] == 0 or (veh[0], veh[1], veh[2], veh[3]-1) in node.passing_order:
-                possible_next_veh.append(veh)
-        return possible_next_veh
+        for fleet_idx, members in enumerate(self.fleets):
+            if node.progress[fleet_idx] < len(members):
+                possible_next_veh.append(members[node.progress[fleet_idx]])
+        return sorted(possible_next_veh)
+
+    def get_possible_actions(self, node):
+        ## the actions that can extend the passing order of node
+        ## return: vehicle indices, or tuples of vehicle indices for macro actions
+        if self.macro_chunk is None or self.num_veh - node.depth <= MACRO_REFINE_VEH:
+            return self.get_possible_next_veh(node)
+        actions = []
+        for fleet_idx, members in enumerate(self.fleets):
+            progress = node.progress[fleet_idx]
+            if progress < len(members):
+                # a macro action stays within a fleet, it does not run on into the next fleet of the lane
+                end = min(progress+self.macro_chunk, self.fleet_end[members[progress]])
+                actions.append(tuple(members[progress:end]))
+        return sorted(actions)
     
     def print_tree(self):
-        def print_node(node, depth):
-            print("-"*depth, end="")
-            print(node.passing_order)
-            for child in node.children:
-                print_node(child, depth+1)
+        pool = [self.root]
+        while pool:
+            node = pool.pop()
+            print("-"*node.depth, end="")
+            print(self.get_passing_order(node))
+            pool.extend(reversed(node.children))
 
-        print_node(self.root, 0)
+    def prune(self):
+        ## Collapse the expanded nodes with the fewest visits back into leaves until the tree
+        ## fits in PRUNE_TARGET of the node budget. A node never has more visits than its
+        ## parent, so sorting by (visits, -depth) collapses descendants before their ancestors.
+        expanded = []
+        pool = [self.root]
+        while pool:
+            node = pool.pop()
+            if node.children:
+                if node is not self.root:
+                    expanded.append(node)
+                pool.extend(node.children)
+        expanded.sort(key=lambda node: (node.visits, -node.depth))
+        target = int(self.node_budget * PRUNE_TARGET)
+        for node in expanded:
+            if self.num_nodes <= target:
+                break
+            subtree = node.children
+            removed = 0
+            while subtree:
+                child = subtree.pop()
+                removed += 1
+                subtree.extend(child.children)
+            node.children = []
+            self.num_nodes -= removed
+
+    def get_sim_state(self, node):
+        ## the simulator state after the passing order of node
+        ## a child's order is its parent's order plus its action, so only the vehicles
+        ## of the nodes below the closest simulated ancestor have to be simulated
+        path = []
+        while node is not None and node.sim_state is None:
+            path.append(node)
+            node = node.parent
+        if node is None:
+            sim_state = self.init_sim_state()
+        else:
+            sim_state = node.sim_state
+        for node in reversed(path):
+            if type(node.action) is tuple:
+                for idx in node.action:
+                    sim_state, _ = self.extend_sim_state(sim_state, idx)
+            elif node.parent is not None:
+                sim_state, _ = self.extend_sim_state(sim_state, node.action)
+            node.sim_state = sim_state
+        return sim_state
 
     def simulate(self, node):
-        states_list = [self.get_state(veh) for veh in node.passing_order]
-        total_delay, _ = Simulator.simulate_passing_order(node.passing_order,self.conflict_zones,states_list,self.safety_gap,self.my_lane_id,self.my_fleet_id,self.alpha)
-        node.total_delay = total_delay
-
-        remain_veh = list(filter(lambda veh: veh not in node.passing_order, self.all_veh))
-        remain_veh = sorted(remain_veh, key=lambda veh: self.get_dist_to_center(veh))
-        complete_passing_order = node.passing_order + remain_veh
-        states_list = [self.get_state(veh) for veh in complete_passing_order]
-        total_delay_2, _ = Simulator.simulate_passing_order(complete_passing_order,self.conflict_zones,states_list,self.safety_gap,self.my_lane_id,self.my_fleet_id,self.alpha)
-        node.best_total_delay  = total_delay_2
+        sim_state = self.get_sim_state(node)
+        node.total_delay = sim_state[1]
+
+        # complete the order greedily, the result only depends on the prefix
+        key = tuple(node.get_order())
+        if key in self.rollout_cache:
+            self.rollout_cache.move_to_end(key)
+        else:
+            for idx in self.dist_order:
+                if not (node.placed >> idx) & 1:
+                    sim_state, _ = self.extend_sim_state(sim_state, idx)
+            self.rollout_cache[key] = sim_state[1]
+            if len(self.rollout_cache) > ROLLOUT_CACHE_SIZE:
+                self.rollout_cache.popitem(last=False)
+        node.best_total_delay = self.rollout_cache[key]
+        if self.best_rollout is None or node.best_total_delay < self.best_rollout[0]:
+            self.best_rollout = (node.best_total_delay, key)
         return node.normalize_delay()
     
-    def passing_order_to_time_slot(self, passing_order):
-        states_list = [self.get_state(veh) for veh in passing_order]
-        _, t_assign = Simulator.simulate_passing_order(passing_order,self.conflict_zones,states_list,self.safety_gap,self.my_lane_id,self.my_fleet_id,self.alpha)
-        time_slot = dict()
-        for idx, veh in enumerate(passing_order):
-            time_slot[(veh[0],veh[2],veh[3])] = t_assign[idx]
-        return time_slot
+    def complete_order(self, prefix):
+        ## a passing order starting with prefix (vehicle indices), completed greedily like the rollouts
+        placed = set(prefix)
+        order = list(prefix) + [idx for idx in self.dist_order if idx not in placed]
+        return [self.all_veh[idx] for idx in order]
+
+    def get_best_complete_order(self):
+        ## the complete passing order of the best rollout
+        return self.complete_order(self.best_rollout[1])
 
-    def search(self, num_iter):
-        for _ in range(num_iter):
+    def search(self, num_iter, workers=1, time_budget=None):
+        ## run num_iter more iterations on the current tree and return the best passing order
+        ## workers > 1: root parallelization, see parallel_search
+        ## time_budget: stop after this many seconds of wall time (but after at least one iteration)
+        ##              and return the best complete passing order found by the rollouts instead,
+        ##              last_iterations tells how many iterations fit in the budget
+        if workers > 1:
+            return self.parallel_search(num_iter, workers, time_budget)
+        deadline = None if time_budget is None else time.perf_counter() + time_budget
+        done = 0
+        while done < num_iter:
+            if deadline is not None and done > 0 and time.perf_counter() >= deadline:
+                break
+            done += 1
             node = self.select_node()
             node = self.expand_node(node)
             if node:
                 score = self.simulate(node)
                 node.backpropagate(score)
+            if self.node_budget is not None and self.num_nodes > self.node_budget:
+                self.prune()
             # self.print_tree()
+        self.iterations += done
+        self.last_iterations = done
+        if time_budget is not None and self.best_rollout is not None:
+            return self.get_best_complete_order()
         
         ## get best passing order
+        ## (completed greedily if the tree is not as deep as the number of vehicles yet)
         node = self.root
         while node.children:
-            best_score = -1
-            best_node = None
-            for child in node.children:
-                if child.score > best_score:
-                    best_score = child.score
-                    best_node = child
-            node = best_node
-        return node.passing_order
+            node = max(node.children, key=lambda child: child.score)
+        return self.complete_order(node.get_order())
+
 
+    def export_statistics(self):
+        ## return: a list of (actions from the root, visits, score) of all visited nodes
+        statistics = []
+        pool = [self.root]
+        while pool:
+            node = pool.pop()
+            if node.visits > 0:
+                statistics.append((tuple(node.get_path()), node.visits, node.score))
+            pool.extend(node.children)
+        return statistics
+
+    def import_statistics(self, statistics):
+        ## grow the tree along the action paths of statistics (see export_statistics) and set the
+        ## visits and score of their nodes, every node on the way is expanded like in expand_node
+        for (path, visits, score) in sorted(statistics, key=lambda item: len(item[0])):
+            node = self.root
+            for action in path:
+                if not node.children:
+                    self.expand_children(node)
+                node = next(child for child in node.children if child.action == action)
+            node.visits = visits
+            node.score = score
+
+    def parallel_search(self, num_iter, workers, time_budget=None):
+        ## Root parallelization: every worker process starts from the current tree (its visited
+        ## nodes, see export_statistics) and grows it with num_iter iterations and its own seed.
+        ## The trees are merged by summing the visits that each worker added to identical action
+        ## paths, the merged tree replaces the current one (the next search goes on from it) and
+        ## the best passing order follows the most visited child from the root.
+        ## Deterministic if the scheduler has a seed (and no time budget).
+        ## time_budget: every worker searches for at most this many seconds, the best completed
+        ##              rollout of all the workers is returned
+        seeds = [self.rng.randrange(2**32) for _ in range(workers)]
+        seed_statistics = self.export_statistics()
+        pool = get_pool(workers)
+        futures = [pool.submit(search_worker, self.conflict_zones, self.states, self.safety_gap,
+                               self.my_lane_id, self.my_fleet_id, self.alpha, seed, self.node_budget,
+                               self.macro_chunk, self.t_now, self.committed, num_iter, time_budget, seed_statistics)
+                   for seed in seeds]
+        seed_visits = {path: node_visits for (path, node_visits, _) in seed_statistics}
+        visits = dict(seed_visits)
+        scores = {path: (node_visits, score) for (path, node_visits, score) in seed_statistics}
+        worker_iterations = []
+        for future in futures:
+            statistics, iterations, best_rollout = future.result()
+            for (path, node_visits, score) in statistics:
+                # a worker may have pruned some of the seeded nodes
+                visits[path] = visits.get(path, 0) + max(node_visits - seed_visits.get(path, 0), 0)
+                if path not in scores or node_visits > scores[path][0]:
+                    scores[path] = (node_visits, score)
+            worker_iterations.append(iterations)
+            if best_rollout is not None and (self.best_rollout is None or best_rollout[0] < self.best_rollout[0]):
+                self.best_rollout = best_rollout
+        self.iterations += min(worker_iterations)
+        self.last_iterations = sum(worker_iterations)
+        self.root = Node(progress=tuple([0]*len(self.fleets)))
+        self.num_nodes = 1
+        self.import_statistics([(path, visits[path], scores[path][1]) for path in visits if visits[path] > 0])
+        if self.node_budget is not None and self.num_nodes > self.node_budget:
+            self.prune()
+        if time_budget is not None and self.best_rollout is not None:
+            return self.get_best_complete_order()
+
+        children = dict()
+        for path in visits:
+            if path:
+                children.setdefault(path[:-1], []).append(path)
+        path = ()
+        while path in children:
+            path = max(sorted(children[path]), key=lambda child: visits[child])
+        passing_order = []
+        for action in path:
+            passing_order.extend(action if type(action) is tuple else (action,))
+        return self.complete_order(passing_order)
 
     def select_node(self):
         node = self.root
@@ -200,19 +588,27 @@ class Scheduler():
             node = node.select()
         return node
 
+    def expand_children(self, node):
+        ## add a child to node for every possible action, return False for a leaf
+        possible_actions = self.get_possible_actions(node)
+        for action in possible_actions:
+            if type(action) is tuple:
+                fleet_idx, count = self.fleet_of[action[0]], len(action)
+            else:
+                fleet_idx, count = self.fleet_of[action], 1
+            progress = node.progress[:fleet_idx] + (node.progress[fleet_idx]+count,) + node.progress[fleet_idx+1:]
+            node.expand(action, progress)
+        self.num_nodes += len(node.children)
+        return bool(possible_actions)
+
     def expand_node(self, node):
         if not node.children:
-            possible_next_veh = self.get_possible_next_veh(node)
-            if not possible_next_veh: # leaf node:
+            if not self.expand_children(node): # leaf node:
                 return node
-            for veh in possible_next_veh:
-                next_order = deepcopy(node.passing_order)
-                next_order.append(veh)
-                node.expand(next_order)
         assert node.children
 
         unvisited_children = list(filter(lambda x: x.visits == 0, node.children))
         assert len(unvisited_children) > 0
-        return random.choice(unvisited_children)
+        return self.rng.choice(unvisited_children)
 
  
\ No newline at end of file
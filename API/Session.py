@@ -0,0 +1,174 @@
+import json
+import threading
+from multiprocessing import Process, Queue
+from typing import Callable
+from .Transport import key_matches, InprocSample
+
+## How the vehicle processes of the process engine reach each other.
+##   peer: one zenoh peer session per vehicle (every pair of sessions discovers each other)
+##   client: one zenoh client session per vehicle, connected to a router (zenohd) at router
+##   shared: one broker process per host routes the messages of all its vehicles (no zenoh),
+##           every vehicle talks to it over a pair of local queues
+## The sessions of all modes offer the part of zenoh.Session used by API/Vehicle.py.
+SESSION_MODES = ["peer", "client", "shared"]
+DEFAULT_ROUTER = "tcp/127.0.0.1:7447"
+
+
+class SessionFactory():
+    ## created by the main process (before the vehicle processes, which receive it) and
+    ## used by each vehicle process to open its session
+    def __init__(self, mode: str = "peer", num_sessions: int = 1, router: str = DEFAULT_ROUTER):
+        if mode not in SESSION_MODES:
+            raise ValueError(f"unknown session mode {mode}")
+        self.mode = mode
+        self.router = router
+        self.broker = SessionBroker(num_sessions) if mode == "shared" else None
+        self.requests = self.broker.requests if self.broker else None
+        self.inboxes = self.broker.inboxes if self.broker else None
+
+    def __getstate__(self):
+        # the vehicle processes only need the queues of the broker
+        state = dict(self.__dict__)
+        state['broker'] = None
+        return state
+
+    def open(self, session_id: int):
+        ## session_id: in [0, num_sessions), one per vehicle process
+        if self.mode != "shared":
+            import zenoh # only the zenoh modes need it
+        if self.mode == "peer":
+            return zenoh.open()
+        elif self.mode == "client":
+            conf = zenoh.Config()
+            conf.insert_json5("mode", json.dumps("client"))
+            conf.insert_json5("connect/endpoints", json.dumps([self.router]))
+            return zenoh.open(conf)
+        else:
+            return BrokerSession(self.requests, self.inboxes[session_id], session_id)
+
+    def close(self):
+        ## to be called by the main process once all the vehicle processes have ended
+        if self.broker is not None:
+            self.broker.close()
+
+
+class SessionBroker():
+    ## the router of the shared mode: a process that owns the subscriptions of all the sessions
+    ## and forwards every put to the inbox of each session with a matching subscriber
+    def __init__(self, num_sessions: int):
+        self.requests = Queue()
+        self.inboxes = [Queue() for _ in range(num_sessions)]
+        self.process = Process(target=run_broker, args=(self.requests, self.inboxes), daemon=True)
+        self.process.start()
+
+    def close(self):
+        self.requests.put(None)
+        self.process.join()
+
+def run_broker(requests, inboxes):
+    ## requests: ("sub", session_id, sub_id, key_expr), ("unsub", session_id, sub_id),
+    ##           ("put", key, payload) or ("close", session_id); None stops the broker
+    ## inboxes: receive (sub_id, key, payload) samples, (sub_id, None, None) acknowledges a
+    ##          subscription and None closes the session
+    subscribers = dict() # (session_id, sub_id) -> key_expr
+    routes = dict() # key -> matching (session_id, sub_id), rebuilt lazily
+    while True:
+        request = requests.get()
+        if request is None:
+            break
+        if request[0] == "put":
+            _, key, payload = request
+            if key not in routes:
+                routes[key] = [sub for sub, key_expr in subscribers.items() if key_matches(key_expr, key)]
+            for session_id, sub_id in routes[key]:
+                inboxes[session_id].put((sub_id, key, payload))
+        elif request[0] == "sub":
+            _, session_id, sub_id, key_expr = request
+            subscribers[(session_id, sub_id)] = key_expr
+            routes.clear()
+            inboxes[session_id].put((sub_id, None, None))
+        elif request[0] == "unsub":
+            _, session_id, sub_id = request
+            subscribers.pop((session_id, sub_id), None)
+            routes.clear()
+        elif request[0] == "close":
+            session_id = request[1]
+            for sub in [sub for sub in subscribers if sub[0] == session_id]:
+                del subscribers[sub]
+            routes.clear()
+            inboxes[session_id].put(None)
+
+
+class BrokerPublisher():
+    def __init__(self, session, key: str):
+        self.session = session
+        self.key = key
+
+    def put(self, value):
+        self.session.put(self.key, value)
+
+    def undeclare(self):
+        pass
+
+
+class BrokerSubscriber():
+    def __init__(self, session, sub_id: int, key_expr: str, listener: Callable):
+        self.session = session
+        self.sub_id = sub_id
+        self.key_expr = key_expr
+        self.listener = listener
+
+    def undeclare(self):
+        self.session.listeners.pop(self.sub_id, None)
+        self.session.requests.put(("unsub", self.session.session_id, self.sub_id))
+
+
+class BrokerSession():
+    ## a session of the shared mode, opened in a vehicle process
+    ## Like zenoh, the listeners are called from a background thread of the session.
+    def __init__(self, requests, inbox, session_id: int):
+        self.requests = requests
+        self.inbox = inbox
+        self.session_id = session_id
+        self.listeners = dict() # sub_id -> listener
+        self.acks = dict() # sub_id -> threading.Event set when the broker has the subscription
+        self.next_sub_id = 0
+        self.thread = threading.Thread(target=self._receive, daemon=True)
+        self.thread.start()
+
+    def declare_publisher(self, key: str):
+        return BrokerPublisher(self, key)
+
+    def declare_subscriber(self, key_expr: str, listener: Callable, **kwargs):
+        ## return once the broker has registered the subscription, so that every message
+        ## put after this call is received
+        sub_id = self.next_sub_id
+        self.next_sub_id += 1
+        self.listeners[sub_id] = listener
+        self.acks[sub_id] = threading.Event()
+        self.requests.put(("sub", self.session_id, sub_id, key_expr))
+        self.acks[sub_id].wait()
+        del self.acks[sub_id]
+        return BrokerSubscriber(self, sub_id, key_expr, listener)
+
+    def put(self, key: str, value):
+        if isinstance(value, str):
+            value = value.encode('utf-8')
+        self.requests.put(("put", key, bytes(value)))
+
+    def close(self):
+        self.requests.put(("close", self.session_id))
+        self.thread.join()
+
+    def _receive(self):
+        while True:
+            message = self.inbox.get()
+            if message is None:
+                break
+            sub_id, key, payload = message
+            if key is None:
+                self.acks[sub_id].set()
+                continue
+            listener = self.listeners.get(sub_id)
+            if listener is not None:
+                listener(InprocSample(key, payload))
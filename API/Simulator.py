@@ -1,47 +1,219 @@
 import math
 from typing import List, Dict
+from collections import namedtuple
 import copy
+import numpy as np
 from . import math_utils
 CONFLICT_ZONE_SIZE = 4
 
+def init_sim_state(conflict_zones: list[tuple], t_max: list = None):
+    ## the state of an empty passing order: (t_max, total_delay)
+    ## t_max: the latest time that each conflict zone has been occupied (None: never)
+    if t_max is None:
+        t_max = [None]*len(conflict_zones)
+    return (tuple(t_max), 0)
+
+def committed_t_max(conflict_zones: list[tuple], committed):
+    ## the t_max of the time slots already committed to other vehicles (rolling-horizon scheduling)
+    ## committed: an iterable of time assignments (one time per conflict zone, -1: zone not crossed)
+    ## Return: a t_max for init_sim_state, None if nothing is committed
+    t_max = [None]*len(conflict_zones)
+    for t_assign in committed:
+        for zone_idx, t in enumerate(t_assign):
+            if t >= 0 and (t_max[zone_idx] is None or t > t_max[zone_idx]):
+                t_max[zone_idx] = t
+    if all(t is None for t in t_max):
+        return None
+    return t_max
+
+def late_t_assign(conflict_zones: list[tuple], lane_id: int, t_assign: list, state: dict, t_now: float, acceleration: float):
+    ## the time assignment committed to a vehicle still crossing, pushed back to when it can leave its
+    ## conflict zones at the earliest from its state at t_now: a late vehicle leaves them after its slots
+    ## lane_id: the lane of the vehicle, state: its state at t_now
+    ## acceleration: the max tangential acceleration, a zone takes CONFLICT_ZONE_SIZE m to cross
+    zone_idx_list = math_utils.get_conflict_zone_idx(lane_id, state['des_lane_id'])
+    location = state['location']
+    speed = math_utils.vector_length(state['velocity'][0], state['velocity'][1])
+    reached = math_utils.get_zones_entered(conflict_zones, zone_idx_list, location)
+    if reached == 0:
+        distance = math_utils.distance_to_zone(conflict_zones[zone_idx_list[0]], location)
+    else:
+        distance = 0
+    t_assign = list(t_assign)
+    for k in range(max(reached-1, 0), len(zone_idx_list)):
+        distance += CONFLICT_ZONE_SIZE
+        zone_idx = zone_idx_list[k]
+        t_leave = t_now + math_utils.arrival_time(distance, speed, acceleration)
+        if t_assign[zone_idx] >= 0 and t_assign[zone_idx] < t_leave:
+            t_assign[zone_idx] = t_leave
+    return t_assign
+
+def extend_passing_order(sim_state: tuple, veh: tuple, conflict_zones: list[tuple], state: dict, safety_gap: float, lane_id, fleet_id, alpha):
+    ## let one more vehicle pass after the passing order summarized by sim_state
+    ## costs O(zones) whatever the length of the passing order
+    ## veh: (lane_id, des_lane_id, fleet_id, vehicle_id), state: its state
+    ## Return: the new sim_state, the t_assign of veh
+    row = vehicle_row(veh, conflict_zones, state, lane_id, fleet_id, alpha)
+    return extend_row(sim_state, row, len(conflict_zones), safety_gap)
+
+def extend_passing_order_batch(sim_state: tuple, vehs: list[tuple], conflict_zones: list[tuple], states: list[dict], safety_gap: float, lane_id, fleet_id, alpha):
+    ## let the vehicles of vehs pass one after another after the passing order summarized by sim_state
+    ## (e.g. a chunk of a fleet), states: their states
+    ## Return: the new sim_state, the list of t_assign of vehs
+    t_assign = []
+    for idx, veh in enumerate(vehs):
+        sim_state, veh_t_assign = extend_passing_order(sim_state, veh, conflict_zones, states[idx], safety_gap, lane_id, fleet_id, alpha)
+        t_assign.append(veh_t_assign)
+    return sim_state, t_assign
+
 def simulate_passing_order(order: list[tuple], conflict_zones: list[tuple], states: list[dict], safety_gap: float, lane_id, fleet_id, alpha):
     ## order: a list of tuples (lane_id, des_lane_id, fleet_id, vehicle_id)
     ## conflict_zones: a list of tuples (x_min, y_min, x_max, y_max)
     ## states: a list of dict {"location": (...), "velocity": (...), "acceleration": (...)}
     ## safety_gap: min safety gap between two consecutive vehicles passing through the same conflict zone
     ## Return t_assign: list, total_delay: float
-    t_assign = []
-    t_max = [None]*len(conflict_zones) ## the latest time that each conflict zone has been occupied
-    for idx, veh in enumerate(order):
-        t_assign.append([-1]*len(conflict_zones))
-        zone_idx_list = math_utils.get_conflict_zone_idx(veh[0], veh[1])
-        for zone_idx_idx, zone_idx in enumerate(zone_idx_list):
-            location = states[idx]['location']
-            velocity = states[idx]['velocity']
-            speed = math_utils.vector_length(velocity[0],velocity[1])
-            if zone_idx_idx == 0:
-                t_min = math_utils.arrival_time_for_zone(location,speed,conflict_zones,zone_idx_list,zone_idx_idx)
-            else:
-                t_min = t_assign[-1][zone_idx_list[zone_idx_idx-1]] + 2*CONFLICT_ZONE_SIZE/speed
-            if t_max[zone_idx] == None:
-                t_assign[-1][zone_idx] = t_min
-            else:
-                t_assign[-1][zone_idx] = max(t_min, t_max[zone_idx] + safety_gap + 2*CONFLICT_ZONE_SIZE/speed)
-                if t_assign[-1][zone_idx] > t_min:
-                    t_assign[-1][zone_idx_list[zone_idx_idx-1]] = t_max[zone_idx] + safety_gap
-        for zone_idx in zone_idx_list:
-            t_max[zone_idx] = t_assign[-1][zone_idx]
+    sim_state, t_assign = extend_passing_order_batch(init_sim_state(conflict_zones), order, conflict_zones, states, safety_gap, lane_id, fleet_id, alpha)
     assert len(t_assign) == len(order)
+    total_delay = sim_state[1]
+    return total_delay, t_assign
 
-    total_delay = 0
-    for idx in range(len(order)):
-        speed = math_utils.vector_length(states[idx]['velocity'][0],states[idx]['velocity'][1])
-        location = states[idx]['location']
-        t_min =math_utils.get_min_arrival_time(conflict_zones,order[idx][0],order[idx][1],location,speed)
-        if order[idx][0] == lane_id and order[idx][2] == fleet_id:
-            total_delay += alpha * (max(t_assign[idx]) - t_min)
+
+## the constants of a vehicle in the recurrence of extend_row
+##   route: the zones crossed in order, t_first: arrival time at the first zone,
+##   cross: time to cross a zone (2*CONFLICT_ZONE_SIZE/speed), t_min: min arrival time at the exit,
+##   weight: alpha for the vehicles of (lane_id, fleet_id), 1 otherwise
+VehicleRow = namedtuple("VehicleRow", ["route", "t_first", "cross", "t_min", "weight"])
+
+def vehicle_row(veh: tuple, conflict_zones: list[tuple], state: dict, lane_id, fleet_id, alpha, t_now: float = 0):
+    ## veh: (lane_id, des_lane_id, fleet_id, vehicle_id), state: its state at t_now
+    ## t_first and t_min are absolute times from t_now
+    zone_idx_list = tuple(math_utils.get_conflict_zone_idx(veh[0], veh[1]))
+    location = state['location']
+    velocity = state['velocity']
+    speed = math_utils.vector_length(velocity[0],velocity[1])
+    t_first = t_now + math_utils.arrival_time_for_zone(location,speed,conflict_zones,zone_idx_list,0)
+    t_min = t_now + math_utils.get_min_arrival_time(conflict_zones,veh[0],veh[1],location,speed)
+    weight = alpha if veh[0] == lane_id and veh[2] == fleet_id else 1
+    return VehicleRow(zone_idx_list, t_first, 2*CONFLICT_ZONE_SIZE/speed, t_min, weight)
+
+def extend_row(sim_state: tuple, row: VehicleRow, num_zones: int, safety_gap: float):
+    ## the scalar recurrence of extend_passing_order and extend_from_table (simulate_orders vectorizes it)
+    ## Return: the new sim_state, the t_assign of the vehicle
+    zone_idx_list = row.route
+    t_max = list(sim_state[0])
+    t_assign = [-1]*num_zones
+    for zone_idx_idx, zone_idx in enumerate(zone_idx_list):
+        if zone_idx_idx == 0:
+            t_zone = row.t_first
         else:
-            total_delay += (max(t_assign[idx]) - t_min)
-    return total_delay, t_assign
+            t_zone = t_assign[zone_idx_list[zone_idx_idx-1]] + row.cross
+        if t_max[zone_idx] == None:
+            t_assign[zone_idx] = t_zone
+        else:
+            t_assign[zone_idx] = max(t_zone, t_max[zone_idx] + safety_gap + row.cross)
+            if t_assign[zone_idx] > t_zone:
+                t_assign[zone_idx_list[zone_idx_idx-1]] = t_max[zone_idx] + safety_gap
+    for zone_idx in zone_idx_list:
+        t_max[zone_idx] = t_assign[zone_idx]
+    if row.weight == 1:
+        delay = max(t_assign) - row.t_min
+    else:
+        delay = row.weight * (max(t_assign) - row.t_min)
+    return (tuple(t_max), sim_state[1] + delay), t_assign
+
 
+class VehicleTable():
+    ## Immutable per-vehicle constants of extend_passing_order, computed once for a set of vehicles
+    ## and indexed like vehs. The arrays (read-only) serve simulate_orders, the rows (VehicleRow)
+    ## serve extend_from_table.
+    ##   speed, dist_to_center: of the current state
+    ##   route: (vehicles x 3) zones crossed in order, padded with -1, last_zone: the last of them
+    ##   t_first, cross, t_min, weight: the fields of the rows, see VehicleRow
+    ##   index: (lane_id, fleet_id, vehicle_id) -> index
+    def __init__(self, vehs: list[tuple], conflict_zones: list[tuple], states: list[dict], lane_id, fleet_id, alpha, t_now: float = 0):
+        ## vehs: a list of tuples (lane_id, des_lane_id, fleet_id, vehicle_id), states: their states
+        ## t_now: the time of the states, t_first and t_min are absolute times from it
+        num_veh = len(vehs)
+        self.num_zones = len(conflict_zones)
+        self.index = dict()
+        rows = []
+        speed = []
+        dist_to_center = []
+        for idx, veh in enumerate(vehs):
+            location = states[idx]['location']
+            velocity = states[idx]['velocity']
+            rows.append(vehicle_row(veh, conflict_zones, states[idx], lane_id, fleet_id, alpha, t_now))
+            speed.append(math_utils.vector_length(velocity[0],velocity[1]))
+            dist_to_center.append(math_utils.euclidean_dist((0,0),location))
+            self.index[(veh[0],veh[2],veh[3])] = idx
+        self.rows = tuple(rows)
+        self.speed = self._freeze(np.array(speed, dtype=float))
+        self.dist_to_center = self._freeze(np.array(dist_to_center, dtype=float))
+        route = np.full((num_veh, 3), -1, dtype=np.intp)
+        for idx, row in enumerate(rows):
+            route[idx, :len(row.route)] = row.route
+        self.route = self._freeze(route)
+        self.last_zone = self._freeze(np.array([row.route[-1] for row in rows], dtype=np.intp))
+        self.t_first = self._freeze(np.array([row.t_first for row in rows], dtype=float))
+        self.cross = self._freeze(np.array([row.cross for row in rows], dtype=float))
+        self.t_min = self._freeze(np.array([row.t_min for row in rows], dtype=float))
+        self.weight = self._freeze(np.array([row.weight for row in rows], dtype=float))
+
+    @staticmethod
+    def _freeze(array):
+        array.setflags(write=False)
+        return array
 
+def extend_from_table(sim_state: tuple, idx: int, table: VehicleTable, safety_gap: float):
+    ## extend_passing_order for the vehicle idx of table, without recomputing its constants
+    ## Return: the new sim_state, the t_assign of the vehicle
+    return extend_row(sim_state, table.rows[idx], table.num_zones, safety_gap)
+
+def simulate_orders(orders, table: VehicleTable, safety_gap: float, sim_state: tuple = None, return_t_assign: bool = False):
+    ## evaluate many passing orders at once, the recurrence of extend_row vectorized over the orders
+    ## (offline evaluation and tests, see Scheduler.evaluate_orders)
+    ## orders: (orders x positions) integer matrix of vehicle indices into table
+    ##         (the positions may cover only a part of the vehicles)
+    ## sim_state: the state every order starts from (default: empty intersection)
+    ## Return total_delay: (orders,) array, t_assign: (orders x positions x zones) array (-1: zone not crossed)
+    ##        or None if not return_t_assign
+    orders = np.asarray(orders, dtype=np.intp)
+    num_orders, num_pos = orders.shape
+    num_zones = table.num_zones
+    if sim_state is None:
+        sim_state = init_sim_state([None]*num_zones)
+    t_max = np.tile(np.array([np.nan if t is None else t for t in sim_state[0]], dtype=float), (num_orders, 1))
+    total_delay = np.full(num_orders, float(sim_state[1]))
+    t_assign = np.full((num_orders, num_pos, num_zones), -1.0) if return_t_assign else None
+    rows = np.arange(num_orders)
+    for pos in range(num_pos):
+        veh = orders[:, pos]
+        route = table.route[veh]
+        cross = table.cross[veh]
+        cur = np.full((num_orders, num_zones), -1.0)
+        crossed = np.zeros((num_orders, num_zones), dtype=bool)
+        prev_zone = None
+        for step in range(route.shape[1]):
+            valid = route[:, step] >= 0
+            if not valid.any():
+                break
+            zone = np.where(valid, route[:, step], 0)
+            if step == 0:
+                t_min = table.t_first[veh]
+                back_zone = table.last_zone[veh] # zone_idx_list[-1] in extend_passing_order
+            else:
+                t_min = cur[rows, prev_zone] + cross
+                back_zone = prev_zone
+            t_old = t_max[rows, zone]
+            free = np.isnan(t_old)
+            t_new = np.where(free, t_min, np.maximum(t_min, t_old + safety_gap + cross))
+            cur[rows[valid], zone[valid]] = t_new[valid]
+            crossed[rows[valid], zone[valid]] = True
+            late = valid & ~free & (t_new > t_min)
+            cur[rows[late], back_zone[late]] = (t_old + safety_gap)[late]
+            prev_zone = zone
+        t_max[crossed] = cur[crossed]
+        total_delay += table.weight[veh] * (cur.max(axis=1) - table.t_min[veh])
+        if return_t_assign:
+            t_assign[:, pos] = cur
+    return total_delay, t_assign
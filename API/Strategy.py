@@ -0,0 +1,152 @@
+import math
+import time
+from typing import List
+from .Scheduler import BaseScheduler, Scheduler
+
+## Search strategies of the leaders, all with the interface of BaseScheduler:
+##   mcts:   Monte Carlo tree search (Scheduler.py), anytime, for large schedule groups
+##   bnb:    exact depth-first branch and bound, for small schedule groups
+##   greedy: first come first served, a single passing order in O(vehicles x fleets)
+##   auto:   branch and bound for small schedule groups, MCTS for the others
+## Greedy is also the first incumbent of branch and bound. See bench_strategies.py.
+BNB_MAX_VEH = 12 # auto uses branch and bound up to this many vehicles (proven optimal in tens of ms)
+
+
+class GreedyScheduler(BaseScheduler):
+    ## Let the vehicles pass in the order they reach their first conflict zone,
+    ## the vehicles of a fleet keep their order.
+    name = "greedy"
+
+    def get_order(self) -> List[int]:
+        ## return: vehicle indices
+        arrival = self.vehicle_table.t_first.tolist()
+        progress = [0]*len(self.fleets)
+        order = []
+        while len(order) < self.num_veh:
+            best_fleet = None
+            for fleet_idx, members in enumerate(self.fleets):
+                if progress[fleet_idx] < len(members):
+                    idx = members[progress[fleet_idx]]
+                    if best_fleet is None or arrival[idx] < arrival[self.fleets[best_fleet][progress[best_fleet]]]:
+                        best_fleet = fleet_idx
+            order.append(self.fleets[best_fleet][progress[best_fleet]])
+            progress[best_fleet] += 1
+        return order
+
+    def search(self, num_iter, workers=1, time_budget=None):
+        self.last_iterations = 1
+        self.iterations += 1
+        self.exhausted = True
+        return [self.all_veh[idx] for idx in self.get_order()]
+
+
+class BranchAndBoundScheduler(GreedyScheduler):
+    ## Depth-first branch and bound over the passing orders that keep the order of every fleet.
+    ## Lower bound of a partial order: its delay plus, for every fleet, the delay of its remaining
+    ## vehicles passing right after the partial order, one after another. Letting more vehicles pass
+    ## first only makes the conflict zones free later, so the bound never overestimates.
+    ## A partial order is also dropped if another one with the same vehicles frees every zone no
+    ## later with no more delay. The greedy order is the first incumbent.
+    name = "bnb"
+
+    def __init__(self, conflict_zones: list, states: dict, safety_gap: float, my_lane_id: int, my_fleet_id: int, alpha: float,
+                 seed: int = None, node_budget: int = None, macro_chunk: int = None, t_now: float = 0, committed: list = None):
+        ## node_budget: max number of expanded partial orders, the best order found so far is returned beyond it
+        super().__init__(conflict_zones, states, safety_gap, my_lane_id, my_fleet_id, alpha, seed, node_budget, macro_chunk,
+                         t_now, committed)
+        self.best_delay = None
+        self.num_expanded = 0
+
+    def lower_bound(self, sim_state, progress) -> float:
+        bound = sim_state[1]
+        for fleet_idx, members in enumerate(self.fleets):
+            fleet_state = (sim_state[0], 0)
+            for idx in members[progress[fleet_idx]:]:
+                fleet_state, _ = self.extend_sim_state(fleet_state, idx)
+            bound += fleet_state[1]
+        return bound
+
+    def dominated(self, seen: dict, progress, sim_state) -> bool:
+        t_max, delay = sim_state
+        t_max = [-math.inf if t is None else t for t in t_max]
+        for other_t_max, other_delay in seen.get(progress, []):
+            if other_delay <= delay and all(a <= b for a, b in zip(other_t_max, t_max)):
+                return True
+        seen.setdefault(progress, []).append((t_max, delay))
+        return False
+
+    def search(self, num_iter, workers=1, time_budget=None):
+        ## num_iter and workers are ignored, the search ends when the best order is proven optimal,
+        ## or at time_budget / node_budget with the best order found so far
+        deadline = None if time_budget is None else time.perf_counter() + time_budget
+        best_order = self.get_order()
+        sim_state = self.init_sim_state()
+        for idx in best_order:
+            sim_state, _ = self.extend_sim_state(sim_state, idx)
+        best_delay = sim_state[1]
+
+        progress = tuple([0]*len(self.fleets))
+        root_state = self.init_sim_state()
+        stack = [(self.lower_bound(root_state, progress), root_state, progress, ())]
+        seen = dict()
+        expanded = 0
+        interrupted = False
+        while stack:
+            bound, sim_state, progress, order = stack.pop()
+            if bound >= best_delay:
+                continue
+            if (self.node_budget is not None and expanded >= self.node_budget) or \
+               (deadline is not None and time.perf_counter() >= deadline):
+                interrupted = True
+                break
+            expanded += 1
+            children = []
+            for fleet_idx, members in enumerate(self.fleets):
+                if progress[fleet_idx] == len(members):
+                    continue
+                idx = members[progress[fleet_idx]]
+                child_state, _ = self.extend_sim_state(sim_state, idx)
+                child_order = order + (idx,)
+                if len(child_order) == self.num_veh:
+                    if child_state[1] < best_delay:
+                        best_delay = child_state[1]
+                        best_order = list(child_order)
+                    continue
+                child_progress = progress[:fleet_idx] + (progress[fleet_idx]+1,) + progress[fleet_idx+1:]
+                child_bound = self.lower_bound(child_state, child_progress)
+                if child_bound < best_delay and not self.dominated(seen, child_progress, child_state):
+                    children.append((child_bound, child_state, child_progress, child_order))
+            # visit the child with the lowest bound first
+            children.sort(key=lambda child: child[0], reverse=True)
+            stack.extend(children)
+
+        self.best_delay = best_delay
+        self.num_expanded = expanded
+        self.last_iterations = expanded
+        self.iterations += expanded
+        self.exhausted = not interrupted
+        return [self.all_veh[idx] for idx in best_order]
+
+
+STRATEGIES = {
+    "mcts": Scheduler,
+    "bnb": BranchAndBoundScheduler,
+    "greedy": GreedyScheduler,
+}
+
+def choose_strategy(strategy: str, num_veh: int) -> str:
+    if strategy != "auto":
+        return strategy
+    if num_veh <= BNB_MAX_VEH:
+        return "bnb"
+    return "mcts"
+
+def create_scheduler(strategy: str, conflict_zones: list, states: dict, safety_gap: float, my_lane_id: int, my_fleet_id: int,
+                     alpha: float, seed: int = None, node_budget: int = None, macro_chunk: int = None,
+                     t_now: float = 0, committed: list = None) -> BaseScheduler:
+    ## strategy: one of STRATEGIES or "auto"
+    ## macro_chunk: only used by MCTS, see Scheduler
+    ## t_now, committed: rolling-horizon scheduling, see BaseScheduler
+    scheduler_class = STRATEGIES[choose_strategy(strategy, len(states))]
+    return scheduler_class(conflict_zones, states, safety_gap, my_lane_id, my_fleet_id, alpha, seed, node_budget, macro_chunk,
+                           t_now, committed)
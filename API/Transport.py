@@ -0,0 +1,161 @@
+import random
+from collections import deque
+from typing import Callable, List
+
+def key_matches(key_expr: str, key: str) -> bool:
+    ## zenoh-like key expression matching
+    ## '*' matches exactly one chunk, '**' matches zero or more chunks
+    return _chunks_match(key_expr.split('/'), key.split('/'))
+
+def _chunks_match(expr: List[str], chunks: List[str]) -> bool:
+    if not expr:
+        return not chunks
+    if expr[0] == '**':
+        for i in range(len(chunks)+1):
+            if _chunks_match(expr[1:], chunks[i:]):
+                return True
+        return False
+    if not chunks:
+        return False
+    if expr[0] == '*' or expr[0] == chunks[0]:
+        return _chunks_match(expr[1:], chunks[1:])
+    return False
+
+
+class InprocSample():
+    def __init__(self, key_expr: str, payload: bytes):
+        self.key_expr = key_expr
+        self.payload = payload
+        self.kind = "PUT"
+
+
+try:
+    from zenoh import Reliability, Sample
+except ImportError:
+    # zenoh is optional with the in-memory transport, these stand in for the names API/Vehicle.py uses
+    class Reliability():
+        @staticmethod
+        def RELIABLE():
+            return "RELIABLE"
+
+        @staticmethod
+        def BEST_EFFORT():
+            return "BEST_EFFORT"
+
+    Sample = InprocSample
+
+
+class InprocPublisher():
+    def __init__(self, bus, key: str):
+        self.bus = bus
+        self.key = key
+
+    def put(self, value):
+        self.bus.put(self.key, value)
+
+    def undeclare(self):
+        pass
+
+
+class InprocSubscriber():
+    def __init__(self, bus, key_expr: str, listener: Callable):
+        self.bus = bus
+        self.key_expr = key_expr
+        self.listener = listener
+
+    def undeclare(self):
+        self.bus.subscribers.remove(self)
+        self.bus.routes.clear()
+
+
+class InprocSession():
+    ## mimics the part of zenoh.Session used by API/Vehicle.py
+    def __init__(self, bus):
+        self.bus = bus
+
+    def declare_publisher(self, key: str):
+        return InprocPublisher(self.bus, key)
+
+    def declare_subscriber(self, key_expr: str, listener: Callable, **kwargs):
+        subscriber = InprocSubscriber(self.bus, key_expr, listener)
+        self.bus.subscribers.append(subscriber)
+        self.bus.routes.clear()
+        return subscriber
+
+    def put(self, key: str, value):
+        self.bus.put(key, value)
+
+    def close(self):
+        pass
+
+
+BUS_DELIVERIES = ["queued", "sync"]
+
+class InprocBus():
+    ## In-memory message bus shared by all vehicles of the in-process engine, deterministic
+    ## for a given seed: the listeners run in the thread of the engine, in the order the
+    ## messages were put and the subscribers declared.
+    ## delivery: queued: the messages put during a round are delivered by deliver(),
+    ##           which the engine calls once at the end of every round
+    ##           sync: a message is delivered to the listeners within put
+    ## latency: rounds (calls of deliver) a queued message waits before its delivery
+    ## loss: probability that a subscriber misses a message whose key matches one of lossy_keys
+    def __init__(self, delivery: str = "queued", latency: int = 0, loss: float = 0,
+                 lossy_keys: List[str] = ("**",), seed: int = None):
+        if delivery not in BUS_DELIVERIES:
+            raise ValueError(f"unknown delivery {delivery}")
+        if latency < 0 or (latency > 0 and delivery == "sync"):
+            raise ValueError(f"invalid latency {latency} for {delivery} delivery")
+        if not 0 <= loss < 1:
+            raise ValueError(f"invalid loss probability {loss}")
+        self.subscribers = []
+        self.routes = dict() # key -> matching subscribers, rebuilt lazily
+        self.pending = deque() # (round of delivery, key, payload) in the order of put
+        self.delivery = delivery
+        self.latency = latency
+        self.loss = loss
+        self.lossy_keys = list(lossy_keys)
+        self.lossy = dict() # key -> whether it matches lossy_keys
+        self.rng = random.Random(seed)
+        self.cur_round = 0
+        self.num_delivered = 0
+        self.num_lost = 0
+
+    def open_session(self):
+        return InprocSession(self)
+
+    def put(self, key: str, value):
+        if isinstance(value, str):
+            value = value.encode('utf-8')
+        if self.delivery == "sync":
+            self.dispatch(key, value)
+        else:
+            self.pending.append((self.cur_round + self.latency, key, value))
+
+    def deliver(self):
+        ## deliver the queued messages due in this round in the order they were put
+        ## (including the ones put by the listeners meanwhile), then start the next round
+        while self.pending and self.pending[0][0] <= self.cur_round:
+            _, key, payload = self.pending.popleft()
+            self.dispatch(key, payload)
+        self.cur_round += 1
+
+    def dispatch(self, key: str, payload):
+        sample = InprocSample(key, payload)
+        lossy = self.loss > 0 and self.is_lossy(key)
+        for subscriber in self.get_route(key):
+            if lossy and self.rng.random() < self.loss:
+                self.num_lost += 1
+                continue
+            subscriber.listener(sample)
+            self.num_delivered += 1
+
+    def is_lossy(self, key: str) -> bool:
+        if key not in self.lossy:
+            self.lossy[key] = any(key_matches(key_expr, key) for key_expr in self.lossy_keys)
+        return self.lossy[key]
+
+    def get_route(self, key: str):
+        if key not in self.routes:
+            self.routes[key] = [s for s in self.subscribers if key_matches(s.key_expr, key)]
+        return self.routes[key]
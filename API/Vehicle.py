@@ -3,15 +3,17 @@ import time
 import argparse
 import itertools
 import json
-import zenoh
 import math
-from zenoh import config
 from datetime import datetime
-from zenoh import Reliability, Sample, session
+from multiprocessing import SimpleQueue
+from .Transport import Reliability, Sample
 from .math_utils import *
 from . import Simulator
 from typing import List, Tuple
-from .Scheduler import Scheduler
+from .Strategy import create_scheduler, choose_strategy
+from .Kinematics import KinematicsStore
+from .Records import SnapshotStore, REMOVED
+from . import Codec
 CONFLICT_ZONES = [(0,0,4,4),(-4,0,0,4),(-4,-4,0,0),(0,-4,4,0)]
 X_MIN = 0
 X_MAX = 2
@@ -23,42 +25,264 @@ MIN_ACCELERATION = -5
 SAFETY_GAP = 0.5
 MAX_FLEET_SIZE = 8
 TURNING_RADIUS = 2
+HOLD_MARGIN = 1 # m short of a conflict zone at which a vehicle holds (see get_hold_point)
+STATE_TIMEOUT = 1 # s without news of a vehicle after which it is taken for gone (see has_left)
+
+class FleetChannel():
+    ## Batched state publication for the vehicles of a fleet driven by the same process: they report
+    ## their states here instead of publishing them one by one, and the vehicle whose report completes
+    ## the round (all the vehicles of the fleet that have not crossed have reported) publishes the
+    ## fleet snapshot. It replaces the state messages of the fleet for its own vehicles too.
+    def __init__(self, fleet_length: int):
+        self.states = [None]*fleet_length
+        self.finish = [False]*fleet_length
+        self.reported = [False]*fleet_length
+
+    def report(self, vehicle_id: int, state: dict, finish: bool, first: bool = True) -> bool:
+        ## first: unused, the vehicles of the fleet share the channel (see FleetQueueChannel)
+        ## return: whether the round is complete, i.e. the snapshot is to be published now
+        self.states[vehicle_id] = state
+        self.finish[vehicle_id] = finish
+        self.reported[vehicle_id] = True
+        if not all(self.reported[vid] or self.finish[vid] for vid in range(len(self.states))):
+            return False
+        self.reported = [False]*len(self.states)
+        return True
+
+    def snapshot(self) -> List[Tuple]:
+        ## return: a list of (vehicle_id, state, finish), see Codec.encode_fleet_state
+        return [(vid, state, self.finish[vid]) for vid, state in enumerate(self.states) if state is not None]
+
+class FleetQueueChannel():
+    ## FleetChannel for the process engine, where each vehicle of a fleet runs in its own process: the
+    ## vehicles put their reports in a queue shared by the processes of the fleet, and the first vehicle
+    ## of the fleet that has not crossed (see reports_fleet_state) empties it into the snapshot it
+    ## publishes once per round. The put of a SimpleQueue is done when it returns, so the reports of a
+    ## round are in the queue when the next round starts: a snapshot holds the states of the previous
+    ## round for the other vehicles, like the state messages the vehicles would have received.
+    def __init__(self, fleet_length: int):
+        self.queue = SimpleQueue()
+        self.reports = dict() # vid -> (state, finish) taken since the last snapshot
+        self.finished = False # the vehicle emptying the queue has published its finish
+
+    def report(self, vehicle_id: int, state: dict, finish: bool, first: bool = True) -> bool:
+        ## first: whether the vehicle publishes the snapshots of the fleet
+        ## return: whether the snapshot is to be published now
+        if not first:
+            self.queue.put((vehicle_id, state, finish))
+            return False
+        if self.finished:
+            # it has published its finish, the next vehicle of the fleet took over
+            return False
+        while not self.queue.empty():
+            vid, rec_state, rec_finish = self.queue.get()
+            self.reports[vid] = (rec_state, rec_finish)
+        self.reports[vehicle_id] = (state, finish)
+        self.finished = finish
+        return True
+
+    def snapshot(self) -> List[Tuple]:
+        ## return: the reports since the last snapshot as a list of (vehicle_id, state, finish), see Codec.encode_fleet_state
+        snapshot = [(vid, state, finish) for vid, (state, finish) in sorted(self.reports.items())]
+        self.reports = dict()
+        return snapshot
 
 class MyVehicle():
     def __init__(self, session, velocity: Tuple, location: Tuple, 
     acceleration: Tuple, vehicle_id: int, fleet_id: int, lane_id: int, 
-    des_lane_id: int, delta:float):
-        self.velocity = velocity
-        self.location = location
+    des_lane_id: int, delta:float, store: KinematicsStore = None, channel: FleetChannel = None):
+        ## the kinematic state lives in a row of store (shared by all vehicles of an engine),
+        ## a private store is created if none is given
+        ## channel: report the state to the FleetChannel (or FleetQueueChannel) of the fleet instead of publishing it
+        if store is None:
+            store = KinematicsStore(MAX_SPEED, CONFLICT_ZONES)
+        self.store = store
+        self.channel = channel
+        self.index = store.add(location, velocity, acceleration, des_lane_id, delta)
         self.session = session
-        self.acceleration = acceleration
         self.vehicle_id = vehicle_id
         self.fleet_id = fleet_id
         self.lane_id = lane_id
         self.des_lane_id = des_lane_id
+        self.zone_idx_list = tuple(get_conflict_zone_idx(lane_id, des_lane_id)) # conflict zones on its route
         self.delta = delta
-        self.finish = False # pass the intersection or not
-        self.tick = 0
         self.final_assignment = dict()
-        self.state_record = [None]*MAX_FLEET_SIZE
+        self.plan = None # waypoints compiled from final_assignment, see get_plan
+        self.slot_id = 0 # index of the waypoint of the plan currently pursued
+        self.zones_reached = 0 # the conflict zones of its route it has entered, see get_zones_entered
+        # written by the listeners into SnapshotStores, read through their data (see sync_records)
+        self.state_store = SnapshotStore()
+        self.state_record = self.state_store.data # vid -> state of the vehicles of its fleet
+        self.crossed_store = SnapshotStore()
+        self.crossed = self.crossed_store.data # vid -> True for the vehicles of its fleet that have crossed the intersection
+        self.fleet_store = SnapshotStore() # (lane_id, fleet_id, veh_id) -> state of the vehicles of the fleets it subscribes
+        self.fleet_seen = dict() # (lane_id, fleet_id, veh_id) -> tick of the last snapshot with the vehicle
+        self.fleet_subscribers = dict() # (lane_id, fleet_id) -> subscriber of its snapshots, see sub_fleets_ahead
+
+    @property
+    def location(self) -> Tuple:
+        return tuple(self.store.location[self.index].tolist())
+
+    @location.setter
+    def location(self, location: Tuple):
+        self.store.location[self.index] = location
+
+    @property
+    def velocity(self) -> Tuple:
+        return tuple(self.store.velocity[self.index].tolist())
+
+    @velocity.setter
+    def velocity(self, velocity: Tuple):
+        self.store.velocity[self.index] = velocity
+
+    @property
+    def acceleration(self) -> Tuple:
+        return tuple(self.store.acceleration[self.index].tolist())
+
+    @acceleration.setter
+    def acceleration(self, acceleration: Tuple):
+        self.store.acceleration[self.index] = acceleration
+
+    @property
+    def tick(self) -> float:
+        return float(self.store.tick[self.index])
+
+    @tick.setter
+    def tick(self, tick: float):
+        self.store.tick[self.index] = tick
+
+    @property
+    def finish(self) -> bool:
+        # pass the intersection or not
+        return bool(self.store.finish[self.index])
+
+    @finish.setter
+    def finish(self, finish: bool):
+        self.store.finish[self.index] = finish
 
     def declare_pub_state(self):
         key = f"state/{self.lane_id}/{self.fleet_id}/{self.vehicle_id}"
         self.publisher_state = self.session.declare_publisher(key)
+        key = f"fleet/{self.lane_id}/{self.fleet_id}"
+        self.publisher_fleet_state = self.session.declare_publisher(key)
+
+    def sync_records(self):
+        ## take the updates of the listeners since the last call, to be called by the main loop
+        ## once per round: the records do not change in between
+        self.state_store.sync()
+        self.crossed_store.sync()
+
+    def sync_fleet_store(self) -> dict:
+        ## apply the fleet snapshots received since the last call
+        ## return: the updates, see SnapshotStore.sync
+        updates = self.fleet_store.sync()
+        tick = self.tick
+        for veh in updates:
+            self.fleet_seen[veh] = tick
+        return updates
+
+    def get_state(self) -> dict:
+        return {"location": self.location, "velocity": self.velocity,
+                "acceleration": self.acceleration, "des_lane_id": self.des_lane_id}
 
     def pub_state(self):
+        if self.channel is not None:
+            if self.channel.report(self.vehicle_id, self.get_state(), self.finish, self.reports_fleet_state()):
+                self.publisher_fleet_state.put(Codec.encode_fleet_state(self.lane_id, self.fleet_id, self.channel.snapshot()))
+            return
         key = f"state/{self.lane_id}/{self.fleet_id}/{self.vehicle_id}"
-        x = 1 if self.finish else 0
-        state = f"{self.lane_id},{self.fleet_id},{self.vehicle_id}," + \
-        f"{self.location[0]},{self.location[1]}," + \
-        f"{self.velocity[0]},{self.velocity[1]}," + \
-        f"{self.acceleration[0]},{self.acceleration[1]},{self.des_lane_id},{x}"
+        state = Codec.encode_state(self.lane_id, self.fleet_id, self.vehicle_id,
+            self.location, self.velocity, self.acceleration, self.des_lane_id, self.finish)
         # print(f"About to put Data ('{key}': '{state}')...")
         self.publisher_state.put(state)
         # print(f"Putting Data ('{key}': '{state}')...")
+        if self.finish or self.reports_fleet_state():
+            self.pub_fleet_state()
+
+    def reports_fleet_state(self) -> bool:
+        ## the first vehicle of the fleet that has not crossed yet (the leader, then its successors)
+        ## publishes the snapshot of the fleet for the leaders of the other fleets
+        return all(vid in self.crossed for vid in range(self.vehicle_id))
+
+    def pub_fleet_state(self):
+        ## one message with the states of all the vehicles of the fleet (as last received)
+        states = [(self.vehicle_id, self.get_state(), self.finish)]
+        for vid in range(MAX_FLEET_SIZE):
+            if vid == self.vehicle_id:
+                continue
+            if vid in self.crossed:
+                states.append((vid, None, True))
+            elif vid in self.state_record:
+                states.append((vid, self.state_record[vid], False))
+        self.publisher_fleet_state.put(Codec.encode_fleet_state(self.lane_id, self.fleet_id, states))
 
     def declare_sub_state(self):
-        pass
+        ## subscribe state from the vehicles of its fleet
+        def listener(sample: Sample):
+            rec_lane_id, rec_fleet_id, rec_vehicle_id, state, rec_finish = Codec.decode_state(sample.payload)
+            if rec_finish == 0:
+                self.state_store.put(rec_vehicle_id, state)
+            else:
+                self.state_store.discard(rec_vehicle_id)
+                self.crossed_store.put(rec_vehicle_id, True)
+
+        def fleet_listener(sample: Sample):
+            _, _, states = Codec.decode_fleet_state(sample.payload)
+            for rec_vehicle_id, state, rec_finish in states:
+                if rec_finish == 0:
+                    self.state_store.put(rec_vehicle_id, state)
+                    self.crossed_store.discard(rec_vehicle_id)
+                else:
+                    self.state_store.discard(rec_vehicle_id)
+                    self.crossed_store.put(rec_vehicle_id, True)
+
+        if self.channel is not None:
+            # the states of the fleet come in its snapshots
+            key = f"fleet/{self.lane_id}/{self.fleet_id}"
+            self.subscriber_state = self.session.declare_subscriber(key, fleet_listener, reliability=Reliability.RELIABLE())
+            return
+        key = f"state/{self.lane_id}/{self.fleet_id}/**"
+        self.subscriber_state = self.session.declare_subscriber(key, listener, reliability=Reliability.RELIABLE())
+
+    def declare_sub_fleet(self, lane_id: int, fleet_id: int):
+        ## subscribe the snapshots of one fleet, to know where its vehicles are (see get_hold_point)
+        def listener(sample: Sample):
+            rec_lane_id, rec_fleet_id, states = Codec.decode_fleet_state(sample.payload)
+            for rec_vehicle_id, state, rec_finish in states:
+                if rec_finish == 0:
+                    self.fleet_store.put((rec_lane_id,rec_fleet_id,rec_vehicle_id), state)
+                else:
+                    self.fleet_store.discard((rec_lane_id,rec_fleet_id,rec_vehicle_id))
+
+        key = f"fleet/{lane_id}/{fleet_id}"
+        self.fleet_subscribers[(lane_id, fleet_id)] = self.session.declare_subscriber(key, listener, reliability=Reliability.RELIABLE())
+
+    def sub_fleets_ahead(self):
+        ## subscribe the snapshots of the fleets with a vehicle whose time slot comes before its own in a
+        ## conflict zone of its route: the only ones zone_blocked waits for. Among them are the vehicles
+        ## ahead on its lane. To be called whenever final_assignment changes.
+        my_deadlines = self.final_assignment.get((self.lane_id, self.fleet_id, self.vehicle_id))
+        if my_deadlines is None:
+            return
+        for veh, deadlines in self.final_assignment.items():
+            fleet = (veh[0], veh[1])
+            if fleet in self.fleet_subscribers:
+                continue
+            if any(0 <= deadlines[zone_idx] < my_deadlines[zone_idx] for zone_idx in self.zone_idx_list):
+                self.declare_sub_fleet(*fleet)
+
+    def enable_rolling_horizon(self):
+        ## streaming mode: once running, keep announcing the time slot committed to this vehicle
+        ## so that the schedule groups formed later are scheduled after it
+        self.declare_pub_slot()
+
+    def declare_pub_slot(self):
+        key = f"slot/{self.lane_id}/{self.fleet_id}/{self.vehicle_id}"
+        self.publisher_slot = self.session.declare_publisher(key)
+
+    def pub_slot(self):
+        key = (self.lane_id, self.fleet_id, self.vehicle_id)
+        self.publisher_slot.put(Codec.encode_final_assignment({key: self.final_assignment[key]}))
 
     def finish_cross(self) -> bool:
         ## judge whether the vehicle has crossed the intersection
@@ -85,32 +309,14 @@ class MyVehicle():
             
     def step_vehicle(self):
         ## update its own state
-        if self.finish:
-            return
-        original_velocity = self.velocity
-        delta_v = vector_mul_scalar(self.acceleration, self.delta)
-        self.velocity = vector_add(original_velocity, delta_v)
-        if inner_product(original_velocity, self.velocity) < 0:
-            tangent_v = projection(self.velocity, original_velocity)
-            self.velocity = vector_sub(self.velocity, tangent_v)
-        speed = vector_length(self.velocity[0], self.velocity[1])
-        if speed > MAX_SPEED:
-            scalar = MAX_SPEED / speed
-            self.velocity = vector_mul_scalar(self.velocity, scalar)
-            speed = vector_length(self.velocity[0], self.velocity[1])
-        average_v = vector_mul_scalar(vector_add(self.velocity, original_velocity), 0.5)
-        displacement = vector_mul_scalar(average_v, self.delta)
-        self.location = vector_add(self.location, displacement)
-        self.tick += self.delta
-        if self.finish_cross():
-            self.finish = True
+        self.store.step([self.index])
 
     def get_waypoints(self, conflict_zones):
         # return: a list of dict
         waypoints = []
         deadlines = self.final_assignment[(self.lane_id, self.fleet_id, self.vehicle_id)]
         sorted_deadlines = sorted(deadlines)
-        zone_idx_list = get_conflict_zone_idx(self.lane_id, self.des_lane_id)
+        zone_idx_list = self.zone_idx_list
         for _ in range(len(zone_idx_list)+1):
             waypoints.append(dict())
         waypoints[-1]["time"] = max(deadlines)
@@ -133,7 +339,7 @@ class MyVehicle():
             elif self.des_lane_id == 3:
                 waypoints[-2]["location"] = conflict_zone_north_point(conflict_zones[2])
         if len(zone_idx_list) >= 3:
-            waypoints[-3]["time"] == sorted_deadlines[-3]
+            waypoints[-3]["time"] = sorted_deadlines[-3]
             if self.des_lane_id == 0:
                 waypoints[-3]["location"] = conflict_zone_north_point(conflict_zones[2])
             elif self.des_lane_id == 1:
@@ -153,14 +359,16 @@ class MyVehicle():
             waypoints[0]["location"] = conflict_zone_south_point(conflict_zones[3])
         first_zone_schedule = [t[zone_idx_list[0]] for t in self.final_assignment.values()]
         first_zone_schedule = filter(lambda t: t < deadlines[zone_idx_list[0]], first_zone_schedule)
-        last_veh_leave_first_zone_time = max(first_zone_schedule)
+        last_veh_leave_first_zone_time = max(first_zone_schedule, default=-1)
         if last_veh_leave_first_zone_time < 0:
             last_veh_leave_first_zone_time = 0
-        waypoints[0]["time"] = last_veh_leave_first_zone_time
+        waypoints[0]["time"] = last_veh_leave_first_zone_time + SAFETY_GAP
         return waypoints
     
-    def get_acceleration_linear_motion(self, waypt_loc, deadline):
-        distance = euclidean_dist(self.location, waypt_loc)
+    def get_acceleration_linear_motion(self, waypt_loc, deadline, distance=None):
+        ## distance: left to cover by the deadline, if it is not the straight line to waypt_loc
+        if distance is None:
+            distance = euclidean_dist(self.location, waypt_loc)
         if distance < 0.001:
             return (0,0)
         displacement = vector_sub(waypt_loc, self.location)
@@ -170,33 +378,30 @@ class MyVehicle():
         else:
             direction = get_unit_vector(self.velocity)
         target_direction = get_unit_vector(displacement)
-        if deadline == None: # delay
-            if inner_product(direction, target_direction) > 0:
-                a_tan = MAX_ACCELERATION
-                return vector_mul_scalar(direction, a_tan)
-            else:
-                a_tan = MIN_ACCELERATION
-                return vector_mul_scalar(direction, a_tan)
         if inner_product(direction, target_direction) > 0:
-            waypt_speed = 2*distance/(deadline-self.tick) - speed
-            if waypt_speed >= 0:
-                a_tan = (waypt_speed - speed)/(deadline - self.tick)
-                if a_tan > MAX_ACCELERATION:
-                    a_tan = MAX_ACCELERATION    
+            if deadline == None: # delay
+                a_tan = MAX_ACCELERATION
             else:
-                if speed < 1:
-                    a_tan = 0
+                waypt_speed = 2*distance/(deadline-self.tick) - speed
+                if waypt_speed >= 0:
+                    a_tan = (waypt_speed - speed)/(deadline - self.tick)
+                    if a_tan > MAX_ACCELERATION:
+                        a_tan = MAX_ACCELERATION    
                 else:
-                    a_tan = MIN_ACCELERATION
+                    if speed < 1:
+                        a_tan = 0
+                    else:
+                        a_tan = MIN_ACCELERATION
 
             # remain safety distance to the front car
-            if self.vehicle_id > 0 and self.state_record[self.vehicle_id-1] != None:
-                front_car_loc = self.state_record[self.vehicle_id-1]["location"]
+            front_state = self.get_front_veh_state()
+            if front_state != None:
+                front_car_loc = front_state["location"]
                 front_car_dist = euclidean_dist(self.location, front_car_loc)
                 if speed >= 0.1 and front_car_dist / speed < 1.5:
                     a_tan = MIN_ACCELERATION
                 elif speed >= 0.1 and front_car_dist / speed < 2.5:
-                    a_tan = MIN_ACCELERATION / 2
+                    a_tan = min(a_tan, MIN_ACCELERATION / 2)
                 elif front_car_dist < 5:
                     a_tan = MIN_ACCELERATION
 
@@ -204,47 +409,140 @@ class MyVehicle():
             a_tan = MIN_ACCELERATION
         return vector_mul_scalar(direction, a_tan)
     
-    def update_acceleration(self):
+    def get_front_veh_state(self):
+        if self.vehicle_id == 0:
+            return None
+        return self.state_record.get(self.vehicle_id - 1)
+
+    def get_plan(self):
+        ## the waypoints of final_assignment, compiled once and kept until invalidate_plan
+        if self.plan is None:
+            self.plan = self.get_waypoints(CONFLICT_ZONES)
+            self.slot_id = 0
+        return self.plan
+
+    def invalidate_plan(self):
+        ## to be called whenever final_assignment changes
+        self.plan = None
+        self.slot_id = 0
+
+    def plan_acceleration(self):
         ## waypoints pursuing
-        waypoints = self.get_waypoints(CONFLICT_ZONES)
-        slot_id = 0
-        for waypt in waypoints:
-            if self.tick >= waypt["time"]-0.1:
-                slot_id += 1
-            else:
-                break
+        ## set the tangential acceleration toward the current waypoint
+        ## return: the waypoint location and whether a normal acceleration is needed to turn
+        waypoints = self.get_plan()
+        # the tick only increases, so the waypoints already reached stay reached
+        slot_id = self.slot_id
+        tick = self.tick
+        while slot_id < len(waypoints) and tick >= waypoints[slot_id]["time"]-0.1:
+            slot_id += 1
+        self.slot_id = slot_id
         if slot_id >= len(waypoints):
-            waypt_loc = waypoints[-1]["location"]
             deadline = None
         else:
-            waypt_loc = waypoints[slot_id]["location"]
             deadline = waypoints[slot_id]["time"]
+        # a vehicle behind its plan still drives through the waypoints it has not reached, in order,
+        # rather than cutting across conflict zones off its route toward a later one
+        # (the zones entered stay entered, also if the vehicle drifts off its route out of them)
+        reached = max(self.zones_reached, get_zones_entered(CONFLICT_ZONES, self.zone_idx_list, self.location))
+        self.zones_reached = reached
+        distance = None
+        if slot_id > reached + 1:
+            target = min(slot_id, len(waypoints)-1)
+            distance = euclidean_dist(self.location, waypoints[reached+1]["location"])
+            for k in range(reached+1, target):
+                distance += euclidean_dist(waypoints[k]["location"], waypoints[k+1]["location"])
+            slot_id = reached + 1
+        waypt_loc = waypoints[min(slot_id, len(waypoints)-1)]["location"]
+        self.acceleration = self.get_acceleration_linear_motion(waypt_loc, deadline, distance)
+        hold = self.get_hold_point(waypoints, reached)
+        if hold is not None:
+            self.acceleration = self.get_acceleration_hold(*hold)
         if (self.des_lane_id-self.lane_id) % 4 == 2:
-            self.acceleration = self.get_acceleration_linear_motion(waypt_loc, deadline)
-        elif (self.des_lane_id-self.lane_id) % 4 == 3 and slot_id != 2:
-            self.acceleration = self.get_acceleration_linear_motion(waypt_loc, deadline)
+            return waypt_loc, False
+        elif (self.des_lane_id-self.lane_id) % 4 == 3 and slot_id < 2:
+            return waypt_loc, False
+        elif (self.des_lane_id-self.lane_id) % 4 == 1 and reached < 1 and \
+             euclidean_dist(self.location, waypoints[0]["location"]) > vector_length(*self.velocity)*0.1:
+            # a right turner behind its plan only turns once it gets to its conflict zone
+            return waypt_loc, False
+        else:
+            return waypt_loc, True
+
+    def get_hold_point(self, waypoints, reached):
+        ## The waypoints only tell when to be where: a vehicle that runs late (it waited, started from
+        ## rest, was slowed down by the vehicle ahead) may still be in a conflict zone when the next
+        ## one is due there. So a vehicle does not enter a conflict zone of its route before the
+        ## vehicles whose time slot there comes before its own have left it. The time slots increase
+        ## along the passing order in every zone and the vehicles of a lane pass in order, so a
+        ## vehicle only ever waits for vehicles before it in the passing order.
+        ## reached: the conflict zones of its route it has entered, see get_zones_entered
+        ## return: (the entry of the first zone ahead it may not enter yet, the distance to that zone),
+        ##         None if it may go on. A turning vehicle does not drive through the entry point, so
+        ##         the distance is the one to the zone itself. A vehicle that could not stop in time
+        ##         and has to hold further on stops in the zone it is in (distance 0) rather than
+        ##         moving on across it; it drives on to clear the zone if it does not have to hold.
+        for k in range(reached, len(self.zone_idx_list)):
+            zone_idx = self.zone_idx_list[k]
+            if self.zone_blocked(zone_idx):
+                if reached > 0 and self.zone_blocked(self.zone_idx_list[reached-1]):
+                    return waypoints[k]["location"], 0
+                return waypoints[k]["location"], distance_to_zone(CONFLICT_ZONES[zone_idx], self.location)
+        return None
+
+    def zone_blocked(self, zone_idx) -> bool:
+        ## whether a vehicle whose time slot in the conflict zone zone_idx comes before its own has not left it
+        key = (self.lane_id, self.fleet_id, self.vehicle_id)
+        my_time = self.final_assignment[key][zone_idx]
+        for veh, deadlines in self.final_assignment.items():
+            if veh != key and 0 <= deadlines[zone_idx] < my_time and not self.has_left(veh, zone_idx):
+                return True
+        return False
+
+    def has_left(self, veh, zone_idx) -> bool:
+        ## whether the vehicle veh (lane_id, fleet_id, veh_id) is past the conflict zone zone_idx, as far
+        ## as the fleet snapshots tell: it has crossed the intersection (or nothing has been heard of it
+        ## for STATE_TIMEOUT seconds), or it is in a later zone of its route
+        state = self.fleet_store.data.get(veh)
+        if state is None or self.tick - self.fleet_seen[veh] > STATE_TIMEOUT:
+            return True
+        zone_idx_list = get_conflict_zone_idx(veh[0], state["des_lane_id"])
+        if zone_idx not in zone_idx_list:
+            return True
+        return get_zones_entered(CONFLICT_ZONES, zone_idx_list, state["location"]) > zone_idx_list.index(zone_idx) + 1
+
+    def get_acceleration_hold(self, hold_loc, distance):
+        ## keep the acceleration toward the waypoint as long as the vehicle can still stop HOLD_MARGIN
+        ## short of hold_loc (distance away), brake to stop there otherwise
+        speed = vector_length(self.velocity[0], self.velocity[1])
+        if speed < 0.001:
+            direction = get_unit_vector(vector_sub(hold_loc, self.location))
         else:
-            self.acceleration = self.get_acceleration_linear_motion(waypt_loc, deadline)
-            target_direction = get_unit_vector(vector_sub(waypt_loc, self.location))
-            speed = vector_length(self.velocity[0], self.velocity[1])
+            direction = get_unit_vector(self.velocity)
+        room = distance - HOLD_MARGIN
+        if room <= 0:
+            # stop where it is, without backing up
             if speed < 0.001:
-                tan_direction = target_direction
-            else:
-                tan_direction = get_unit_vector(self.velocity)
-            a_normal = speed * speed / TURNING_RADIUS
-            if not right_or_left(tan_direction, target_direction):
-                normal_direction = get_left_normal_vector(tan_direction)
-            else:
-                normal_direction = get_right_normal_vector(tan_direction)
-            self.acceleration = vector_add(self.acceleration, vector_mul_scalar(normal_direction, a_normal))
+                return (0,0)
+            return vector_mul_scalar(direction, max(MIN_ACCELERATION, -speed/self.delta))
+        if speed*self.delta + speed**2/(2*abs(MIN_ACCELERATION)) < room:
+            return self.acceleration
+        a_tan = max(MIN_ACCELERATION, -speed**2/(2*room))
+        return vector_mul_scalar(direction, min(a_tan, inner_product(self.acceleration, direction)))
+
+    def update_acceleration(self):
+        waypt_loc, turning = self.plan_acceleration()
+        if turning:
+            self.store.add_turning_acceleration([self.index], [waypt_loc], TURNING_RADIUS)
 
 class Member(MyVehicle):
     def __init__(self, session, velocity: Tuple, location: Tuple, 
     acceleration: Tuple, vehicle_id: int, fleet_id: int, lane_id: int, 
-    des_lane_id: int, delta:float):
+    des_lane_id: int, delta:float, store: KinematicsStore = None, channel: FleetChannel = None):
         super().__init__(session, velocity, location, acceleration, vehicle_id, 
-        fleet_id, lane_id, des_lane_id, delta)
+        fleet_id, lane_id, des_lane_id, delta, store, channel)
         self.zone_idx_list = get_conflict_zone_idx(self.lane_id, self.des_lane_id)
+        self.final_store = SnapshotStore() # the final assignments received, applied by sync_records
         # self.final_assignment = dict()
         # self.publisher_state = None
         # self.subscriber_state = None
@@ -253,47 +551,28 @@ class Member(MyVehicle):
         self.declare_pub_state()
         self.declare_sub_state()
 
-        self.declare_sub_final_assignment()
+        self.declare_sub_final_assignment() # then the fleets ahead, see sub_fleets_ahead
 
         # self.decalre_pub_zone_status()
         print(f"initialize vehicle {self.lane_id}-{self.fleet_id}-{self.vehicle_id}")
 
-    def declare_sub_state(self):
-        def listener(sample: Sample):
-            # print(f">> [Subscriber] Received {sample.kind} ('{sample.key_expr}': '{sample.payload.decode('utf-8')}')")
-            receive = sample.payload.decode('utf-8').split(',')
-            state = {
-                "location": (float(receive[3]),float(receive[4])),
-                "velocity": (float(receive[5]),float(receive[6])),
-                "acceleration": (float(receive[7]),float(receive[8])),
-                "des_lane_id": int(receive[9])
-            }
-            rec_lane_id = int(receive[0])
-            rec_fleet_id = int(receive[1])
-            rec_vehicle_id = int(receive[2])
-            rec_finish = int(receive[10])
-            if rec_finish == 0:
-                self.state_record[rec_vehicle_id] = state
-            else:
-                self.state_record[rec_vehicle_id] = None
-
-        key = f"state/{self.lane_id}/{self.fleet_id}/**"
-        self.subscriber_state = self.session.declare_subscriber(key, listener, reliability=Reliability.RELIABLE())
+    def sync_records(self):
+        super().sync_records()
+        self.sync_fleet_store()
+        updates = self.final_store.sync()
+        if updates:
+            self.final_assignment.update(updates)
+            self.invalidate_plan()
+            self.sub_fleets_ahead()
 
     def declare_sub_final_assignment(self):
         def listener(sample: Sample):
-            receive = sample.payload.decode('utf-8').split(';')[:(-1)]
-            for r in receive:
-                r = r.split(',')
-                veh = (int(r[0]),int(r[1]),int(r[2]))
-                deadlines = [float(r[3]),float(r[4]),float(r[5]),float(r[6])]
-                self.final_assignment[veh] = deadlines
+            for veh, deadlines in Codec.decode_final_assignment(sample.payload).items():
+                self.final_store.put(veh, deadlines)
         
         key = f"final/{self.lane_id}/{self.fleet_id}"
         self.subscriber_final_assignment = self.session.declare_subscriber(key, listener, reliability=Reliability.RELIABLE())
-        
-    def get_front_veh_state(self):
-        return self.state_record[self.vehicle_id - 1]
+
     
     '''def decalre_pub_zone_status(self):
         key = "zone"
@@ -311,20 +590,39 @@ class Member(MyVehicle):
 class Leader(MyVehicle):
     def __init__(self, session, velocity: Tuple[float], location: Tuple, 
     acceleration: Tuple, vehicle_id: int, fleet_id: int, lane_id: int, delta:float,
-    des_lane_id: int, fleet_length: int):
+    des_lane_id: int, fleet_length: int, store: KinematicsStore = None, channel: FleetChannel = None):
         super().__init__(session, velocity, location, acceleration, vehicle_id, 
-        fleet_id, lane_id, des_lane_id, delta)
+        fleet_id, lane_id, des_lane_id, delta, store, channel)
         self.fleet_length = fleet_length
         self.schedule_map = set()
         self.schedule_map.add((self.lane_id, self.des_lane_id, self.fleet_id, self.fleet_length))
+        self.group_fleets = {(self.lane_id, self.fleet_id)} # (lane_id, fleet_id) of the fleets of schedule_map
         self.agree = [False]*4
         self.agree[self.lane_id] = True
-        self.fleets_state_record = dict()
+        self.map_rounds = 0 # schedule maps published in the current schedule group forming
+        self.map_store = SnapshotStore() # lane_id -> the last schedule map received from the lane
+        self.group_state_store = SnapshotStore() # filled from fleet_store by sync_records, its version tells when the states change
+        self.fleets_state_record = self.group_state_store.data # the states of the vehicles of the schedule group
         self.intersection_occupied = False
+        self.rolling = False # streaming mode, see enable_rolling_horizon
+        self.committed_store = SnapshotStore()
+        self.committed = self.committed_store.data # (lane_id, fleet_id, veh_id) -> time slot committed to a vehicle still crossing
+        self.lane_store = SnapshotStore()
+        self.lane_states = self.lane_store.data # (fleet_id, veh_id) -> state of the vehicles of the other fleets of its lane
+        self.plan_time = None # time of the states the proposals of the current schedule group start from
+        self.plan_slots = dict() # the committed time slots at plan_time
+        self.plan_committed = None # their t_max
         #==================================#
         self.proposal = None
-        self.all_proposal = dict()
-        self.all_score = dict()
+        self.scheduler = None # kept between rounds to reuse the search tree
+        self.scheduler_version = None # the version of group_state_store that the scheduler searches with
+        self.search_iterations = 0 # MCTS iterations run by the last call of propose
+        self.vehicle_table = None # constants of the vehicles of fleets_state_record, see get_vehicle_table
+        self.vehicle_table_version = None
+        self.proposal_store = SnapshotStore()
+        self.all_proposal = self.proposal_store.data
+        self.score_store = SnapshotStore()
+        self.all_score = self.score_store.data
         # self.final_assignment = dict()
         '''self.publisher_schedule_map = None
         self.publisher_state = None
@@ -358,60 +656,113 @@ class Leader(MyVehicle):
 
     def pub_schedule_map(self):
         key = f"map/{self.lane_id}"
-        pub_map = f"{self.lane_id}:"
-        for fleet_info in self.schedule_map:
-            pub_map += str(fleet_info[0])
-            pub_map += ","
-            pub_map += str(fleet_info[1])
-            pub_map += ","
-            pub_map += str(fleet_info[2])
-            pub_map += ","
-            pub_map += str(fleet_info[3])
-            pub_map += ";"
+        pub_map = Codec.encode_schedule_map(self.lane_id, self.schedule_map)
         # print(f"Putting Data ('{key}': '{pub_map}')...")
         self.publisher_schedule_map.put(pub_map)
+        self.map_rounds += 1
 
-    def declare_sub_schedule_map(self):
-        def listener(sample: Sample):
-            rcv_schedule_map = set()
-            receive = sample.payload.decode('utf-8').split(":")
-            # print(receive)
-            rec_lane_id = int(receive[0])
-            rec_fleet_info = receive[1].split(";")[:(-1)]
-            for rec_fleet in rec_fleet_info:
-                rec_fleet = rec_fleet.split(",")
-                rcv_schedule_map.add((int(rec_fleet[0]),int(rec_fleet[1]),int(rec_fleet[2]),int(rec_fleet[3])))
+    def sync_records(self):
+        super().sync_records()
+        for rec_lane_id, rcv_schedule_map in self.map_store.sync().items():
             if rcv_schedule_map==self.schedule_map:
                 self.agree[rec_lane_id] = True
             else:
                 self.schedule_map = self.schedule_map.union(rcv_schedule_map)
+                self.group_fleets = {(k[0],k[2]) for k in self.schedule_map}
+        # the fleets snapshots are filtered here rather than by the listener, with the group up to date
+        for veh, state in self.sync_fleet_store().items():
+            if state is not REMOVED and (veh[0],veh[1]) in self.group_fleets:
+                self.group_state_store.put(veh, state)
+        self.group_state_store.sync()
+        self.committed_store.sync()
+        self.lane_store.sync()
+        self.proposal_store.sync()
+        self.score_store.sync()
+
+    def declare_sub_schedule_map(self):
+        def listener(sample: Sample):
+            rec_lane_id, rcv_schedule_map = Codec.decode_schedule_map(sample.payload)
+            self.map_store.put(rec_lane_id, rcv_schedule_map)
 
         key = f"map/**"
         self.subscriber_schedule_map = self.session.declare_subscriber(key, listener, reliability=Reliability.RELIABLE())
 
     def schedule_group_consensus(self):
+        if self.rolling:
+            # only the lanes with a waiting fleet take part; wait for one exchange of maps first
+            return self.map_rounds >= 2 and all(self.agree[k[0]] for k in self.schedule_map)
         return self.agree[0] and self.agree[1] and self.agree[2] and self.agree[3]
 
+    def enable_rolling_horizon(self):
+        ## streaming mode: the leader schedules its fleet in the schedule group formed by start_epoch,
+        ## after the time slots committed to the vehicles of the previous groups
+        super().enable_rolling_horizon()
+        self.rolling = True
+        self.declare_sub_slot()
+
+    def declare_sub_slot(self):
+        def listener(sample: Sample):
+            for veh, deadlines in Codec.decode_final_assignment(sample.payload).items():
+                self.committed_store.put(veh, deadlines)
+
+        key = "slot/**"
+        self.subscriber_slot = self.session.declare_subscriber(key, listener, reliability=Reliability.RELIABLE())
+
+    def start_epoch(self):
+        ## form a new schedule group with the leaders still waiting: forget the previous group
+        self.schedule_map = set()
+        self.schedule_map.add((self.lane_id, self.des_lane_id, self.fleet_id, self.fleet_length))
+        self.group_fleets = {(self.lane_id, self.fleet_id)}
+        self.agree = [False]*4
+        self.agree[self.lane_id] = True
+        self.map_rounds = 0
+        self.map_store.reset()
+        self.group_state_store.reset()
+        self.proposal = None
+        self.scheduler = None
+        self.vehicle_table = None
+        self.plan_time = None
+        self.plan_slots = dict()
+        self.plan_committed = None
+        self.proposal_store.reset()
+        self.score_store.reset()
+
     def declare_sub_state(self):
-        ## subscribe state from other fleets
+        ## subscribe state from its fleet, and the snapshots of all fleets (one message per fleet)
+        if self.channel is None:
+            super().declare_sub_state() # with a channel, the snapshots of its fleet come with the others
+        self.declare_sub_fleet_state()
+
+    def declare_sub_fleet_state(self):
         def listener(sample: Sample):
-            # print(f">> [Subscriber] Received {sample.kind} ('{sample.key_expr}': '{sample.payload.decode('utf-8')}')")
-            receive = sample.payload.decode('utf-8').split(',')
-            state = {
-                "location": (float(receive[3]),float(receive[4])),
-                "velocity": (float(receive[5]),float(receive[6])),
-                "acceleration": (float(receive[7]),float(receive[8])),
-                "des_lane_id": int(receive[9])
-            }
-            rec_lane_id = int(receive[0])
-            rec_fleet_id = int(receive[1])
-            rec_vehicle_id = int(receive[2])
-            rec_finish = int(receive[10])
-            if rec_finish == 0 and (rec_lane_id,rec_fleet_id) in [(k[0],k[2]) for k in self.schedule_map]:
-                self.fleets_state_record[(rec_lane_id,rec_fleet_id,rec_vehicle_id)] = state
-
-        key = f"state/**"
-        self.subscriber_state = self.session.declare_subscriber(key, listener, reliability=Reliability.RELIABLE())
+            rec_lane_id, rec_fleet_id, states = Codec.decode_fleet_state(sample.payload)
+            same_lane = rec_lane_id == self.lane_id and rec_fleet_id != self.fleet_id
+            for rec_vehicle_id, state, rec_finish in states:
+                if rec_finish == 0:
+                    self.fleet_store.put((rec_lane_id,rec_fleet_id,rec_vehicle_id), state)
+                else:
+                    self.fleet_store.discard((rec_lane_id,rec_fleet_id,rec_vehicle_id))
+                    self.committed_store.discard((rec_lane_id,rec_fleet_id,rec_vehicle_id))
+                if same_lane:
+                    if rec_finish == 0:
+                        self.lane_store.put((rec_fleet_id,rec_vehicle_id), state)
+                    else:
+                        self.lane_store.discard((rec_fleet_id,rec_vehicle_id))
+
+        key = f"fleet/**"
+        self.subscriber_fleet_state = self.session.declare_subscriber(key, listener, reliability=Reliability.RELIABLE())
+
+    def get_front_veh_state(self):
+        ## the closest vehicle ahead on its lane, i.e. the last one of the previous fleet
+        dist = euclidean_dist((0,0), self.location)
+        front_state = None
+        front_dist = None
+        for state in self.lane_states.values():
+            state_dist = euclidean_dist((0,0), state["location"])
+            if state_dist < dist and (front_dist is None or state_dist > front_dist):
+                front_state = state
+                front_dist = state_dist
+        return front_state
 
     def all_states_received(self):
         for k in self.schedule_map:
@@ -423,10 +774,47 @@ class Leader(MyVehicle):
                     return False 
         return True
 
-    def propose(self, num_iter, alpha):
+    def propose(self, num_iter, alpha, workers=1, node_budget=None, time_budget=None, strategy="mcts", macro_chunk=None):
         ## propose a schedule based on the states of other vehicles
-        scheduler = Scheduler(CONFLICT_ZONES,self.fleets_state_record,SAFETY_GAP,self.lane_id,self.fleet_id,alpha)
-        passing_order = scheduler.search(num_iter)
+        ## strategy: search strategy of the scheduler, see API/Strategy.py
+        ## macro_chunk: let the MCTS admit this many vehicles of a fleet per action, see Scheduler
+        ## time_budget: max seconds of search per call, the best complete passing order found
+        ##              within it is proposed and the search goes on in the next calls (up to num_iter)
+        ## The scheduler and its tree are kept between calls. If the states have not changed
+        ## since the last search, the cached proposal is republished (or the search is continued
+        ## up to num_iter iterations); if only their values changed, the tree is kept but its
+        ## statistics are invalidated, along with the simulated prefixes that place a vehicle
+        ## whose state changed (see Scheduler.reset_statistics); a new tree is built when the set
+        ## of vehicles changed.
+        ## The time slots start from the time of the first call in the schedule group, after the
+        ## slots committed to other vehicles by then (streaming mode), as late as these vehicles
+        ## can leave their conflict zones from where they are.
+        if self.plan_time is None:
+            self.plan_time = self.tick
+            self.plan_slots = dict()
+            for veh, deadlines in self.committed.items():
+                state = self.fleet_store.data.get(veh)
+                if state is not None:
+                    deadlines = Simulator.late_t_assign(CONFLICT_ZONES, veh[0], deadlines, state, self.plan_time, MAX_ACCELERATION)
+                self.plan_slots[veh] = deadlines
+            self.plan_committed = Simulator.committed_t_max(CONFLICT_ZONES, self.plan_slots.values())
+        scheduler = self.scheduler
+        strategy = choose_strategy(strategy, len(self.fleets_state_record))
+        if scheduler is None or scheduler.name != strategy or scheduler.alpha != alpha or scheduler.macro_chunk != macro_chunk or \
+           not scheduler.same_vehicles(self.fleets_state_record):
+            scheduler = create_scheduler(strategy,CONFLICT_ZONES,self.fleets_state_record,SAFETY_GAP,self.lane_id,self.fleet_id,alpha,
+                                         node_budget=node_budget, macro_chunk=macro_chunk,
+                                         t_now=self.plan_time, committed=self.plan_committed)
+            self.scheduler = scheduler
+            self.scheduler_version = self.group_state_store.version
+        elif self.scheduler_version != self.group_state_store.version:
+            scheduler.reset_statistics(self.fleets_state_record)
+            self.scheduler_version = self.group_state_store.version
+        elif (scheduler.exhausted or scheduler.iterations >= num_iter) and self.proposal is not None:
+            self.search_iterations = 0
+            return
+        passing_order = scheduler.search(num_iter - scheduler.iterations, workers, time_budget)
+        self.search_iterations = scheduler.last_iterations
         time_slot = scheduler.passing_order_to_time_slot(passing_order)
         self.proposal = time_slot
         # self.proposal format:
@@ -438,30 +826,17 @@ class Leader(MyVehicle):
 
     def pub_propose(self):
         key = f"proposal/{self.lane_id}/{self.fleet_id}"
-        pub_content = f"{self.lane_id},{self.fleet_id}:"
-        for veh in self.proposal:
-            deadlines = self.proposal[veh]
-            assert len(veh) == 3 and len(deadlines) == 4
-            pub_content += f"{veh[0]},{veh[1]},{veh[2]},{deadlines[0]},{deadlines[1]},{deadlines[2]},{deadlines[3]};"
-        
+        pub_content = Codec.encode_proposal(self.lane_id, self.fleet_id, self.proposal)
         self.publisher_propose.put(pub_content)
 
     def declare_sub_propose(self):
         # self.other_proposal = dict()
         def listener(sample: Sample):
             try:
-                receive = sample.payload.decode('utf-8').split(':')
-                lane_id = int(receive[0].split(',')[0])
-                fleet_id = int(receive[0].split(',')[1])
-                self.all_proposal[(lane_id, fleet_id)] = dict()
-                rec_proposal = receive[1].split(';')
-                for s in rec_proposal[:(-1)]:
-                    s = s.split(',')
-                    veh = (int(s[0]),int(s[1]),int(s[2]))
-                    deadlines = [float(s[3]),float(s[4]),float(s[5]),float(s[6])]
-                    self.all_proposal[(lane_id,fleet_id)][veh] = deadlines
+                lane_id, fleet_id, proposal = Codec.decode_proposal(sample.payload)
+                self.proposal_store.put((lane_id,fleet_id), proposal)
             except:
-                print(f"received {receive} at key proposal/**")
+                print(f"received {bytes(sample.payload)} at key proposal/**")
                 raise NotImplementedError
 
         key = "proposal/**"
@@ -473,15 +848,25 @@ class Leader(MyVehicle):
                 return False
         return True
     
+    def get_vehicle_table(self) -> Simulator.VehicleTable:
+        ## the constants of the vehicles under the current fleets_state_record,
+        ## shared with the scheduler as long as its snapshot of the states is current
+        version = self.group_state_store.version
+        if self.scheduler is not None and self.scheduler_version == version:
+            return self.scheduler.vehicle_table
+        if self.vehicle_table is None or self.vehicle_table_version != version:
+            self.vehicle_table_version = version
+            vehs = [(k[0],state["des_lane_id"],k[1],k[2]) for k, state in self.fleets_state_record.items()]
+            self.vehicle_table = Simulator.VehicleTable(vehs,CONFLICT_ZONES,list(self.fleets_state_record.values()),
+                                                        self.lane_id,self.fleet_id,1,self.plan_time or 0)
+        return self.vehicle_table
+
     def scoring(self, time_slot):
         total_delay = 0
+        table = self.get_vehicle_table()
         for (lane_id, fleet_id, veh_id) in time_slot:
             if lane_id == self.lane_id and fleet_id == self.fleet_id:
-                velocity = self.fleets_state_record[(lane_id, fleet_id, veh_id)]['velocity']
-                speed = vector_length(velocity[0], velocity[1])
-                location = self.fleets_state_record[(lane_id, fleet_id, veh_id)]['location']
-                des_lane_id = self.fleets_state_record[(lane_id, fleet_id, veh_id)]['des_lane_id']
-                t_min = get_min_arrival_time(CONFLICT_ZONES,lane_id,des_lane_id,location,speed)
+                t_min = table.rows[table.index[(lane_id, fleet_id, veh_id)]].t_min
                 total_delay += (max(time_slot[(lane_id, fleet_id, veh_id)]) - t_min)
         return -total_delay/self.fleet_length
 
@@ -491,25 +876,18 @@ class Leader(MyVehicle):
     
     def pub_score(self):
         key = f"score/{self.lane_id}/{self.fleet_id}"
-        pub_content = f"{self.lane_id},{self.fleet_id}:"
+        scores = []
         for (lane_id, fleet_id) in self.all_proposal:
             score = self.scoring(self.all_proposal[(lane_id, fleet_id)])
-            pub_content += f"{lane_id},{fleet_id},{score};"
+            scores.append((lane_id, fleet_id, score))
+        pub_content = Codec.encode_score(self.lane_id, self.fleet_id, scores)
         self.publisher_score.put(pub_content)
 
     def declare_sub_score(self):
         def listener(sample: Sample):
-            receive = sample.payload.decode('utf-8').split(':')
-            rec_scores = receive[1].split(';')[:(-1)]
-            sender_info = receive[0].split(',')
-            sender_lane_id = int(sender_info[0])
-            sender_fleet_id = int(sender_info[1])
-            for rec in rec_scores:
-                rec = rec.split(',')
-                lane_id = int(rec[0])
-                fleet_id = int(rec[1])
-                score = float(rec[2])
-                self.all_score[(lane_id,fleet_id,sender_lane_id,sender_fleet_id)] = score
+            sender_lane_id, sender_fleet_id, rec_scores = Codec.decode_score(sample.payload)
+            for (lane_id, fleet_id, score) in rec_scores:
+                self.score_store.put((lane_id,fleet_id,sender_lane_id,sender_fleet_id), score)
             
         key = "score/**"
         self.subscriber_score = self.session.declare_subscriber(key, listener, reliability=Reliability.RELIABLE())
@@ -539,6 +917,10 @@ class Leader(MyVehicle):
             elif final_score[(lane_id,fleet_id)] == max_score and lane_id == proposer[0] and fleet_id < proposer[1]:
                 proposer = (lane_id,fleet_id)
         self.final_assignment = self.all_proposal[proposer]
+        if self.plan_slots:
+            # the vehicles of the fleet also wait for the vehicles of the previous groups (see get_waypoints)
+            self.final_assignment = {**self.plan_slots, **self.final_assignment}
+        self.invalidate_plan()
 
     def declare_pub_final_assignment(self):
         key = f"final/{self.lane_id}/{self.fleet_id}"
@@ -546,11 +928,7 @@ class Leader(MyVehicle):
 
     def pub_final_assignment(self):
         key = f"final/{self.lane_id}/{self.fleet_id}"
-        pub_content = ""
-        for veh in self.final_assignment:
-            deadlines = self.final_assignment[veh]
-            assert len(veh) == 3 and len(deadlines) == 4
-            pub_content += f"{veh[0]},{veh[1]},{veh[2]},{deadlines[0]},{deadlines[1]},{deadlines[2]},{deadlines[3]};"    
+        pub_content = Codec.encode_final_assignment(self.final_assignment)
         self.publisher_final_assignment.put(pub_content)
                 
     '''def declare_sub_zone_status(self, wait_time=5):
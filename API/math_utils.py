@@ -121,6 +121,22 @@ def get_cur_conflict_zone_id(conflict_zones, cur_loc):
             return idx
     return -1
 
+def get_zones_entered(conflict_zones, zone_idx_list, cur_loc):
+    ## how far a vehicle at cur_loc is along its route (zone_idx_list, in the order of crossing):
+    ## k if it is in the k-th conflict zone of the route (the later one on a border), 0 before the first
+    for k in range(len(zone_idx_list), 0, -1):
+        conflict_zone = conflict_zones[zone_idx_list[k-1]]
+        if cur_loc[0] >= conflict_zone[0] and cur_loc[0] <= conflict_zone[2] and \
+           cur_loc[1] >= conflict_zone[1] and cur_loc[1] <= conflict_zone[3]:
+            return k
+    return 0
+
+def distance_to_zone(conflict_zone, cur_loc):
+    ## the distance from cur_loc to the conflict zone (x_min, y_min, x_max, y_max), 0 inside it
+    dx = max(conflict_zone[0]-cur_loc[0], 0, cur_loc[0]-conflict_zone[2])
+    dy = max(conflict_zone[1]-cur_loc[1], 0, cur_loc[1]-conflict_zone[3])
+    return vector_length(dx, dy)
+
 def get_min_arrival_time(conflict_zones, lane_id, des_lane_id, location, speed):
     zone_size = abs(conflict_zones[0][2]-conflict_zones[0][0])
     zone_idx_list = get_conflict_zone_idx(lane_id, des_lane_id)
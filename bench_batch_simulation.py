@@ -0,0 +1,59 @@
+from argparse import ArgumentParser
+from API.Scheduler import Scheduler
+from API.Simulator import simulate_passing_order
+from bench_node_expansion import make_states, CONFLICT_ZONES
+import numpy as np
+import random
+import time
+
+## Throughput of Scheduler.evaluate_orders (all the orders in one NumPy batch) against
+## simulate_passing_order called once per order and against extend_sim_state (the scalar path of the
+## MCTS rollouts), on random fleet-respecting orders. The batch overtakes extend_sim_state only from
+## a few dozen orders, more than the children of a tree node (at most one per lane).
+
+def random_order(scheduler, rng):
+    progress = [0]*len(scheduler.fleets)
+    order = []
+    while len(order) < scheduler.num_veh:
+        fleet_idx = rng.choice([f for f, members in enumerate(scheduler.fleets) if progress[f] < len(members)])
+        order.append(scheduler.fleets[fleet_idx][progress[fleet_idx]])
+        progress[fleet_idx] += 1
+    return order
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument("--num_veh", type=int, nargs="+", default=[12, 50, 100])
+    parser.add_argument("--num_orders", type=int, nargs="+", default=[4, 10, 32, 100, 1000])
+    parser.add_argument("--fleet_size", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    for num_veh in args.num_veh:
+        states = make_states(num_veh, args.fleet_size, rng)
+        scheduler = Scheduler(CONFLICT_ZONES, states, 0.5, 0, 0, 1.2, 0)
+        for num_orders in args.num_orders:
+            orders = np.array([random_order(scheduler, rng) for _ in range(num_orders)])
+            start = time.perf_counter()
+            delays, _ = scheduler.evaluate_orders(orders, return_t_assign=True)
+            batch = time.perf_counter() - start
+
+            start = time.perf_counter()
+            for row, order in enumerate(orders):
+                passing_order = [scheduler.all_veh[idx] for idx in order]
+                delay, _ = simulate_passing_order(passing_order, CONFLICT_ZONES, [scheduler.get_state(veh) for veh in passing_order],
+                                                  scheduler.safety_gap, scheduler.my_lane_id, scheduler.my_fleet_id, scheduler.alpha)
+                assert delay == delays[row]
+            single = time.perf_counter() - start
+
+            start = time.perf_counter()
+            for row, order in enumerate(orders):
+                sim_state = scheduler.init_sim_state()
+                for idx in order:
+                    sim_state, _ = scheduler.extend_sim_state(sim_state, idx)
+                assert sim_state[1] == delays[row]
+            table = time.perf_counter() - start
+            print(f"{num_veh:>4} vehicles, {num_orders:>5} orders: batch {num_orders/batch:>9.0f} orders/s, " + \
+                f"one at a time {num_orders/single:>7.0f} orders/s, extend_sim_state {num_orders/table:>7.0f} orders/s")
+
+if __name__ == '__main__':
+    main()
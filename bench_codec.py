@@ -0,0 +1,75 @@
+from argparse import ArgumentParser
+from API import Codec
+import time
+
+## Encode/decode throughput of the binary wire format against the
+## comma/semicolon-delimited text format it replaced.
+
+def text_encode_state(lane_id, fleet_id, vehicle_id, location, velocity, acceleration, des_lane_id, finish):
+    x = 1 if finish else 0
+    return (f"{lane_id},{fleet_id},{vehicle_id}," + \
+        f"{location[0]},{location[1]}," + \
+        f"{velocity[0]},{velocity[1]}," + \
+        f"{acceleration[0]},{acceleration[1]},{des_lane_id},{x}").encode('utf-8')
+
+def text_decode_state(payload):
+    receive = payload.decode('utf-8').split(',')
+    state = {
+        "location": (float(receive[3]),float(receive[4])),
+        "velocity": (float(receive[5]),float(receive[6])),
+        "acceleration": (float(receive[7]),float(receive[8])),
+        "des_lane_id": int(receive[9])
+    }
+    return int(receive[0]), int(receive[1]), int(receive[2]), state, int(receive[10])
+
+def text_encode_proposal(lane_id, fleet_id, proposal):
+    pub_content = f"{lane_id},{fleet_id}:"
+    for veh in proposal:
+        deadlines = proposal[veh]
+        pub_content += f"{veh[0]},{veh[1]},{veh[2]},{deadlines[0]},{deadlines[1]},{deadlines[2]},{deadlines[3]};"
+    return pub_content.encode('utf-8')
+
+def text_decode_proposal(payload):
+    receive = payload.decode('utf-8').split(':')
+    lane_id = int(receive[0].split(',')[0])
+    fleet_id = int(receive[0].split(',')[1])
+    proposal = dict()
+    for s in receive[1].split(';')[:(-1)]:
+        s = s.split(',')
+        veh = (int(s[0]),int(s[1]),int(s[2]))
+        proposal[veh] = [float(s[3]),float(s[4]),float(s[5]),float(s[6])]
+    return lane_id, fleet_id, proposal
+
+def measure(name, func, arg, num_iter):
+    start = time.perf_counter()
+    for _ in range(num_iter):
+        result = func(*arg)
+    elapsed = time.perf_counter() - start
+    print(f"{name:<28}{num_iter/elapsed:>14.0f} msg/s")
+    return result
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument("--num_iter", type=int, default=100000)
+    parser.add_argument("--num_veh", type=int, default=32, help="vehicles in a proposal")
+    args = parser.parse_args()
+
+    state = (2, 7, 3, (-1.2345678901, 18.765432109), (0.0, -9.87654321), (0.123456789, -2.5), 0, False)
+    proposal = {(i % 4, i // 8, i % 8): [1.8+i, 2.6+i, -1, -1] for i in range(args.num_veh)}
+
+    print(f"state message: text {len(text_encode_state(*state))} bytes, binary {len(Codec.encode_state(*state))} bytes")
+    payload = measure("text encode state", text_encode_state, state, args.num_iter)
+    measure("text decode state", text_decode_state, (payload,), args.num_iter)
+    payload = measure("binary encode state", Codec.encode_state, state, args.num_iter)
+    measure("binary decode state", Codec.decode_state, (payload,), args.num_iter)
+
+    num_iter = max(1, args.num_iter // args.num_veh)
+    print(f"proposal message ({args.num_veh} vehicles): text {len(text_encode_proposal(0, 0, proposal))} bytes, " + \
+        f"binary {len(Codec.encode_proposal(0, 0, proposal))} bytes")
+    payload = measure("text encode proposal", text_encode_proposal, (0, 0, proposal), num_iter)
+    measure("text decode proposal", text_decode_proposal, (payload,), num_iter)
+    payload = measure("binary encode proposal", Codec.encode_proposal, (0, 0, proposal), num_iter)
+    measure("binary decode proposal", Codec.decode_proposal, (payload,), num_iter)
+
+if __name__ == '__main__':
+    main()
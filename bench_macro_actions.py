@@ -0,0 +1,50 @@
+from argparse import ArgumentParser
+from API.Scheduler import Scheduler
+from API.Simulator import simulate_passing_order
+from bench_node_expansion import make_states, CONFLICT_ZONES
+import random
+import time
+
+## MCTS with per-vehicle actions against fleet macro actions (admit the next k vehicles
+## of a fleet) at the same iteration budget: tree size and total delay of the result.
+
+def total_delay(scheduler, passing_order):
+    # complete a partial order the same way the rollouts do
+    placed = set(passing_order)
+    passing_order = list(passing_order) + [scheduler.all_veh[idx] for idx in scheduler.dist_order
+                                           if scheduler.all_veh[idx] not in placed]
+    states_list = [scheduler.get_state(veh) for veh in passing_order]
+    delay, _ = simulate_passing_order(passing_order, CONFLICT_ZONES, states_list, scheduler.safety_gap,
+                                      scheduler.my_lane_id, scheduler.my_fleet_id, scheduler.alpha)
+    return delay
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument("--num_fleets", type=int, nargs="+", default=[4, 8])
+    parser.add_argument("--fleet_size", type=int, default=8)
+    parser.add_argument("--chunks", type=int, nargs="+", default=[2, 4, 8])
+    parser.add_argument("--num_iter", type=int, default=1000)
+    parser.add_argument("--seeds", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    for num_fleets in args.num_fleets:
+        num_veh = num_fleets*args.fleet_size
+        scenarios = [make_states(num_veh, args.fleet_size, rng) for _ in range(args.seeds)]
+        print(f"{num_fleets} fleets of {args.fleet_size} vehicles, {args.num_iter} iterations")
+        for chunk in [None] + args.chunks:
+            nodes, delay, best, elapsed = 0, 0, 0, 0
+            for seed, states in enumerate(scenarios):
+                scheduler = Scheduler(CONFLICT_ZONES, states, 0.5, 0, 0, 1.0, seed, macro_chunk=chunk)
+                start = time.perf_counter()
+                passing_order = scheduler.search(args.num_iter)
+                elapsed += time.perf_counter() - start
+                nodes += scheduler.num_nodes
+                delay += total_delay(scheduler, passing_order)
+                best += scheduler.best_rollout[0]
+            name = "per vehicle" if chunk is None else f"chunks of {chunk}"
+            print(f"  {name:<12}: {nodes/args.seeds:8.0f} nodes, total delay {delay/args.seeds:8.1f} s " + \
+                f"(best rollout {best/args.seeds:8.1f} s), {elapsed/args.seeds:.2f} s")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+from argparse import ArgumentParser
+from copy import deepcopy
+from API.Scheduler import Scheduler
+import random
+import time
+
+## Cost of expanding one MCTS node at 20, 50 and 100 vehicles, against the
+## list-based representation (remaining vehicles filtered with "not in" and the
+## passing order deep-copied into every child) it replaced.
+
+CONFLICT_ZONES = [(0,0,4,4),(-4,0,0,4),(-4,-4,0,0),(0,-4,4,0)]
+START = [((18,2),(-10,0)), ((-2,18),(0,-10)), ((-18,-2),(10,0)), ((2,-18),(0,10))]
+DIRECTION = [(1,0), (0,1), (-1,0), (0,-1)]
+
+def make_states(num_veh, fleet_size, rng):
+    ## fleets of fleet_size vehicles spread over the 4 lanes, 15 m between vehicles
+    states = dict()
+    fid = [0]*4
+    while len(states) < num_veh:
+        lane_id = len(states) // fleet_size % 4
+        des_lane_id = (lane_id + rng.choice([1,2,3])) % 4
+        for vid in range(min(fleet_size, num_veh-len(states))):
+            offset = 15*(fid[lane_id]*fleet_size+vid)
+            (x, y), velocity = START[lane_id]
+            location = (x+DIRECTION[lane_id][0]*offset, y+DIRECTION[lane_id][1]*offset)
+            states[(lane_id, fid[lane_id], vid)] = {'location': location, 'velocity': velocity,
+                                                    'acceleration': (0,0), 'des_lane_id': des_lane_id}
+        fid[lane_id] += 1
+    return states
+
+def legacy_expand(all_veh, passing_order):
+    remain_veh = list(filter(lambda veh: veh not in passing_order, all_veh))
+    children = []
+    for veh in remain_veh:
+        if veh[3] == 0 or (veh[0], veh[1], veh[2], veh[3]-1) in passing_order:
+            next_order = deepcopy(passing_order)
+            next_order.append(veh)
+            children.append(next_order)
+    return children
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument("--num_veh", type=int, nargs="+", default=[20, 50, 100])
+    parser.add_argument("--fleet_size", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    for num_veh in args.num_veh:
+        states = make_states(num_veh, args.fleet_size, rng)
+        scheduler = Scheduler(CONFLICT_ZONES, states, 0.5, 0, 0, 1.0, 0)
+        # expand the nodes along one random path from the root to a leaf
+        path = []
+        node = scheduler.root
+        while node.depth < num_veh:
+            path.append(node)
+            idx = rng.choice(scheduler.get_possible_next_veh(node))
+            fleet_idx = scheduler.fleet_of[idx]
+            progress = node.progress[:fleet_idx] + (node.progress[fleet_idx]+1,) + node.progress[fleet_idx+1:]
+            node.expand(idx, progress)
+            node = node.children[-1]
+        orders = [scheduler.get_passing_order(node) for node in path]
+
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            for node in path:
+                node.children = []
+                scheduler.expand_node(node)
+        compact = (time.perf_counter() - start) / (args.repeat*len(path))
+
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            for passing_order in orders:
+                legacy_expand(scheduler.all_veh, passing_order)
+        legacy = (time.perf_counter() - start) / (args.repeat*len(orders))
+        print(f"{num_veh:>4} vehicles: {compact*1e6:8.1f} us per expansion (list-based: {legacy*1e6:8.1f} us)")
+
+if __name__ == '__main__':
+    main()
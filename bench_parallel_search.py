@@ -0,0 +1,60 @@
+from argparse import ArgumentParser
+from API.Scheduler import Scheduler
+from API.Simulator import simulate_passing_order
+from main import read_input
+import os
+import time
+
+## Solution quality against wall time of the root-parallel MCTS.
+## Each worker runs num_iter iterations, so more workers search more for about the same wall time,
+## but only with a free core per worker: on one core the workers run one after another and the wall
+## time grows with their number (with 300 iterations on the sample input, 0.012 s for 1 worker,
+## 0.027 s for 2 and 0.069 s for 4, all finding the same order since the tree of four fleets is small).
+## Check os.cpu_count() before reading a speedup into the numbers.
+
+CONFLICT_ZONES = [(0,0,4,4),(-4,0,0,4),(-4,-4,0,0),(0,-4,4,0)]
+
+def total_delay(scheduler, passing_order):
+    # complete a partial order the same way the rollouts do
+    remain_veh = [veh for veh in scheduler.all_veh if veh not in passing_order]
+    remain_veh = sorted(remain_veh, key=lambda veh: scheduler.get_dist_to_center(veh))
+    passing_order = list(passing_order) + remain_veh
+    states_list = [scheduler.get_state(veh) for veh in passing_order]
+    delay, _ = simulate_passing_order(passing_order, CONFLICT_ZONES, states_list, scheduler.safety_gap,
+                                      scheduler.my_lane_id, scheduler.my_fleet_id, 1.0)
+    return delay
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument("--input_file", type=str, default="sample_input")
+    parser.add_argument("--num_iter", type=int, default=1000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--seeds", type=int, default=3, help="repetitions with different seeds")
+    args = parser.parse_args()
+
+    fleets, _ = read_input(args.input_file)
+    states = dict()
+    for fleet in fleets:
+        for veh in fleet['vehicles']:
+            states[(fleet['lane_id'], fleet['fid'], veh['vid'])] = {'location': veh['location'],
+                'velocity': veh['velocity'], 'acceleration': veh['acceleration'],
+                'des_lane_id': fleet['des_lane_id']}
+
+    print(f"{len(states)} vehicles, {args.num_iter} iterations per worker, {os.cpu_count()} cores")
+    for workers in args.workers:
+        if workers > 1:
+            # start the pool before timing
+            Scheduler(CONFLICT_ZONES, states, 0.5, 0, 0, 1.0, 0).search(1, workers)
+        delays = []
+        elapsed = 0
+        for seed in range(args.seeds):
+            scheduler = Scheduler(CONFLICT_ZONES, states, 0.5, 0, 0, 1.0, seed)
+            start = time.perf_counter()
+            passing_order = scheduler.search(args.num_iter, workers)
+            elapsed += time.perf_counter() - start
+            delays.append(total_delay(scheduler, passing_order))
+        print(f"workers {workers:>3}: wall time {elapsed/args.seeds:.3f} s, " + \
+            f"total delay mean {sum(delays)/len(delays):.3f} best {min(delays):.3f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+from argparse import ArgumentParser
+from multiprocessing import Process, Queue, Event
+from API.Session import SessionFactory, SESSION_MODES, DEFAULT_ROUTER
+from API.Transport import InprocBus
+from API.Vehicle import Leader, Member
+import queue
+import time
+
+## Startup time of the vehicles of the process engine with each session mode of API/Session.py:
+## the time until every vehicle process has opened its session and declared the publishers and
+## subscribers of its vehicle, then until one state of every vehicle has reached the leaders.
+## inproc: the sessions of the in-process engine (all the vehicles in this process), for reference.
+## The zenoh modes need zenoh (and a router listening on --router for the client mode).
+
+FLEET_LEN = 4
+
+def create_vehicle(session, pid: int):
+    lane_id, fid, vid = pid // FLEET_LEN % 4, pid // (4*FLEET_LEN), pid % FLEET_LEN
+    location = [(18+15*vid, 2), (-2, 18+15*vid), (-18-15*vid, -2), (2, -18-15*vid)][lane_id]
+    if vid == 0:
+        return Leader(session, (0, 0), location, (0, 0), vid, fid, lane_id, 0.1, (lane_id+2) % 4, FLEET_LEN)
+    return Member(session, (0, 0), location, (0, 0), vid, fid, lane_id, (lane_id+2) % 4, 0.1)
+
+def join_all_fleets(myvehicle, num_veh: int):
+    ## a leader takes the states of every fleet, as in a schedule group of all of them
+    if myvehicle.vehicle_id == 0:
+        myvehicle.group_fleets = {(pid // FLEET_LEN % 4, pid // (4*FLEET_LEN)) for pid in range(0, num_veh, FLEET_LEN)}
+
+def wait_states(vehicles: list, num_veh: int, timeout: float) -> bool:
+    ## wait until the leaders (in vehicles) have got a snapshot of every fleet
+    deadline = time.perf_counter() + timeout
+    num_fleets = (num_veh + FLEET_LEN - 1) // FLEET_LEN
+    while time.perf_counter() < deadline:
+        for leader in vehicles:
+            leader.sync_records()
+        if all(len(set((k[0], k[1]) for k in leader.fleets_state_record)) >= num_fleets
+               for leader in vehicles if leader.vehicle_id == 0):
+            return True
+        time.sleep(0.001)
+    return False
+
+def run_vehicle(sessions, pid: int, num_veh: int, start_time: float, results, go, timeout: float):
+    try:
+        session = sessions.open(pid)
+        myvehicle = create_vehicle(session, pid)
+        join_all_fleets(myvehicle, num_veh)
+        results.put((pid, time.perf_counter() - start_time))
+        go[0].wait()
+        myvehicle.pub_state()
+        received = wait_states([myvehicle], num_veh, timeout) if myvehicle.vehicle_id == 0 else True
+        results.put((pid, time.perf_counter() - start_time if received else None))
+        go[1].wait()
+        session.close()
+    except Exception as e:
+        results.put((pid, f"{type(e).__name__}: {e}"))
+
+def bench_processes(mode: str, num_veh: int, router: str, timeout: float):
+    start_time = time.perf_counter()
+    sessions = SessionFactory(mode, num_veh, router)
+    results = Queue()
+    go = [Event(), Event()] # the phases start once every vehicle has finished the previous one
+    processes = [Process(target=run_vehicle, args=(sessions, pid, num_veh, start_time, results, go, timeout))
+                 for pid in range(num_veh)]
+    for proc in processes:
+        proc.start()
+    times = []
+    try:
+        for phase in range(2):
+            phase_times = []
+            for _ in range(num_veh):
+                pid, result = results.get(timeout=timeout)
+                if isinstance(result, str):
+                    return f"unavailable ({result})"
+                phase_times.append(result)
+            times.append(None if None in phase_times else max(phase_times))
+            go[phase].set()
+        for proc in processes:
+            proc.join()
+    except queue.Empty:
+        return "timed out"
+    finally:
+        for proc in processes:
+            if proc.is_alive():
+                proc.terminate()
+        sessions.close()
+    exchanged = "timed out" if times[1] is None else f"{times[1]:.3f} s"
+    return f"ready {times[0]:.3f} s, states exchanged {exchanged}, total {time.perf_counter()-start_time:.3f} s"
+
+def bench_inproc(num_veh: int):
+    start_time = time.perf_counter()
+    bus = InprocBus()
+    vehicles = [create_vehicle(bus.open_session(), pid) for pid in range(num_veh)]
+    for myvehicle in vehicles:
+        join_all_fleets(myvehicle, num_veh)
+    ready = time.perf_counter() - start_time
+    for myvehicle in vehicles:
+        myvehicle.pub_state()
+    bus.deliver()
+    exchanged = time.perf_counter() - start_time
+    return f"ready {ready:.3f} s, states exchanged {exchanged:.3f} s"
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument("--num_veh", type=int, nargs="+", default=[12, 48, 100])
+    parser.add_argument("--modes", type=str, nargs="+", default=SESSION_MODES + ["inproc"],
+                        choices=SESSION_MODES + ["inproc"])
+    parser.add_argument("--router", type=str, default=DEFAULT_ROUTER)
+    parser.add_argument("--timeout", type=float, default=30, help="seconds to wait for the vehicles of a run")
+    args = parser.parse_args()
+
+    for num_veh in args.num_veh:
+        for mode in args.modes:
+            if mode == "inproc":
+                result = bench_inproc(num_veh)
+            else:
+                result = bench_processes(mode, num_veh, args.router, args.timeout)
+            print(f"{num_veh:>4} vehicles {mode:<8}{result}")
+
+if __name__ == '__main__':
+    main()
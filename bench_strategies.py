@@ -0,0 +1,59 @@
+from argparse import ArgumentParser
+from API.Strategy import STRATEGIES
+from API.Simulator import simulate_passing_order
+from bench_node_expansion import make_states, CONFLICT_ZONES
+import random
+import time
+
+## Runtime and optimality gap of the search strategies against the size of the schedule group.
+## The gap is the mean extra total delay (seconds) over the best order of all the strategies,
+## which is optimal when branch and bound finishes within its time budget (marked with *).
+
+def total_delay(scheduler, passing_order):
+    states_list = [scheduler.get_state(veh) for veh in passing_order]
+    delay, _ = simulate_passing_order(passing_order, CONFLICT_ZONES, states_list, scheduler.safety_gap,
+                                      scheduler.my_lane_id, scheduler.my_fleet_id, scheduler.alpha)
+    return delay
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument("--num_veh", type=int, nargs="+", default=[6, 8, 10, 12, 16, 20, 30, 50])
+    parser.add_argument("--fleet_size", type=int, default=3)
+    parser.add_argument("--num_iter", type=int, default=1000, help="MCTS iterations")
+    parser.add_argument("--time_budget", type=float, default=5, help="seconds before branch and bound gives up")
+    parser.add_argument("--seeds", type=int, default=3, help="random scenarios per size")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    print(f"{'vehicles':>8}" + "".join(f"{name:>26}" for name in STRATEGIES))
+    for num_veh in args.num_veh:
+        elapsed = dict.fromkeys(STRATEGIES, 0)
+        gap = dict.fromkeys(STRATEGIES, 0)
+        optimal = 0
+        for seed in range(args.seeds):
+            states = make_states(num_veh, args.fleet_size, rng)
+            # stagger the vehicles so that the lanes do not arrive in lockstep
+            for veh, state in states.items():
+                shift = rng.uniform(0, 10)
+                x, y = state["location"]
+                state["location"] = (x + shift*(x > 2) - shift*(x < -2), y + shift*(y > 2) - shift*(y < -2))
+            delays = dict()
+            for name, scheduler_class in STRATEGIES.items():
+                scheduler = scheduler_class(CONFLICT_ZONES, states, 0.5, 0, 0, 1.0, seed)
+                start = time.perf_counter()
+                time_budget = args.time_budget if name == "bnb" else None
+                passing_order = scheduler.search(args.num_iter, time_budget=time_budget)
+                elapsed[name] += time.perf_counter() - start
+                delays[name] = total_delay(scheduler, passing_order)
+                if name == "bnb" and scheduler.exhausted:
+                    optimal += 1
+            best = min(delays.values())
+            for name in STRATEGIES:
+                gap[name] += delays[name] - best
+        row = f"{num_veh:>7}{'*' if optimal == args.seeds else ' '}"
+        for name in STRATEGIES:
+            row += f"{elapsed[name]/args.seeds*1000:>12.1f} ms {gap[name]/args.seeds:>8.1f} s"
+        print(row)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,35 @@
+from argparse import ArgumentParser
+from API.Scheduler import Scheduler
+from bench_node_expansion import make_states, CONFLICT_ZONES
+import random
+import time
+import tracemalloc
+
+## Memory held by the MCTS tree per 1000 iterations, with and without a node budget.
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument("--num_veh", type=int, nargs="+", default=[20, 50, 100])
+    parser.add_argument("--fleet_size", type=int, default=5)
+    parser.add_argument("--num_iter", type=int, default=1000)
+    parser.add_argument("--node_budget", type=int, default=1000)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    for num_veh in args.num_veh:
+        states = make_states(num_veh, args.fleet_size, rng)
+        for node_budget in [None, args.node_budget]:
+            tracemalloc.start()
+            start = time.perf_counter()
+            scheduler = Scheduler(CONFLICT_ZONES, states, 0.5, 0, 0, 1.0, 0, node_budget)
+            scheduler.search(args.num_iter)
+            elapsed = time.perf_counter() - start
+            scheduler.rollout_cache.clear() # only count the tree
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            per_1000 = current / args.num_iter * 1000 / 2**20
+            print(f"{num_veh:>4} vehicles, node budget {str(node_budget):>6}: {scheduler.num_nodes:>7} nodes, " + \
+                f"{per_1000:7.2f} MiB per 1000 iterations (peak {peak/2**20:7.2f} MiB), {elapsed:.2f} s")
+
+if __name__ == '__main__':
+    main()
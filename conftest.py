@@ -0,0 +1,49 @@
+import pytest
+
+## Fixtures shared by the test_*.py files: the intersection and generated schedule groups.
+
+# zenoh scripts, not tests
+collect_ignore = ["pub_test.py", "sub_test.py"]
+
+CONFLICT_ZONES = [(0,0,4,4),(-4,0,0,4),(-4,-4,0,0),(0,-4,4,0)]
+START = [((18,2),(-10,0)), ((-2,18),(0,-10)), ((-18,-2),(10,0)), ((2,-18),(0,10))]
+DIRECTION = [(1,0), (0,1), (-1,0), (0,-1)]
+
+def group_states(num_veh, fleet_size, rng):
+    ## fleets of fleet_size vehicles spread over the 4 lanes, 15 m between vehicles
+    states = dict()
+    fid = [0]*4
+    while len(states) < num_veh:
+        lane_id = len(states) // fleet_size % 4
+        des_lane_id = (lane_id + rng.choice([1,2,3])) % 4
+        for vid in range(min(fleet_size, num_veh-len(states))):
+            offset = 15*(fid[lane_id]*fleet_size+vid)
+            (x, y), velocity = START[lane_id]
+            location = (x+DIRECTION[lane_id][0]*offset, y+DIRECTION[lane_id][1]*offset)
+            states[(lane_id, fid[lane_id], vid)] = {'location': location, 'velocity': velocity,
+                                                    'acceleration': (0,0), 'des_lane_id': des_lane_id}
+        fid[lane_id] += 1
+    return states
+
+def staggered_group_states(num_veh, fleet_size, rng):
+    ## group_states with every vehicle moved back by a random distance of up to 10 m
+    states = group_states(num_veh, fleet_size, rng)
+    for state in states.values():
+        shift = rng.uniform(0, 10)
+        x, y = state["location"]
+        state["location"] = (x + shift*(x > 2) - shift*(x < -2), y + shift*(y > 2) - shift*(y < -2))
+    return states
+
+@pytest.fixture
+def conflict_zones():
+    return CONFLICT_ZONES
+
+@pytest.fixture
+def make_states():
+    ## make_states(num_veh, fleet_size, rng): see group_states
+    return group_states
+
+@pytest.fixture
+def staggered_states():
+    ## staggered_states(num_veh, fleet_size, rng): see staggered_group_states
+    return staggered_group_states
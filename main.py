@@ -1,18 +1,23 @@
-import sys
 import time
 from argparse import ArgumentParser
-import itertools
-import json
-import zenoh
 from datetime import datetime
-from API.Vehicle import MyVehicle, Leader, Member
+from API.Vehicle import MyVehicle, Leader, Member, FleetChannel, FleetQueueChannel, MAX_SPEED, MIN_ACCELERATION, TURNING_RADIUS
+from API.Kinematics import KinematicsStore
 from API.math_utils import *
-import os, signal
+from API.Barrier import RoundBarrier
+from API.Collision import CollisionDetector
+from API.Renderer import TrajectoryRenderer, RENDER_MODES
+from API.RunLog import RunLog, LOG_FORMATS
+from API.Transport import InprocBus, BUS_DELIVERIES
+from API.Session import SessionFactory, SESSION_MODES, DEFAULT_ROUTER
+from API.Strategy import STRATEGIES
+from API.Scenario import ScenarioGenerator, layout, read_trace, write_input, TRACE_FORMAT
 from multiprocessing import Process, Array
 from typing import List, Dict, Tuple
-import matplotlib.pyplot as plt
 CONFLICT_ZONES = [(0,0,4,4),(-4,0,0,4),(-4,-4,0,0),(0,-4,4,0)]
 MAX_VEH_NUM = 100
+ENTRY_CLEARANCE = 5 # streaming mode: a fleet enters at least this far (m) plus its braking distance
+                    # behind the vehicles of its lane
 
 SCHEDULE_GROUP_FORMING = 0
 COLLECT_STATES = 1
@@ -20,166 +25,353 @@ COLLECT_PROPOSALS = 2
 COLLECT_SCORES = 3
 RUNNING = 4
 
-def run_vehicle(veh_num: int, pid: int, lane_id: int, des_lane_id: int, fid: int, 
-    fleet_len: int,  vid: int, location: tuple, velocity: tuple, 
-    acceleration: tuple, rounds, location_info, velocity_info, finished_list):
-    print(f"start running vehicle {lane_id}-{fid}-{vid} (pid: {pid})")
-    # print(veh_num, pid, des_lane_id, fleet_len, location, velocity, acceleration)
+def create_vehicle(session, lane_id: int, des_lane_id: int, fid: int, fleet_len: int,
+    vid: int, location: tuple, velocity: tuple, acceleration: tuple, store=None, channel=None):
     delta_t = args.delta_t
-    session = zenoh.open()
     if vid == 0:
         # Leader
         myvehicle = Leader(session, velocity, location, acceleration, vid, fid, lane_id,
-                           delta_t, des_lane_id, fleet_len)
+                           delta_t, des_lane_id, fleet_len, store, channel)
     else:
         myvehicle = Member(session, velocity, location, acceleration,
-                               vid, fid, lane_id, des_lane_id, delta_t)
+                               vid, fid, lane_id, des_lane_id, delta_t, store, channel)
+    return myvehicle
+
+def report_collisions(collisions: list):
+    for (tick, i, j, location1, location2) in collisions:
+        print(f"Collision detected between vehicle {i} (location: {location1}) and vehicle {j} (location: {location2}) at {round(tick,3)} seconds!")
+        run_log.log_collision(tick, i, j)
+
+def create_renderer():
+    output_file = args.render_file if args.render_file else f"figure.{args.render}"
+    return TrajectoryRenderer(args.render, output_file, args.render_interval)
+
+def record_crossing(myvehicle: MyVehicle, pid: int):
+    lane_id, fid, vid = myvehicle.lane_id, myvehicle.fleet_id, myvehicle.vehicle_id
+    print(f"vehicle {lane_id}-{fid}-{vid} (pid: {pid}) has crossed the intersection using {myvehicle.tick} seconds.")
+    run_log.log_crossing(myvehicle, pid)
+
+def print_vehicle_state(myvehicle: MyVehicle, pid: int):
+    run_log.log_state(myvehicle, pid)
+    if (myvehicle.tick // args.delta_t) % 5 == 0:
+        print(f"State of the vehicle {myvehicle.lane_id}-{myvehicle.fleet_id}-{myvehicle.vehicle_id} at time {round(myvehicle.tick,3)}: location {myvehicle.location}, velocity {myvehicle.velocity}, acceleration {myvehicle.acceleration}")
+
+def run_protocol_round(myvehicle: MyVehicle, phase: int, pid: int, drive: bool = True) -> int:
+    ## run one round of the scheduling protocol for a vehicle that has not crossed yet
+    ## drive: step and control the vehicle in RUNNING phase (the in-process engine does it in batch)
+    ## return: the phase of the next round
+    lane_id, fid, vid = myvehicle.lane_id, myvehicle.fleet_id, myvehicle.vehicle_id
+    propose_budget = None if args.propose_budget_ms is None else args.propose_budget_ms/1000
+    myvehicle.pub_state()
+    if phase != RUNNING:
+        if vid == 0:
+            if phase == SCHEDULE_GROUP_FORMING:
+                # print(pid, myvehicle.schedule_map)
+                myvehicle.pub_schedule_map()
+                if myvehicle.schedule_group_consensus():
+                    # print(f"Fleet {lane_id}-{fid} got final schedule group: {myvehicle.schedule_map}")
+                    phase = COLLECT_STATES
+            elif phase == COLLECT_STATES:
+                if myvehicle.all_states_received():
+                    # print(f"Fleet {lane_id}-{fid} got all states!")
+                    phase = COLLECT_PROPOSALS
+            elif phase == COLLECT_PROPOSALS:
+                myvehicle.propose(1000, 1.2, args.workers, args.node_budget, propose_budget, args.strategy, args.macro_chunk)
+                if propose_budget is not None and myvehicle.search_iterations > 0:
+                    print(f"Fleet {lane_id}-{fid} searched {myvehicle.search_iterations} iterations within {args.propose_budget_ms} ms")
+                # print(f"Fleet {lane_id}-{fid} proposed time slot assignment: {myvehicle.proposal}")
+                myvehicle.pub_propose()
+                if myvehicle.all_proposal_received():
+                    # print(f"Fleet {lane_id}-{fid} received all proposals!")
+                    phase = COLLECT_SCORES
+            elif phase == COLLECT_SCORES:
+                myvehicle.pub_score()
+                if myvehicle.all_score_received():
+                    # print(f"Fleet {lane_id}-{fid} received all score!")
+                    myvehicle.get_final_assignment()
+                    print(f"Final assignment for vehicle {lane_id}-{fid}-{vid}: {myvehicle.final_assignment}")
+                    if pid == 0:
+                        run_log.log_assignment(myvehicle.final_assignment, pid)
+                    myvehicle.pub_final_assignment()
+                    run_log.log_waypoints(myvehicle, myvehicle.get_plan(), pid)
+                    phase = RUNNING
+        else:
+            if len(myvehicle.final_assignment) > 0:
+                print(f"Final assignment for vehicle {lane_id}-{fid}-{vid}: {myvehicle.final_assignment}")
+                run_log.log_waypoints(myvehicle, myvehicle.get_plan(), pid)
+                phase = RUNNING
+    elif drive:
+        myvehicle.step_vehicle()
+        myvehicle.update_acceleration()
+        print_vehicle_state(myvehicle, pid)
+    return phase
+
+def run_vehicle(veh_num: int, pid: int, lane_id: int, des_lane_id: int, fid: int, 
+    fleet_len: int,  vid: int, location: tuple, velocity: tuple, 
+    acceleration: tuple, barrier, location_info, finished_list, log_client, sessions, start_time, channel=None):
+    global run_log
+    run_log = log_client
+    print(f"start running vehicle {lane_id}-{fid}-{vid} (pid: {pid})")
+    # print(veh_num, pid, des_lane_id, fleet_len, location, velocity, acceleration)
+    session = sessions.open(pid)
+    if pid == 0:
+        detector = CollisionDetector(1)
+        renderer = create_renderer()
+    myvehicle = create_vehicle(session, lane_id, des_lane_id, fid, fleet_len,
+                               vid, location, velocity, acceleration, channel=channel)
     cur_round = 1
     phase = SCHEDULE_GROUP_FORMING
     while(True):
         location_info[pid*2] = myvehicle.location[0]
         location_info[pid*2+1] = myvehicle.location[1]
-        velocity_info[pid*2] = myvehicle.velocity[0]
-        velocity_info[pid*2+1] = myvehicle.velocity[1]
-        rounds[pid] = cur_round
 
         ## wait for other processes
-        waiting = True
-        while waiting:
-            # print(f"lane_id: {lane_id}, fid: {fid}, vid: {vid} (pid: {pid}), rounds: {list(rounds)}")
-            if all([r>=cur_round for r in rounds]):
-                waiting = False
-            else:
-                time.sleep(0.5)
+        barrier.wait(pid)
             
         if pid == 0:
-            ## collision detection
-            for i in range(veh_num):
-                if finished_list[i] == 1:
-                    continue
-                for j in range(veh_num):
-                    if j != i and finished_list[j] == 0:
-                        location1 = (location_info[2*i], location_info[2*i+1])
-                        location2 = (location_info[2*j], location_info[2*j+1])
-                        if euclidean_dist(location1, location2) <= 1:
-                            print(f"Collision detected between vehicle {i} (location: {location1}) and vehicle {j} (location: {location2}) at {round(myvehicle.tick,3)} seconds!")
-                            raise
+            if cur_round == 1:
+                print(f"{veh_num} vehicles ready ({args.session} sessions) {round(time.time()-start_time,3)} seconds after start")
+            if args.barrier_stats:
+                print(f"round {cur_round}: {barrier.report()}")
+            if all(finished_list):
+                renderer.close()
+                break
 
+            ## collision detection
+            report_collisions(detector.detect(location_info, finished_list, myvehicle.tick))
             if phase == RUNNING:
-                fig, ax = plt.subplots()
-                ax.set_xlim(-10,10)
-                ax.set_ylim(-10,10)
-                ax.plot([-10,10],[4,4])
-                ax.plot([4,4],[10,-10])
-                ax.plot([10,-10],[-4,-4])
-                ax.plot([-4,-4],[-10,10])
-                ax.plot([-10,10],[0,0],linestyle='dashed')
-                ax.plot([0,0],[-10,10],linestyle='dashed')
-                for i in range(veh_num):
-                    if finished_list[i] == 0:
-                        ax.scatter(location_info[2*i], location_info[2*i+1], label=f"{i}")
-                plt.savefig("figure.png".format(myvehicle.tick))
-
+                renderer.feed(cur_round*args.delta_t, location_info, finished_list)
 
+        myvehicle.sync_records() # one snapshot of what its listeners received per round
         if myvehicle.finish_cross():
             if not myvehicle.finish:
                 myvehicle.finish = True
             myvehicle.pub_state() # Tell the other vehicles that it has already crossed the intersection
             
             if finished_list[pid] == 0:
-                print(f"vehicle {lane_id}-{fid}-{vid} (pid: {pid}) has crossed the intersection using {myvehicle.tick} seconds.")
-                with open(args.output_file, "a") as f:
-                    f.write(f"vehicle {lane_id}-{fid}-{vid} (pid: {pid}) has crossed the intersection using {round(myvehicle.tick,2)} seconds.\n")
-                    f.flush()
+                record_crossing(myvehicle, pid)
                 finished_list[pid] = 1
 
             # print(f"Vehicle {lane_id}-{fid}-{vid} (pid: {pid}) finished round {cur_round}")
             cur_round += 1
+            if pid != 0:
+                # pid 0 keeps watching the others until all of them have finished. The others leave the
+                # barrier and stop: unlike the polling loop they replaced, they do not publish their
+                # finished state again every round, the one message above is the last of them (the
+                # vehicles that miss it take them for gone after STATE_TIMEOUT, see has_left)
+                barrier.leave(pid)
+                break
             continue
 
         # print(f"lane_id: {lane_id}, fid: {fid}, vid: {vid} (pid: {pid}), current round: {cur_round}, phase: {phase}")
 
         # print(f"Vehicle {lane_id}-{fid}-{vid} (pid: {pid}) starts round {cur_round}")
-        myvehicle.pub_state()
-        if phase != RUNNING:
-            if vid == 0:
-                if phase == SCHEDULE_GROUP_FORMING:
-                    # print(pid, myvehicle.schedule_map)
-                    myvehicle.pub_schedule_map()
-                    if myvehicle.schedule_group_consensus():
-                        # print(f"Fleet {lane_id}-{fid} got final schedule group: {myvehicle.schedule_map}")
-                        phase = COLLECT_STATES
-                elif phase == COLLECT_STATES:
-                    if myvehicle.all_states_received():
-                        # print(f"Fleet {lane_id}-{fid} got all states!")
-                        phase = COLLECT_PROPOSALS
-                elif phase == COLLECT_PROPOSALS:
-                    myvehicle.propose(1000, 1.2)
-                    # print(f"Fleet {lane_id}-{fid} proposed time slot assignment: {myvehicle.proposal}")
-                    myvehicle.pub_propose()
-                    if myvehicle.all_proposal_received():
-                        # print(f"Fleet {lane_id}-{fid} received all proposals!")
-                        phase = COLLECT_SCORES
-                elif phase == COLLECT_SCORES:
-                    myvehicle.pub_score()
-                    if myvehicle.all_score_received():
-                        # print(f"Fleet {lane_id}-{fid} received all score!")
-                        myvehicle.get_final_assignment()
-                        print(f"Final assignment for vehicle {lane_id}-{fid}-{vid}: {myvehicle.final_assignment}")
-                        if pid == 0:
-                            with open(args.output_file, "a") as f:
-                                f.write(f"Final assignment: {myvehicle.final_assignment}\n")
-                                f.flush()
-                        myvehicle.pub_final_assignment()
-                        with open(args.output_file, "a") as f:
-                            f.write(f"waypoints of vehicle {lane_id}-{fid}-{vid}: {myvehicle.get_waypoints(CONFLICT_ZONES)}\n")
-                            f.flush()
-                        phase = RUNNING
-            else:
-                if len(myvehicle.final_assignment) > 0:
-                    print(f"Final assignment for vehicle {lane_id}-{fid}-{vid}: {myvehicle.final_assignment}")
-                    with open(args.output_file, "a") as f:
-                        f.write(f"waypoints of vehicle {lane_id}-{fid}-{vid}: {myvehicle.get_waypoints(CONFLICT_ZONES)}\n")
-                        f.flush()
-                    phase = RUNNING
-        else:
-            myvehicle.step_vehicle()
-            myvehicle.update_acceleration()
-            if finished_list[pid] == 0 and (myvehicle.tick // delta_t) % 5 == 0:
-                print(f"State of the vehicle {lane_id}-{fid}-{vid} at time {round(myvehicle.tick,3)}: location {myvehicle.location}, velocity {myvehicle.velocity}, acceleration {myvehicle.acceleration}")
+        phase = run_protocol_round(myvehicle, phase, pid)
         # print(f"Vehicle {lane_id}-{fid}-{vid} (pid: {pid}) finished round {cur_round}")
         # if pid == 0:
         #     print(f"round {cur_round}")
         cur_round += 1
+    session.close()
 
+def create_bus() -> InprocBus:
+    return InprocBus(args.bus_delivery, args.bus_latency, args.bus_loss, args.bus_lossy_keys, args.bus_seed)
 
-def main():
-    parser = ArgumentParser()
-    parser.add_argument("--input_file",type=str, default="sample_input")
-    parser.add_argument("--delta_t",type=float, default=0.1)
-    parser.add_argument("--max_speed",type=float,default=16)
-    parser.add_argument("--max_acceleration",type=float,default=3)
-    parser.add_argument("--min_acceleration",type=float,default=-3)
-    parser.add_argument("--output_file", type=str, default="output.txt")
-    global args
-    args = parser.parse_args()
+def report_bus(bus: InprocBus):
+    if bus.num_lost > 0:
+        print(f"{bus.num_lost} messages lost")
+
+def run_inproc(fleets: list, veh_num: int):
+    ## drive every vehicle from this process in lock-step rounds
+    ## messages are exchanged over an in-memory bus and delivered at the end of each round
+    bus = create_bus()
+    store = KinematicsStore(MAX_SPEED, CONFLICT_ZONES, veh_num)
+    vehicles = []
+    for fleet in fleets:
+        channel = FleetChannel(fleet['fleet_len']) if args.batch_states else None
+        for veh in fleet['vehicles']:
+            print(f"start running vehicle {fleet['lane_id']}-{fleet['fid']}-{veh['vid']} (pid: {len(vehicles)})")
+            vehicles.append(create_vehicle(bus.open_session(), fleet['lane_id'],
+                fleet['des_lane_id'], fleet['fid'], fleet['fleet_len'], veh['vid'],
+                veh['location'], veh['velocity'], veh['acceleration'], store, channel))
+    assert(len(vehicles) == veh_num)
+
+    location_info = [0]*(veh_num*2)
+    finished_list = [0]*veh_num
+    detector = CollisionDetector(1)
+    renderer = create_renderer()
+    phases = [SCHEDULE_GROUP_FORMING]*veh_num
+    cur_round = 1
+    start_time = time.time()
+    while not all(finished_list):
+        for pid, myvehicle in enumerate(vehicles):
+            location_info[pid*2] = myvehicle.location[0]
+            location_info[pid*2+1] = myvehicle.location[1]
+
+        ## collision detection
+        report_collisions(detector.detect(location_info, finished_list, vehicles[0].tick))
+        if phases[0] == RUNNING:
+            renderer.feed(cur_round*args.delta_t, location_info, finished_list)
+
+        running = []
+        for pid, myvehicle in enumerate(vehicles):
+            if finished_list[pid] == 1:
+                continue
+            myvehicle.sync_records() # one snapshot of what its listeners received per round
+            if myvehicle.finish_cross():
+                myvehicle.finish = True
+                myvehicle.pub_state() # Tell the other vehicles that it has already crossed the intersection
+                record_crossing(myvehicle, pid)
+                finished_list[pid] = 1
+                continue
+            if phases[pid] == RUNNING:
+                running.append(pid)
+            phases[pid] = run_protocol_round(myvehicle, phases[pid], pid, drive=False)
+
+        drive_running(store, vehicles, running)
+        bus.deliver()
+        cur_round += 1
+    renderer.close()
+    print(f"{veh_num} vehicles finished in {cur_round-1} rounds, {round(time.time()-start_time,3)} seconds of wall time " + \
+        f"({bus.num_delivered} messages delivered, {len(detector.collisions)} collisions)")
+    report_bus(bus)
+
+def drive_running(store: KinematicsStore, vehicles: list, running: list):
+    ## step and control all running vehicles at once
+    ## running: pids, the rows of store are vehicles[pid].index
+    store.step([vehicles[pid].index for pid in running])
+    turning, targets = [], []
+    for pid in running:
+        waypt_loc, turn = vehicles[pid].plan_acceleration()
+        if turn:
+            turning.append(vehicles[pid].index)
+            targets.append(waypt_loc)
+    store.add_turning_acceleration(turning, targets, TURNING_RADIUS)
+    for pid in running:
+        print_vehicle_state(vehicles[pid], pid)
+
+def make_arrivals(fleets: list, interval: float, duration: float) -> list:
+    ## a sustained arrival process built from the input: its fleets enter again every interval
+    ## seconds (with fresh fleet ids) until duration
+    ## return: a list of (arrival time, fleet) sorted by arrival time
+    fid_stride = max(fleet['fid'] for fleet in fleets) + 1
+    arrivals = []
+    wave = 0
+    while wave*interval < duration:
+        for fleet in fleets:
+            arrivals.append((wave*interval, dict(fleet, fid=fleet['fid'] + wave*fid_stride)))
+        wave += 1
+    return arrivals
+
+def run_stream(arrivals: list):
+    ## rolling-horizon scheduling of continuous arrivals with the in-process engine
+    ## arrivals: (arrival time, fleet) sorted by arrival time
+    ## A fleet enters at its arrival time, or later when the vehicles of its lane are far enough
+    ## ahead (the fleets of a lane enter in order), and waits where it is for the next schedule group.
+    ## Every reschedule_interval seconds, once the previous group has got its final assignment,
+    ## the waiting leaders form a new group, scheduled after the time slots still committed to
+    ## the vehicles of the previous groups. All the vehicles share the clock of the engine.
+    bus = create_bus()
+    store = KinematicsStore(MAX_SPEED, CONFLICT_ZONES, sum(len(fleet['vehicles']) for _, fleet in arrivals))
+    vehicles = []
+    phases = []
+    location_info = []
+    finished_list = []
+    detector = CollisionDetector(1)
+    renderer = create_renderer()
+    group = [] # pids of the leaders of the last schedule group
+    num_groups = 0
+    next_group_time = 0
+    next_arrival = 0
+    waiting = [] # fleets that have arrived but not entered yet
+    cur_round = 1
+    start_time = time.time()
+    while next_arrival < len(arrivals) or waiting or not all(finished_list):
+        sim_time = (cur_round-1)*args.delta_t
+        while next_arrival < len(arrivals) and arrivals[next_arrival][0] <= sim_time + 1e-9:
+            waiting.append(arrivals[next_arrival][1])
+            next_arrival += 1
+        blocked_lanes = set()
+        for fleet in list(waiting):
+            entry_dist = min(euclidean_dist((0,0), veh['location']) - ENTRY_CLEARANCE -
+                             vector_length(*veh['velocity'])**2/(2*abs(MIN_ACCELERATION)) for veh in fleet['vehicles'])
+            if fleet['lane_id'] in blocked_lanes or any(
+                    myvehicle.lane_id == fleet['lane_id'] and finished_list[pid] == 0 and
+                    euclidean_dist((0,0), myvehicle.location) > entry_dist
+                    for pid, myvehicle in enumerate(vehicles)):
+                blocked_lanes.add(fleet['lane_id'])
+                continue
+            waiting.remove(fleet)
+            channel = FleetChannel(fleet['fleet_len']) if args.batch_states else None
+            for veh in fleet['vehicles']:
+                print(f"start running vehicle {fleet['lane_id']}-{fleet['fid']}-{veh['vid']} (pid: {len(vehicles)}) at {round(sim_time,3)} seconds")
+                myvehicle = create_vehicle(bus.open_session(), fleet['lane_id'],
+                    fleet['des_lane_id'], fleet['fid'], fleet['fleet_len'], veh['vid'],
+                    veh['location'], veh['velocity'], veh['acceleration'], store, channel)
+                myvehicle.enable_rolling_horizon()
+                vehicles.append(myvehicle)
+                phases.append(SCHEDULE_GROUP_FORMING)
+                location_info += [0, 0]
+                finished_list.append(0)
+
+        for pid, myvehicle in enumerate(vehicles):
+            if phases[pid] != RUNNING and finished_list[pid] == 0:
+                myvehicle.tick = sim_time
+            location_info[pid*2] = myvehicle.location[0]
+            location_info[pid*2+1] = myvehicle.location[1]
+
+        ## sliding window: the leaders waiting now form the next schedule group
+        if sim_time >= next_group_time - 1e-9 and all(phases[pid] == RUNNING for pid in group):
+            group = [pid for pid, myvehicle in enumerate(vehicles)
+                     if myvehicle.vehicle_id == 0 and phases[pid] == SCHEDULE_GROUP_FORMING and finished_list[pid] == 0]
+            for pid in group:
+                vehicles[pid].start_epoch()
+            if group:
+                num_groups += 1
+                next_group_time = sim_time + args.reschedule_interval
+        in_group = set(group)
+
+        ## collision detection
+        report_collisions(detector.detect(location_info, finished_list, sim_time))
+        renderer.feed(sim_time, location_info, finished_list)
+
+        running = []
+        for pid, myvehicle in enumerate(vehicles):
+            if finished_list[pid] == 1:
+                continue
+            myvehicle.sync_records() # one snapshot of what its listeners received per round
+            if myvehicle.finish_cross():
+                myvehicle.finish = True
+                myvehicle.pub_state() # Tell the other vehicles that it has already crossed the intersection
+                record_crossing(myvehicle, pid)
+                finished_list[pid] = 1
+                continue
+            if phases[pid] == RUNNING:
+                running.append(pid)
+                myvehicle.pub_slot()
+            elif myvehicle.vehicle_id == 0 and pid not in in_group:
+                myvehicle.pub_state() # waiting for the next schedule group
+                continue
+            phases[pid] = run_protocol_round(myvehicle, phases[pid], pid, drive=False)
 
-    with open(args.input_file, 'r') as f:
+        drive_running(store, vehicles, running)
+        bus.deliver()
+        cur_round += 1
+    renderer.close()
+    sim_time = (cur_round-1)*args.delta_t
+    print(f"{len(vehicles)} vehicles of {len(arrivals)} fleets crossed in {round(sim_time,3)} simulated seconds " + \
+        f"({round(len(vehicles)*3600/sim_time)} vehicles/hour) with {num_groups} schedule groups, " + \
+        f"{round(time.time()-start_time,3)} seconds of wall time ({bus.num_delivered} messages delivered, {len(detector.collisions)} collisions)")
+    report_bus(bus)
+
+def read_input(input_file: str):
+    with open(input_file, 'r') as f:
         input_words = f.read()
     input_lines = input_words.split('\n')
     basic_info = input_lines[0].split(' ')
     fleets_num = int(basic_info[0])
-    veh_num = int(basic_info[1])
-    rounds = Array('i', [0]*veh_num)
-
-    # To detect collisions
-    location_info = Array('d', [0]*(veh_num*2))
-    velocity_info = Array('d', [0]*(veh_num*2))
-    finished_list = Array('i',[0]*veh_num)
 
     fleets = [None]*fleets_num
     line_index = 1
-    veh_processes = []
     for i in range(fleets_num):
         l = input_lines[line_index]
         l = l.split(' ')
@@ -201,26 +393,172 @@ def main():
             vel_y = float(l[4])
             acc_x = float(l[5])
             acc_y = float(l[6])
-            pid = len(veh_processes)
-            location_info[pid*2] = loc_x
-            location_info[pid*2+1] = loc_y
-            velocity_info[pid*2] = vel_x
-            velocity_info[pid*2+1] = vel_y
             fleets[i]['vehicles'].append({'vid':vid, 'location':(loc_x,loc_y),
                 'velocity':(vel_x,vel_y), 'acceleration':(acc_x,acc_y)})
             line_index += 1
+    return fleets
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument("--input_file",type=str, default="sample_input")
+    parser.add_argument("--scenario", type=str, default="file", choices=["file", "poisson", "trace"],
+                        help="file: read --input_file, poisson: generate Poisson arrivals, trace: read --trace_file (see API/Scenario.py)")
+    parser.add_argument("--num_veh", type=int, default=12,
+                        help="vehicles of a poisson scenario")
+    parser.add_argument("--arrival_rate", type=float, nargs="+", default=[0.2],
+                        help="fleets per second of a poisson scenario, for every lane or one per lane")
+    parser.add_argument("--turn_mix", type=float, nargs=3, default=[1, 1, 1],
+                        help="relative weights of right turns, straight on and left turns in a poisson scenario")
+    parser.add_argument("--fleet_sizes", type=int, nargs="+", default=[1, 2, 3, 4],
+                        help="fleet sizes of a poisson scenario, drawn uniformly (repeat a size to weight it)")
+    parser.add_argument("--speed_range", type=float, nargs=2, default=[8, 12],
+                        help="min and max speed (m/s) of the fleets of a poisson scenario")
+    parser.add_argument("--scenario_seed", type=int, default=None,
+                        help="seed of the poisson scenario")
+    parser.add_argument("--trace_file", type=str, default=None,
+                        help=f"arrivals of a trace scenario, one fleet per line: {TRACE_FORMAT}")
+    parser.add_argument("--save_scenario", type=str, default=None,
+                        help="write the scenario in the layout of input_format to this file and exit")
+    parser.add_argument("--delta_t",type=float, default=0.1)
+    parser.add_argument("--max_speed",type=float,default=16)
+    parser.add_argument("--max_acceleration",type=float,default=3)
+    parser.add_argument("--min_acceleration",type=float,default=-3)
+    parser.add_argument("--output_file", type=str, default="output.jsonl",
+                        help="structured run log (one row per event, see API/RunLog.py)")
+    parser.add_argument("--log_format", type=str, default="jsonl", choices=LOG_FORMATS,
+                        help="parquet and arrow (IPC file) require pyarrow")
+    parser.add_argument("--log_states", action="store_true",
+                        help="also log the state of every vehicle at every tick")
+    parser.add_argument("--run_id", type=str, default=None,
+                        help="tag of the rows of this run (default: start time)")
+    parser.add_argument("--barrier_stats", action="store_true",
+                        help="print per-round barrier wait time and the straggler")
+    parser.add_argument("--engine", type=str, default="process", choices=["process", "inproc"],
+                        help="process: one OS process per vehicle, inproc: all vehicles in one event loop")
+    parser.add_argument("--session", type=str, default="peer", choices=SESSION_MODES,
+                        help="process engine: peer: a zenoh peer session per vehicle, client: a zenoh client session per vehicle " + \
+                             "connected to --router, shared: one local broker process for all the vehicles (see API/Session.py)")
+    parser.add_argument("--router", type=str, default=DEFAULT_ROUTER,
+                        help="endpoint of the zenoh router of the client sessions")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="worker processes of each leader's root-parallel MCTS")
+    parser.add_argument("--node_budget", type=int, default=None,
+                        help="max number of nodes of a leader's search tree (unbounded by default)")
+    parser.add_argument("--strategy", type=str, default="mcts", choices=["auto"] + list(STRATEGIES),
+                        help="search strategy of the leaders, auto: branch and bound for small schedule groups, MCTS otherwise")
+    parser.add_argument("--macro_chunk", type=int, default=None,
+                        help="MCTS actions admit this many vehicles of a fleet at once (one vehicle by default)")
+    parser.add_argument("--propose_budget_ms", type=float, default=None,
+                        help="wall time a leader may search per round, the best order found so far is proposed")
+    parser.add_argument("--bus_delivery", type=str, default="queued", choices=BUS_DELIVERIES,
+                        help="inproc engine: queued: messages are delivered at the end of the round, sync: as soon as they are put")
+    parser.add_argument("--bus_latency", type=int, default=0,
+                        help="inproc engine: rounds a queued message waits before its delivery")
+    parser.add_argument("--bus_loss", type=float, default=0,
+                        help="inproc engine: probability that a subscriber misses a message of --bus_lossy_keys")
+    parser.add_argument("--bus_lossy_keys", type=str, nargs="+", default=["state/**", "fleet/**", "slot/**"],
+                        help="key expressions of the messages that may be lost (the protocol does not retransmit " + \
+                             "the schedule maps, proposals, scores and final assignments once its phase is over)")
+    parser.add_argument("--bus_seed", type=int, default=None,
+                        help="seed of the message losses")
+    parser.add_argument("--batch_states", action="store_true",
+                        help="the vehicles of a fleet publish their states in one snapshot per round (process engine: through a local queue per fleet)")
+    parser.add_argument("--stream", action="store_true",
+                        help="streaming mode (inproc engine): the fleets enter at their arrival time (all at once for --scenario file)")
+    parser.add_argument("--stream_interval", type=float, default=None,
+                        help="streaming mode (inproc engine): the fleets of the input enter again every this many seconds")
+    parser.add_argument("--stream_duration", type=float, default=60,
+                        help="seconds during which fleets keep entering in streaming mode")
+    parser.add_argument("--reschedule_interval", type=float, default=1,
+                        help="min seconds between two schedule groups in streaming mode")
+    parser.add_argument("--render", type=str, default="png", choices=RENDER_MODES,
+                        help="none: headless, png: keep overwriting the latest frame, gif: encode an animation (of at most 1000 frames) at the end, mp4: stream an animation to ffmpeg")
+    parser.add_argument("--render_file", type=str, default=None,
+                        help="output of the renderer (default: figure.<render>)")
+    parser.add_argument("--render_interval", type=float, default=0.5,
+                        help="simulated seconds between two rendered frames")
+    global args
+    args = parser.parse_args()
+    streaming = args.stream or args.stream_interval is not None
+    if streaming and args.engine != "inproc":
+        parser.error("streaming mode requires --engine inproc")
+    if (args.bus_delivery != "queued" or args.bus_latency > 0 or args.bus_loss > 0) and args.engine != "inproc":
+        parser.error("the --bus options apply to the in-memory bus of --engine inproc")
+    if args.scenario == "trace" and args.trace_file is None:
+        parser.error("--scenario trace requires --trace_file")
+    if args.save_scenario is not None and streaming:
+        parser.error("--save_scenario writes a static scenario")
+
+    ## the scenario: static fleets, or arrivals in streaming mode
+    ## (a static scenario takes one fleet per lane, see layout)
+    try:
+        if args.scenario == "poisson":
+            arrival_rate = args.arrival_rate[0] if len(args.arrival_rate) == 1 else args.arrival_rate
+            generator = ScenarioGenerator(arrival_rate, args.turn_mix, args.fleet_sizes, args.speed_range, args.scenario_seed)
+            if streaming:
+                arrivals = generator.arrivals(args.num_veh)
+            else:
+                fleets = generator.fleets(args.num_veh)
+        elif args.scenario == "trace":
+            arrivals = read_trace(args.trace_file)
+            if not streaming:
+                fleets = layout(arrivals)
+        else:
+            fleets = read_input(args.input_file)
+            if args.stream_interval is not None:
+                arrivals = make_arrivals(fleets, args.stream_interval, args.stream_duration)
+            elif args.stream:
+                arrivals = [(0, fleet) for fleet in fleets]
+    except ValueError as error:
+        parser.error(f"--scenario {args.scenario}: {error}")
+    if not streaming:
+        veh_num = sum(fleet['fleet_len'] for fleet in fleets)
+    if args.save_scenario is not None:
+        write_input(fleets, args.save_scenario)
+        print(f"{len(fleets)} fleets of {veh_num} vehicles written to {args.save_scenario}")
+        return
+
+    run_id = args.run_id if args.run_id else datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+    log = RunLog(args.output_file, args.log_format, use_process=(args.engine == "process"))
+    global run_log
+    run_log = log.client(run_id, args.log_states)
+    if streaming:
+        run_stream(arrivals)
+        log.close()
+        return
+    if args.engine == "inproc":
+        run_inproc(fleets, veh_num)
+        log.close()
+        return
+
+    start_time = time.time()
+    barrier = RoundBarrier(veh_num)
+    sessions = SessionFactory(args.session, veh_num, args.router)
+
+    # To detect collisions
+    location_info = Array('d', [0]*(veh_num*2))
+    finished_list = Array('i',[0]*veh_num)
+
+    veh_processes = []
+    for fleet in fleets:
+        channel = FleetQueueChannel(fleet['fleet_len']) if args.batch_states else None
+        for veh in fleet['vehicles']:
+            pid = len(veh_processes)
+            location_info[pid*2] = veh['location'][0]
+            location_info[pid*2+1] = veh['location'][1]
             veh_proc = Process(target=run_vehicle, args=(veh_num, pid, 
-                fleets[i]['lane_id'], fleets[i]['des_lane_id'], 
-                fleets[i]['fid'], fleets[i]['fleet_len'],
-                vid, (loc_x,loc_y), (vel_x,vel_y), (acc_x,acc_y), rounds, 
-                location_info, velocity_info, finished_list))
+                fleet['lane_id'], fleet['des_lane_id'], 
+                fleet['fid'], fleet['fleet_len'],
+                veh['vid'], veh['location'], veh['velocity'], veh['acceleration'], barrier, 
+                location_info, finished_list, run_log, sessions, start_time, channel))
             veh_processes.append(veh_proc)
 
     for veh_proc in veh_processes:
         veh_proc.start()
     assert(len(veh_processes) == veh_num)
 
-    while True:
+    while any(proc.is_alive() for proc in veh_processes):
         try:
             for proc in veh_processes:
                 proc.join(timeout=2)
@@ -228,6 +566,8 @@ def main():
             for proc in veh_processes:
                 proc.terminate()
                 proc.join()
+    sessions.close()
+    log.close()
 
 
 if __name__ == '__main__':
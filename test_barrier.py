@@ -0,0 +1,45 @@
+from API.Barrier import RoundBarrier
+from multiprocessing import Process
+import time
+
+## RoundBarrier with vehicle processes that arrive late or leave, as seen by pid 0 (the main loop
+## of main.py reports the statistics from pid 0 right after its wait).
+
+def run_script(barrier, pid, script):
+    ## script: (delay in seconds, "wait" or "leave") for each round it takes part in
+    for delay, action in script:
+        time.sleep(delay)
+        if action == "wait":
+            barrier.wait(pid)
+        else:
+            barrier.leave(pid)
+            return
+
+def test_release_and_leave():
+    barrier = RoundBarrier(3)
+    scripts = {1: [(0, "wait"), (0.3, "wait"), (0.2, "leave")],
+               2: [(0, "wait"), (0.1, "leave")]}
+    processes = [Process(target=run_script, args=(barrier, pid, script), daemon=True) for pid, script in scripts.items()]
+    for process in processes:
+        process.start()
+    # round 1: pid 0 comes last and releases the others, whose waits are known as soon as it goes on
+    time.sleep(0.3)
+    assert barrier.wait(0) < 0.1
+    assert barrier.last_straggler.value == 0
+    assert barrier.wait_times[0] == 0
+    assert min(barrier.wait_times[1], barrier.wait_times[2]) > 0.2
+    assert "straggler: pid 0" in barrier.report()
+    # round 2: pid 2 leaves, pid 1 comes last
+    assert barrier.wait(0) > 0.2
+    assert barrier.last_straggler.value == 1
+    assert barrier.parties.value == 2
+    assert barrier.wait_times[0] > 0.2 and barrier.wait_times[2] == 0
+    # round 3: pid 1 leaving releases pid 0
+    assert barrier.wait(0) > 0.1
+    assert barrier.last_straggler.value == 1
+    assert barrier.parties.value == 1
+    assert barrier.wait_times[1] == 0 and barrier.wait_times[2] == 0
+    # pid 0 alone
+    assert barrier.wait(0) < 0.1
+    for process in processes:
+        process.join()
@@ -0,0 +1,41 @@
+from API import Codec
+import pytest
+
+## Every message decodes to what was encoded, from bytes as the transports deliver them.
+
+STATE = {"location": (18.25, -2.0), "velocity": (-9.5, 0.125), "acceleration": (-3.0, 0.0), "des_lane_id": 3}
+
+def test_state():
+    payload = Codec.encode_state(2, 7, 1, STATE["location"], STATE["velocity"], STATE["acceleration"], 3, True)
+    assert Codec.decode_state(bytearray(payload)) == (2, 7, 1, STATE, 1)
+    assert Codec.decode_state(payload)[4] == 1
+    assert Codec.decode_state(Codec.encode_state(0, 0, 0, (1, 2), (3, 4), (5, 6), 1, False))[4] == 0
+
+def test_fleet_state():
+    states = [(0, STATE, False), (1, dict(STATE, location=(33.25, -2.0)), False), (3, None, True), (2, STATE, True)]
+    lane_id, fleet_id, decoded = Codec.decode_fleet_state(Codec.encode_fleet_state(1, 4, states))
+    assert (lane_id, fleet_id) == (1, 4)
+    assert [(vid, finish) for vid, _, finish in decoded] == [(0, 0), (1, 0), (3, 1), (2, 1)]
+    assert [state for _, state, _ in decoded[:2]] == [STATE, dict(STATE, location=(33.25, -2.0))]
+    # a finished vehicle without state
+    assert decoded[2][1]["des_lane_id"] == -1
+    assert Codec.decode_fleet_state(Codec.encode_fleet_state(0, 0, [])) == (0, 0, [])
+
+def test_schedule_map():
+    schedule_map = {(0, 2, 0, 3), (1, 0, 0, 1), (3, 1, 2, 8)}
+    assert Codec.decode_schedule_map(Codec.encode_schedule_map(3, schedule_map)) == (3, schedule_map)
+
+def test_slots_and_scores():
+    slots = {(0, 0, 0): [1.5, 2.25, -1, -1], (2, 1, 3): [-1, -1, 0.1, 7.0]}
+    assert Codec.decode_proposal(Codec.encode_proposal(2, 1, slots)) == (2, 1, slots)
+    assert Codec.decode_final_assignment(Codec.encode_final_assignment(slots)) == slots
+    assert Codec.decode_final_assignment(Codec.encode_final_assignment({})) == {}
+    scores = [(0, 0, -1.25), (3, 2, 0.0)]
+    assert Codec.decode_score(Codec.encode_score(1, 0, scores)) == (1, 0, scores)
+
+def test_header_is_checked():
+    payload = Codec.encode_final_assignment({(0, 0, 0): [1, 2, -1, -1]})
+    with pytest.raises(ValueError, match="expected message type"):
+        Codec.decode_proposal(payload)
+    with pytest.raises(ValueError, match="version"):
+        Codec.decode_final_assignment(bytes([Codec.WIRE_VERSION + 1]) + payload[1:])
@@ -0,0 +1,42 @@
+from API.Collision import CollisionDetector
+from API.math_utils import euclidean_dist
+import random
+
+## CollisionDetector (spatial hash) against the all-pairs scan it replaced.
+
+def brute_force(location_info, finished_list, threshold, tick):
+    collisions = []
+    for i in range(len(finished_list)):
+        for j in range(i+1, len(finished_list)):
+            if finished_list[i] == 1 or finished_list[j] == 1:
+                continue
+            location1 = (location_info[2*i], location_info[2*i+1])
+            location2 = (location_info[2*j], location_info[2*j+1])
+            if euclidean_dist(location1, location2) <= threshold:
+                collisions.append((tick, i, j, location1, location2))
+    return collisions
+
+def test_matches_brute_force():
+    rng = random.Random(0)
+    for threshold in [1, 0.7, 2.5]:
+        detector = CollisionDetector(threshold)
+        found = 0
+        for tick in range(50):
+            num_veh = rng.randint(1, 60)
+            # crowded: vehicles around the intersection, some of them finished
+            location_info = [rng.uniform(-8, 8) for _ in range(2*num_veh)]
+            finished_list = [int(rng.random() < 0.2) for _ in range(num_veh)]
+            expected = brute_force(location_info, finished_list, threshold, tick)
+            assert detector.detect(location_info, finished_list, tick) == expected
+            found += len(expected)
+        assert found > 0 and len(detector.collisions) == found
+
+def test_pairs_across_cells():
+    ## pairs at exactly the threshold, across cell boundaries and around the origin (negative cells)
+    detector = CollisionDetector(1)
+    location_info = [-0.5, 0, 0.5, 0,     # across x = 0
+                     2.99, -3, 2.99, -2,  # across y = -2, at distance 1
+                     5.5, 5.5, 6.3, 6.3,  # diagonal neighbours, further than 1
+                     -4, 4, -4, 4]        # same place, the second one finished
+    finished_list = [0, 0, 0, 0, 0, 0, 0, 1]
+    assert [(i, j) for _, i, j, _, _ in detector.detect(location_info, finished_list, 0)] == [(0, 1), (2, 3)]
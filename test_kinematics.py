@@ -0,0 +1,71 @@
+from API.Kinematics import KinematicsStore
+from API.Vehicle import MyVehicle, CONFLICT_ZONES, MAX_SPEED
+from API.math_utils import *
+import main
+import random
+import pytest
+
+## KinematicsStore (all the vehicles of an engine in one array) against the update of one vehicle at a time.
+
+def scalar_step(location, velocity, acceleration, delta):
+    ## MyVehicle.step_vehicle as it was before the store, with tuples
+    original_velocity = velocity
+    velocity = vector_add(original_velocity, vector_mul_scalar(acceleration, delta))
+    if inner_product(original_velocity, velocity) < 0:
+        velocity = vector_sub(velocity, projection(velocity, original_velocity))
+    speed = vector_length(velocity[0], velocity[1])
+    if speed > MAX_SPEED:
+        velocity = vector_mul_scalar(velocity, MAX_SPEED / speed)
+    average_v = vector_mul_scalar(vector_add(velocity, original_velocity), 0.5)
+    return vector_add(location, vector_mul_scalar(average_v, delta)), velocity
+
+def test_step_matches_scalar():
+    rng = random.Random(0)
+    store = KinematicsStore(MAX_SPEED, CONFLICT_ZONES)
+    states = []
+    for _ in range(50):
+        # some brake hard enough to reverse, some go over MAX_SPEED
+        state = ((rng.uniform(10, 30), 2), (rng.uniform(-13, -1), rng.uniform(-1, 1)), (rng.uniform(-60, 60), rng.uniform(-5, 5)))
+        states.append(state)
+        store.add(*state, 2, 0.1)
+    rows = rng.sample(range(50), 30)
+    store.step(rows)
+    for row, (location, velocity, acceleration) in enumerate(states):
+        if row in rows:
+            location, velocity = scalar_step(location, velocity, acceleration, 0.1)
+        assert tuple(store.location[row]) == pytest.approx(location, abs=1e-12)
+        assert tuple(store.velocity[row]) == pytest.approx(velocity, abs=1e-12)
+        assert store.tick[row] == (0.1 if row in rows else 0)
+
+ROUTES = [(0, 2, (15, 2), (-10, 0)), (1, 0, (-2, 15), (0, -10)), (2, 3, (-15, -2), (10, 0))]
+ASSIGNMENT = {(0, 0, 0): [2.0, 3.0, -1, -1], (1, 0, 0): [-1, 4.0, 5.0, 6.0], (2, 0, 0): [-1, -1, 7.0, -1]}
+
+def make_vehicles(store=None):
+    vehicles = []
+    for lane_id, des_lane_id, location, velocity in ROUTES:
+        vehicle = MyVehicle(None, velocity, location, (0, 0), 0, 0, lane_id, des_lane_id, 0.1, store)
+        vehicle.final_assignment = dict(ASSIGNMENT)
+        vehicles.append(vehicle)
+    return vehicles
+
+def test_drive_running_matches_scalar(monkeypatch):
+    ## main.drive_running steps and controls the running vehicles through their rows of the shared
+    ## store, which are not their pids: here a waiting vehicle holds the first row
+    monkeypatch.setattr(main, "print_vehicle_state", lambda myvehicle, pid: None)
+    store = KinematicsStore(MAX_SPEED, CONFLICT_ZONES)
+    waiting = MyVehicle(None, (-10, 0), (40, 2), (0, 0), 0, 1, 0, 2, 0.1, store)
+    vehicles = make_vehicles(store)
+    assert [vehicle.index for vehicle in vehicles] == [1, 2, 3]
+    alone = make_vehicles()
+    for _ in range(100):
+        running = [pid for pid, vehicle in enumerate(vehicles) if not vehicle.finish]
+        main.drive_running(store, vehicles, running)
+        for pid in running:
+            alone[pid].step_vehicle()
+            alone[pid].update_acceleration()
+        for vehicle, twin in zip(vehicles, alone):
+            assert vehicle.location == twin.location
+            assert vehicle.velocity == twin.velocity
+            assert vehicle.acceleration == twin.acceleration
+    assert all(vehicle.finish for vehicle in vehicles)
+    assert waiting.location == (40, 2) and waiting.tick == 0
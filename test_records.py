@@ -0,0 +1,67 @@
+from API.Records import SnapshotStore, REMOVED
+import threading
+
+## SnapshotStore: what the listeners queue reaches data only at sync(), coalesced per key.
+
+def test_sync_applies_the_updates():
+    store = SnapshotStore()
+    store.put("a", 1)
+    store.put("b", 2)
+    assert store.data == {} and store.version == 0
+    assert store.sync() == {"a": 1, "b": 2}
+    assert store.data == {"a": 1, "b": 2} and store.version == 1
+    # nothing new
+    assert store.sync() == {} and store.version == 1
+
+def test_updates_are_coalesced():
+    store = SnapshotStore()
+    store.put("a", 1)
+    store.put("b", 1)
+    store.put("a", 2)
+    store.discard("b")
+    store.put("c", 3)
+    # the last update of a key wins, in the order the keys were first updated
+    updates = store.sync()
+    assert list(updates.items()) == [("a", 2), ("b", REMOVED), ("c", 3)]
+    assert store.data == {"a": 2, "c": 3}
+    store.discard("c")
+    store.put("c", 4)
+    assert store.sync() == {"c": 4} and store.data == {"a": 2, "c": 4}
+
+def test_version_counts_changes():
+    store = SnapshotStore()
+    store.put("a", {"x": 1})
+    store.sync()
+    # the same value again, or the removal of a missing key, is no change
+    store.put("a", {"x": 1})
+    store.discard("b")
+    assert store.sync() == {"a": {"x": 1}, "b": REMOVED}
+    assert store.version == 1
+    store.put("a", {"x": 2})
+    store.sync()
+    assert store.version == 2
+    # reset forgets data and the queued updates
+    store.put("b", 1)
+    store.reset()
+    assert store.data == {} and store.version == 3
+    assert store.sync() == {}
+    store.reset()
+    assert store.version == 3
+
+def test_concurrent_listeners():
+    ## listeners on other threads while the main loop syncs: no update is lost, the last one wins
+    store = SnapshotStore()
+    data = store.data
+    def listener(thread_id):
+        for k in range(2000):
+            store.put((thread_id, k % 10), k)
+    threads = [threading.Thread(target=listener, args=(thread_id,)) for thread_id in range(4)]
+    for thread in threads:
+        thread.start()
+    while any(thread.is_alive() for thread in threads):
+        store.sync()
+    for thread in threads:
+        thread.join()
+    store.sync()
+    assert store.data is data
+    assert store.data == {(thread_id, k): 1990 + k for thread_id in range(4) for k in range(10)}
@@ -0,0 +1,28 @@
+from API.Renderer import TrajectoryRenderer
+import shutil
+import pytest
+
+## TrajectoryRenderer keeps a bounded number of frames however long the run.
+
+def feed(renderer, num_snapshots):
+    for k in range(num_snapshots):
+        renderer.feed(k*renderer.interval, [10 - k*0.1, 2], [0])
+    renderer.close()
+
+def test_gif_frames_are_subsampled(tmp_path):
+    output_file = tmp_path / "figure.gif"
+    renderer = TrajectoryRenderer("gif", str(output_file), 0.5, buffer_size=1000, max_frames=10)
+    feed(renderer, 100)
+    # 100 snapshots: one every 16 kept, evenly over the run
+    assert renderer.stride == 16
+    assert [sim_time for sim_time, _ in renderer.frames] == [k*16*0.5 for k in range(7)]
+    assert renderer.get_fps() == 2/16
+    assert output_file.stat().st_size > 0
+
+@pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="needs ffmpeg")
+def test_mp4_frames_are_streamed(tmp_path):
+    output_file = tmp_path / "figure.mp4"
+    renderer = TrajectoryRenderer("mp4", str(output_file), 0.5, buffer_size=1000)
+    feed(renderer, 100)
+    assert renderer.frames == []
+    assert output_file.stat().st_size > 0
@@ -0,0 +1,52 @@
+from API.RunLog import RunLog, COLUMNS, BATCH_SIZE
+from types import SimpleNamespace
+import json
+import pytest
+
+## RunLog: the records of the clients come back from the file the writer made, in every format.
+
+def log_run(output_file, log_format, use_process):
+    log = RunLog(str(output_file), log_format, use_process)
+    client = log.client("run-1", log_states=True)
+    vehicle = SimpleNamespace(lane_id=1, fleet_id=0, vehicle_id=2, tick=0.0,
+                              location=(-2.0, 18.0), velocity=(0.0, -10.0), acceleration=(0.0, 0.0))
+    client.log_assignment({(1, 0, 2): [-1, 3.5, 4.0, -1]}, 0)
+    client.log_waypoints(vehicle, [{"time": 3.0, "location": (-2.0, 4.0)}, {"location": (-2.0, 0.0)}], 5)
+    # more states than a batch
+    for k in range(BATCH_SIZE + 10):
+        vehicle.tick = k*0.1
+        client.log_state(vehicle, 5)
+    client.log_collision(12.5, 3, 7)
+    vehicle.tick = 120.0
+    client.log_crossing(vehicle, 5)
+    log.close()
+
+def check_records(records):
+    assert all(list(record) == COLUMNS and record["run_id"] == "run-1" for record in records)
+    assert [record["type"] for record in records] == ["assignment"]*2 + ["waypoint"]*2 + ["state"]*(BATCH_SIZE+10) + ["collision", "crossing"]
+    assert [(record["index"], record["time"]) for record in records[:2]] == [(1, 3.5), (2, 4.0)]
+    assert (records[3]["time"], records[3]["x"], records[3]["y"]) == (None, -2.0, 0.0)
+    state = records[4+BATCH_SIZE]
+    assert (state["time"], state["vy"], state["pid"], state["other_pid"]) == (pytest.approx(BATCH_SIZE*0.1), -10.0, 5, None)
+    assert {key: records[-2][key] for key in ["pid", "other_pid", "time"]} == {"pid": 3, "other_pid": 7, "time": 12.5}
+    assert (records[-1]["lane_id"], records[-1]["fleet_id"], records[-1]["vehicle_id"], records[-1]["time"]) == (1, 0, 2, 120.0)
+
+@pytest.mark.parametrize("use_process", [False, True])
+def test_jsonl_round_trip(tmp_path, use_process):
+    output_file = tmp_path / "run.jsonl"
+    log_run(output_file, "jsonl", use_process)
+    with open(output_file) as f:
+        check_records([json.loads(line) for line in f])
+
+def test_parquet_round_trip(tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    output_file = tmp_path / "run.parquet"
+    log_run(output_file, "parquet", False)
+    check_records(pq.read_table(str(output_file)).to_pylist())
+
+def test_arrow_round_trip(tmp_path):
+    pa = pytest.importorskip("pyarrow")
+    output_file = tmp_path / "run.arrow"
+    log_run(output_file, "arrow", True)
+    with pa.memory_map(str(output_file)) as source:
+        check_records(pa.ipc.open_file(source).read_all().to_pylist())
@@ -0,0 +1,127 @@
+import main
+import os
+from API.Scenario import ScenarioGenerator, layout, make_fleet, read_trace, write_input, ENTRY_DIST, HEADWAY
+import random
+import re
+import sys
+import pytest
+
+## End-to-end runs of the in-process engine on the sample input and on generated scenarios.
+
+SAMPLE_INPUT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sample_input")
+
+def run_main(monkeypatch, capsys, tmp_path, *options) -> str:
+    ## run main.py headless in tmp_path, return what it printed
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(sys, "argv", ["main.py", "--input_file", SAMPLE_INPUT, "--engine", "inproc", "--render", "none",
+                                      "--output_file", str(tmp_path / "output.jsonl")] + list(options))
+    random.seed(0)
+    main.main()
+    return capsys.readouterr().out
+
+def num_collisions(out: str) -> int:
+    return int(re.search(r"(\d+) collisions\)", out).group(1))
+
+@pytest.mark.parametrize("strategy", ["mcts", "bnb", "auto", "greedy"])
+def test_sample_no_collision(monkeypatch, capsys, tmp_path, strategy):
+    out = run_main(monkeypatch, capsys, tmp_path, "--strategy", strategy)
+    assert "12 vehicles finished" in out
+    assert num_collisions(out) == 0
+
+@pytest.mark.parametrize("budget", [[], ["--propose_budget_ms", "50"], ["--propose_budget_ms", "1"]])
+def test_budget_no_collision(monkeypatch, capsys, tmp_path, budget):
+    out = run_main(monkeypatch, capsys, tmp_path, *budget)
+    assert "12 vehicles finished" in out
+    assert num_collisions(out) == 0
+
+def test_stream_no_collision(monkeypatch, capsys, tmp_path):
+    ## the sample input arriving again every 8 s for 40 s: late vehicles of a group meet the next ones
+    out = run_main(monkeypatch, capsys, tmp_path, "--stream_interval", "8", "--stream_duration", "40")
+    assert "60 vehicles of 20 fleets crossed" in out
+    assert num_collisions(out) == 0
+
+def test_static_scenario_finishes(monkeypatch, capsys, tmp_path):
+    ## a generated scenario with one fleet on every lane, run by the static protocol
+    out = run_main(monkeypatch, capsys, tmp_path, "--scenario", "poisson", "--num_veh", "8", "--scenario_seed", "12")
+    assert "8 vehicles finished" in out
+    assert num_collisions(out) == 0
+
+def test_static_scenario_one_fleet_per_lane(monkeypatch, capsys, tmp_path):
+    ## the static protocol agrees lane by lane: a second fleet on a lane is refused rather than never scheduled
+    arrivals = [(0, make_fleet(lane_id, (lane_id+2) % 4, 0, 1, 10)) for lane_id in range(4)]
+    layout(arrivals)
+    with pytest.raises(ValueError):
+        layout(arrivals + [(1, make_fleet(0, 2, 1, 1, 10))])
+    with pytest.raises(SystemExit):
+        run_main(monkeypatch, capsys, tmp_path, "--scenario", "poisson", "--num_veh", "40", "--scenario_seed", "0")
+    assert "more than one fleet on lane" in capsys.readouterr().err
+
+def test_generator_is_reproducible():
+    arrivals = ScenarioGenerator(arrival_rate=0.5, seed=3).arrivals(30)
+    assert arrivals == ScenarioGenerator(arrival_rate=0.5, seed=3).arrivals(30)
+    assert arrivals != ScenarioGenerator(arrival_rate=0.5, seed=4).arrivals(30)
+    times = [arrival_time for arrival_time, _ in arrivals]
+    assert times == sorted(times)
+    assert sum(fleet['fleet_len'] for _, fleet in arrivals) == 30
+    # the fleets of a lane are numbered in the order they arrive
+    for lane_id in range(4):
+        assert [fleet['fid'] for _, fleet in arrivals if fleet['lane_id'] == lane_id] == list(range(
+            sum(fleet['lane_id'] == lane_id for _, fleet in arrivals)))
+
+def test_generator_options():
+    generator = ScenarioGenerator(arrival_rate=[1, 0, 0, 0], turn_mix=(0, 0, 1), fleet_sizes=(2,), speed_range=(9, 9), seed=0)
+    arrivals = generator.arrivals(7)
+    assert [fleet['fleet_len'] for _, fleet in arrivals] == [2, 2, 2, 1]
+    for _, fleet in arrivals:
+        assert (fleet['lane_id'], fleet['des_lane_id']) == (0, 3)
+        assert [veh['location'] for veh in fleet['vehicles']] == [(ENTRY_DIST + vid*HEADWAY, 2) for vid in range(fleet['fleet_len'])]
+        assert all(veh['velocity'] == (-9, 0) for veh in fleet['vehicles'])
+    for options in [dict(arrival_rate=[1, 1, 1]), dict(arrival_rate=0), dict(turn_mix=(1, -1, 1)),
+                    dict(fleet_sizes=(0, 2)), dict(fleet_sizes=()), dict(speed_range=(10, 8))]:
+        with pytest.raises(ValueError):
+            ScenarioGenerator(**options)
+    with pytest.raises(ValueError):
+        generator.arrivals(7, every_lane=True)
+
+def test_generator_every_lane():
+    ## a static batch has one fleet on every lane, also when one lane rarely gets arrivals
+    for seed in range(10):
+        generator = ScenarioGenerator(arrival_rate=[1, 1, 1, 0.01], fleet_sizes=(1, 2, 3, 4, 5, 6, 7, 8), seed=seed)
+        arrivals = generator.arrivals(12, every_lane=True)
+        assert {fleet['lane_id'] for _, fleet in arrivals} == {0, 1, 2, 3}
+        assert sum(fleet['fleet_len'] for _, fleet in arrivals) == 12
+    fleets = ScenarioGenerator(seed=1).fleets(4)
+    assert sorted(fleet['lane_id'] for fleet in fleets) == [0, 1, 2, 3]
+
+def test_read_trace(tmp_path):
+    trace_file = tmp_path / "trace"
+    trace_file.write_text("# <arrival_time> <lane_id> <des_lane_id> <fleet_length> <speed>\n"
+                          "2.5 0 2 1 10\n"
+                          "\n"
+                          "1.0 1 0 2 8  # a left turn\n"
+                          "0.5 0 1 3 12\n")
+    arrivals = read_trace(str(trace_file))
+    assert [arrival_time for arrival_time, _ in arrivals] == [0.5, 1.0, 2.5]
+    # fids follow the lines of a lane, not the arrival times
+    assert [(fleet['lane_id'], fleet['des_lane_id'], fleet['fid'], fleet['fleet_len']) for _, fleet in arrivals] == [
+        (0, 1, 1, 3), (1, 0, 0, 2), (0, 2, 0, 1)]
+    assert arrivals[1][1]['vehicles'][1]['velocity'] == (0, -8)
+    trace_file.write_text("0 0 0 1 10\n")
+    with pytest.raises(ValueError):
+        read_trace(str(trace_file))
+
+def test_write_input_round_trip(tmp_path):
+    ## a generated batch written by write_input reads back with main.read_input
+    fleets = ScenarioGenerator(seed=12).fleets(8)
+    input_file = tmp_path / "input"
+    write_input(fleets, str(input_file))
+    read_fleets = main.read_input(str(input_file))
+    assert sum(fleet['fleet_len'] for fleet in read_fleets) == 8
+    assert len(read_fleets) == len(fleets)
+    for fleet, read_fleet in zip(fleets, read_fleets):
+        for field in ['lane_id', 'des_lane_id', 'fid', 'fleet_len']:
+            assert read_fleet[field] == fleet[field]
+        for veh, read_veh in zip(fleet['vehicles'], read_fleet['vehicles']):
+            assert read_veh['vid'] == veh['vid']
+            for field in ['location', 'velocity', 'acceleration']:
+                assert read_veh[field] == pytest.approx(veh[field], abs=1e-6)
@@ -0,0 +1,70 @@
+from API.Session import SessionFactory
+from multiprocessing import Process
+import queue
+import pytest
+
+## The shared session mode: one broker process routes the messages of the sessions of all the vehicle processes.
+
+def received(samples):
+    sample = samples.get(timeout=10)
+    return sample.key_expr, bytes(sample.payload)
+
+def test_shared_sessions_route_by_key():
+    sessions = SessionFactory("shared", 2)
+    sender, receiver = sessions.open(0), sessions.open(1)
+    fleets, finals = queue.Queue(), queue.Queue()
+    fleet_subscriber = receiver.declare_subscriber("fleet/**", fleets.put)
+    receiver.declare_subscriber("final/1/*", finals.put)
+    publisher = sender.declare_publisher("fleet/1/0")
+    publisher.put(b"\x01\x06")
+    sender.put("final/1/0", "done") # str payloads are sent as utf-8
+    sender.put("final/2/0", b"other lane")
+    assert received(fleets) == ("fleet/1/0", b"\x01\x06")
+    assert received(finals) == ("final/1/0", b"done")
+    # after undeclare, nothing more on fleet/**; the broker handles the requests in order
+    fleet_subscriber.undeclare()
+    publisher.put(b"late")
+    sender.put("final/1/1", b"after")
+    assert received(finals) == ("final/1/1", b"after")
+    assert fleets.empty() and finals.empty()
+    sender.close()
+    receiver.close()
+    sessions.close()
+
+def echo(sessions, session_id):
+    ## a vehicle process: answers every ping with a pong
+    session = sessions.open(session_id)
+    pings = queue.Queue()
+    session.declare_subscriber("ping/**", pings.put)
+    session.put("ready", b"")
+    while True:
+        sample = pings.get()
+        if sample.payload == b"stop":
+            break
+        session.put(f"pong/{session_id}", bytes(sample.payload))
+    session.close()
+
+def test_shared_sessions_across_processes():
+    sessions = SessionFactory("shared", 3)
+    main_session = sessions.open(0)
+    ready, pongs = queue.Queue(), queue.Queue()
+    main_session.declare_subscriber("ready", ready.put)
+    main_session.declare_subscriber("pong/*", pongs.put)
+    # the vehicle processes receive the factory without its broker
+    processes = [Process(target=echo, args=(sessions, session_id)) for session_id in [1, 2]]
+    for process in processes:
+        process.start()
+    for _ in processes:
+        received(ready)
+    main_session.put("ping/all", b"42")
+    assert sorted(received(pongs) for _ in processes) == [("pong/1", b"42"), ("pong/2", b"42")]
+    main_session.put("ping/all", b"stop")
+    for process in processes:
+        process.join(timeout=10)
+        assert process.exitcode == 0
+    main_session.close()
+    sessions.close()
+
+def test_unknown_mode():
+    with pytest.raises(ValueError):
+        SessionFactory("router")
@@ -0,0 +1,67 @@
+from API import Simulator, math_utils
+from API.Scheduler import Scheduler
+import numpy as np
+import random
+
+## Simulator.simulate_orders (one NumPy batch) against simulate_passing_order (one order at a time)
+## and the VehicleTable rows of Scheduler.extend_sim_state, element by element.
+
+def random_orders(scheduler, num_orders, rng):
+    return [rng.sample(range(scheduler.num_veh), scheduler.num_veh) for _ in range(num_orders)]
+
+def check_orders(scheduler, orders, sim_state=None, prefix=()):
+    ## simulate_orders from sim_state (the state after prefix) against simulate_passing_order of prefix + order
+    delays, t_assign = scheduler.evaluate_orders(orders, sim_state, return_t_assign=True)
+    for row, order in enumerate(orders):
+        passing_order = [scheduler.all_veh[idx] for idx in list(prefix) + list(order)]
+        delay, veh_t_assign = Simulator.simulate_passing_order(passing_order, scheduler.conflict_zones,
+            [scheduler.get_state(veh) for veh in passing_order], scheduler.safety_gap,
+            scheduler.my_lane_id, scheduler.my_fleet_id, scheduler.alpha)
+        assert delays[row] == delay
+        assert np.array_equal(t_assign[row], np.array(veh_t_assign[len(prefix):]))
+        table_state = scheduler.init_sim_state() if sim_state is None else sim_state
+        for pos, idx in enumerate(order):
+            table_state, table_t_assign = scheduler.extend_sim_state(table_state, idx)
+            assert table_t_assign == veh_t_assign[len(prefix)+pos]
+        assert table_state[1] == delay
+
+def test_simulate_orders_matches_scalar(conflict_zones, make_states):
+    rng = random.Random(0)
+    for num_veh, fleet_size in [(4, 1), (12, 3), (30, 2)]:
+        scheduler = Scheduler(conflict_zones, make_states(num_veh, fleet_size, rng), 0.5, 0, 0, 1.2, 0)
+        check_orders(scheduler, random_orders(scheduler, 20, rng))
+        # from the state after a prefix of an order
+        order = random_orders(scheduler, 1, rng)[0]
+        sim_state = scheduler.init_sim_state()
+        for idx in order[:num_veh//2]:
+            sim_state, _ = scheduler.extend_sim_state(sim_state, idx)
+        rest = order[num_veh//2:]
+        check_orders(scheduler, [rest] + [rng.sample(rest, len(rest)) for _ in range(10)], sim_state, order[:num_veh//2])
+
+def test_simulate_orders_single_zone_quirk(conflict_zones):
+    ## a delayed vehicle on a single conflict zone (a right turn): the first zone of its route is also
+    ## the last, and the exit time is overwritten by the entry time (zone_idx_list[-1] when
+    ## zone_idx_idx == 0 in extend_row)
+    states = {(0, 0, 0): {'location': (10, 2), 'velocity': (-10, 0), 'acceleration': (0, 0), 'des_lane_id': 1},
+              (0, 0, 1): {'location': (11, 2), 'velocity': (-10, 0), 'acceleration': (0, 0), 'des_lane_id': 1}}
+    scheduler = Scheduler(conflict_zones, states, 0.5, 0, 0, 1.2, 0)
+    order = [scheduler.all_veh.index((0, 1, 0, vid)) for vid in range(2)]
+    _, t_assign = scheduler.evaluate_orders([order], return_t_assign=True)
+    assert t_assign[0, 1, 0] == t_assign[0, 0, 0] + scheduler.safety_gap
+    check_orders(scheduler, [order])
+
+def test_late_t_assign(conflict_zones):
+    ## a committed time slot is pushed back to when the vehicle can leave the zone from where it is,
+    ## every zone taking CONFLICT_ZONE_SIZE m to cross
+    state = {'location': (10, 2), 'velocity': (-10, 0), 'acceleration': (0, 0), 'des_lane_id': 2}
+    # 6 m to its first zone (0), then 4 m across it and 4 m across the next one (1), at 10 m/s
+    assert Simulator.late_t_assign(conflict_zones, 0, [1.5, 3.0, -1, -1], state, 1, 0) == [2.0, 3.0, -1, -1]
+    assert Simulator.late_t_assign(conflict_zones, 0, [1.5, 2.0, -1, -1], state, 1, 0) == [2.0, 2.4, -1, -1]
+    # accelerating, it leaves them earlier
+    t_assign = Simulator.late_t_assign(conflict_zones, 0, [0, 0, -1, -1], state, 1, 3)
+    assert t_assign[:2] == [1 + math_utils.arrival_time(10, 10, 3), 1 + math_utils.arrival_time(14, 10, 3)]
+    # in its second zone: the first one is left, the second one takes at most a zone to leave
+    state['location'] = (-1, 2)
+    assert Simulator.late_t_assign(conflict_zones, 0, [0.5, 1.0, -1, -1], state, 1, 0) == [0.5, 1.4, -1, -1]
+    # on time: unchanged
+    assert Simulator.late_t_assign(conflict_zones, 0, [0.5, 9.0, -1, -1], state, 1, 0) == [0.5, 9.0, -1, -1]
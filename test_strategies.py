@@ -0,0 +1,175 @@
+from API.Scheduler import BaseScheduler, Scheduler
+from API.Strategy import STRATEGIES, BranchAndBoundScheduler, GreedyScheduler
+import random
+import pytest
+
+## Branch and bound against brute force on schedule groups small enough to enumerate
+## every passing order that keeps the order of the fleets.
+
+def orders_keeping_fleets(fleets, progress=None):
+    if progress is None:
+        progress = (0,)*len(fleets)
+    if all(done == len(members) for done, members in zip(progress, fleets)):
+        yield []
+        return
+    for fleet_idx, members in enumerate(fleets):
+        if progress[fleet_idx] < len(members):
+            child_progress = progress[:fleet_idx] + (progress[fleet_idx]+1,) + progress[fleet_idx+1:]
+            for rest in orders_keeping_fleets(fleets, child_progress):
+                yield [members[progress[fleet_idx]]] + rest
+
+def total_delay(scheduler, order):
+    sim_state = scheduler.init_sim_state()
+    for idx in order:
+        sim_state, _ = scheduler.extend_sim_state(sim_state, idx)
+    return sim_state[1]
+
+def test_bnb_matches_brute_force(conflict_zones, staggered_states):
+    rng = random.Random(0)
+    for num_veh, fleet_size in [(4, 1), (5, 2), (6, 2), (7, 3), (8, 2)]:
+        for _ in range(5):
+            states = staggered_states(num_veh, fleet_size, rng)
+            scheduler = BranchAndBoundScheduler(conflict_zones, states, 0.5, 0, 0, 1.0, 0)
+            order = scheduler.search(0)
+            assert scheduler.exhausted
+            best = min(total_delay(scheduler, order) for order in orders_keeping_fleets(scheduler.fleets))
+            assert abs(scheduler.best_delay - best) < 1e-9
+            # the returned order is the proven one and keeps the order of every fleet
+            indices = [scheduler.all_veh.index(veh) for veh in order]
+            assert abs(total_delay(scheduler, indices) - best) < 1e-9
+            for members in scheduler.fleets:
+                assert [idx for idx in indices if idx in members] == members
+
+def test_bnb_budget_no_worse_than_greedy(conflict_zones, staggered_states):
+    rng = random.Random(1)
+    states = staggered_states(12, 3, rng)
+    greedy = GreedyScheduler(conflict_zones, states, 0.5, 0, 0, 1.0, 0)
+    greedy_delay = total_delay(greedy, greedy.get_order())
+    scheduler = BranchAndBoundScheduler(conflict_zones, states, 0.5, 0, 0, 1.0, 0, node_budget=5)
+    order = scheduler.search(0)
+    assert not scheduler.exhausted
+    assert total_delay(scheduler, [scheduler.all_veh.index(veh) for veh in order]) <= greedy_delay + 1e-9
+
+def test_budgeted_order_keeps_fleets(conflict_zones, staggered_states):
+    rng = random.Random(2)
+    states = staggered_states(9, 3, rng)
+    # the followers of the first fleet are closer to the center than its leader
+    locations = [states[(0, 0, vid)]["location"] for vid in range(3)]
+    for vid, location in enumerate(reversed(locations)):
+        states[(0, 0, vid)]["location"] = location
+    for time_budget in [None, 1e-6]:
+        scheduler = Scheduler(conflict_zones, states, 0.5, 0, 0, 1.0, 0)
+        order = scheduler.search(20, time_budget=time_budget)
+        assert sorted(order) == sorted(scheduler.all_veh)
+        for members in scheduler.fleets:
+            fleet = [scheduler.all_veh[idx] for idx in members]
+            assert [veh for veh in order if veh in fleet] == fleet
+
+def test_parallel_search_goes_on_from_the_tree(conflict_zones, staggered_states):
+    ## the workers start from the current tree and the merged tree replaces it
+    rng = random.Random(3)
+    states = staggered_states(8, 2, rng)
+    scheduler = Scheduler(conflict_zones, states, 0.5, 0, 0, 1.0, 0)
+    scheduler.search(30)
+    assert scheduler.root.visits == 30
+    scheduler.search(20, workers=2)
+    assert scheduler.root.visits == 30 + 2*20
+    statistics = dict((path, visits) for (path, visits, _) in scheduler.export_statistics())
+    scheduler.search(10, workers=2)
+    assert scheduler.root.visits == 30 + 2*20 + 2*10
+    for (path, visits, _) in scheduler.export_statistics():
+        assert visits >= statistics.get(path, 0)
+
+def test_strategy_without_search_is_refused(conflict_zones, make_states):
+    ## a strategy has to implement search, it fails when it is created rather than when it is used
+    class NoSearch(BaseScheduler):
+        name = "none"
+    with pytest.raises(TypeError):
+        NoSearch(conflict_zones, make_states(4, 1, random.Random(0)), 0.5, 0, 0, 1.0, 0)
+    for scheduler_class in STRATEGIES.values():
+        scheduler_class(conflict_zones, make_states(4, 1, random.Random(0)), 0.5, 0, 0, 1.0, 0)
+
+def test_fleets_of_a_lane_keep_their_order(conflict_zones, make_states):
+    ## the fleets of a lane are chained closest to the center first, whatever their fleet ids
+    states = make_states(12, 3, random.Random(4))
+    # the fleet 1 of lane 0 is ahead of its fleet 0
+    for vid in range(3):
+        states[(0, 1, vid)] = dict(states[(0, 0, vid)], location=(6 + 5*vid, 2))
+    for scheduler_class in STRATEGIES.values():
+        scheduler = scheduler_class(conflict_zones, states, 0.5, 0, 0, 1.0, 0)
+        lane = [veh for veh in scheduler.search(50) if veh[0] == 0]
+        assert [(veh[2], veh[3]) for veh in lane] == [(1, 0), (1, 1), (1, 2), (0, 0), (0, 1), (0, 2)]
+
+def test_macro_actions_stay_within_a_fleet(conflict_zones, make_states):
+    ## with two fleets of 3 on a lane and chunks of 2, the chain of the lane is cut 2 + 1 + 2 + 1
+    states = make_states(24, 3, random.Random(5))
+    scheduler = Scheduler(conflict_zones, states, 0.5, 0, 0, 1.0, 0, macro_chunk=2)
+    scheduler.search(300)
+    pool = [scheduler.root]
+    num_macro = 0
+    while pool:
+        node = pool.pop()
+        pool.extend(node.children)
+        if type(node.action) is tuple:
+            num_macro += 1
+            assert len(set(scheduler.get_key(idx)[:2] for idx in node.action)) == 1
+    assert num_macro > 0
+    # the macro actions of the first chain along a fresh tree
+    scheduler = Scheduler(conflict_zones, states, 0.5, 0, 0, 1.0, 0, macro_chunk=2)
+    lane = [scheduler.get_key(idx) for idx in scheduler.fleets[0]]
+    chunks = []
+    node = scheduler.root
+    while True:
+        actions = [action for action in scheduler.get_possible_actions(node) if scheduler.fleet_of[action[0]] == 0]
+        if not actions or type(actions[0]) is not tuple:
+            break
+        chunks.append(len(actions[0]))
+        node.expand(actions[0], (node.progress[0]+len(actions[0]),) + node.progress[1:])
+        node = node.children[-1]
+    assert [key[1] for key in lane] == [0]*3 + [1]*3
+    assert chunks == [2, 1, 2, 1]
+
+def test_mcts_returns_complete_orders(conflict_zones, staggered_states):
+    ## a tree shallower than the group gives an order completed like the rollouts, and any score
+    ## (also below -1) picks a child
+    states = staggered_states(16, 2, random.Random(6))
+    scheduler = Scheduler(conflict_zones, states, 0.5, 0, 0, 1.0, 0)
+    for num_iter in [0, 1, 5]:
+        order = scheduler.search(num_iter)
+        assert sorted(order) == sorted(scheduler.all_veh)
+        for members in scheduler.fleets:
+            fleet = [scheduler.all_veh[idx] for idx in members]
+            assert [veh for veh in order if veh in fleet] == fleet
+    for child in scheduler.root.children:
+        child.score = -5
+    assert sorted(scheduler.search(0)) == sorted(scheduler.all_veh)
+
+def test_reset_statistics_keeps_the_unchanged_prefixes(conflict_zones, staggered_states):
+    ## after a change of state, the simulated prefixes that are kept (those without the vehicle)
+    ## and the ones simulated again are those of a tree built with the new states
+    rng = random.Random(8)
+    states = staggered_states(8, 2, rng)
+    scheduler = Scheduler(conflict_zones, states, 0.5, 0, 0, 1.2, 0)
+    scheduler.search(300)
+    # nothing changed: nothing is forgotten
+    assert scheduler.reset_statistics(dict(states)) == []
+    assert scheduler.iterations == 300 and scheduler.root.visits > 0
+    key = next(key for key in states if key[0] == 1)
+    states[key] = dict(states[key], location=(states[key]["location"][0], states[key]["location"][1] + 3))
+    idx = [scheduler.get_key(idx) for idx in range(scheduler.num_veh)].index(key)
+    assert scheduler.reset_statistics(states) == [idx]
+    assert scheduler.iterations == 0 and scheduler.root.visits == 0
+    fresh = Scheduler(conflict_zones, states, 0.5, 0, 0, 1.2, 0)
+    pool = list(scheduler.root.children)
+    kept = 0
+    while pool:
+        node = pool.pop()
+        pool.extend(node.children)
+        if node.sim_state is not None:
+            assert not (node.placed >> idx) & 1
+            kept += 1
+        sim_state = fresh.init_sim_state()
+        for veh_idx in node.get_order():
+            sim_state, _ = fresh.extend_sim_state(sim_state, veh_idx)
+        assert scheduler.get_sim_state(node) == sim_state
+    assert kept > 0
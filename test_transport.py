@@ -0,0 +1,81 @@
+from API.Transport import InprocBus, key_matches
+import pytest
+
+## InprocBus: the zenoh-like key expressions, the queued delivery with latency and the seeded losses.
+
+def test_key_matches():
+    assert key_matches("state/1/0/**", "state/1/0/2")
+    assert key_matches("state/1/0/**", "state/1/0")
+    assert not key_matches("state/1/0/**", "state/1/1/2")
+    assert key_matches("fleet/*/0", "fleet/3/0")
+    assert not key_matches("fleet/*", "fleet/3/0")
+    assert key_matches("**", "map/2")
+    assert key_matches("score/**/2", "score/1/0/2") and key_matches("score/**/2", "score/2")
+    assert not key_matches("map/1", "map/10")
+
+def subscribe(bus, key_expr):
+    received = []
+    bus.open_session().declare_subscriber(key_expr, lambda sample: received.append((sample.key_expr, sample.payload)))
+    return received
+
+def test_wildcard_routes():
+    bus = InprocBus(delivery="sync")
+    everything, fleets, fleet_1 = subscribe(bus, "**"), subscribe(bus, "fleet/**"), subscribe(bus, "fleet/1/*")
+    publisher = bus.open_session().declare_publisher("fleet/1/0")
+    publisher.put("a")
+    bus.put("fleet/2/0", b"b")
+    bus.put("map/0", b"c")
+    assert everything == [("fleet/1/0", b"a"), ("fleet/2/0", b"b"), ("map/0", b"c")]
+    assert fleets == everything[:2]
+    assert fleet_1 == everything[:1]
+    # a subscriber declared later gets the next messages of a key already routed
+    later = subscribe(bus, "fleet/1/0")
+    publisher.put(b"d")
+    assert later == [("fleet/1/0", b"d")] and fleet_1[-1] == ("fleet/1/0", b"d")
+    assert bus.num_delivered == 10
+
+def test_queued_latency():
+    bus = InprocBus(latency=2)
+    received = subscribe(bus, "**")
+    bus.put("state/0", b"0")
+    bus.deliver()
+    bus.put("state/1", b"1")
+    bus.deliver()
+    assert received == []
+    bus.deliver()
+    assert received == [("state/0", b"0")]
+    bus.deliver()
+    assert received == [("state/0", b"0"), ("state/1", b"1")]
+    # without latency, at the end of the round, also what the listeners put meanwhile
+    bus = InprocBus()
+    echo = bus.open_session()
+    echo.declare_subscriber("ping", lambda sample: echo.put("pong", sample.payload))
+    received = subscribe(bus, "pong")
+    bus.put("ping", b"x")
+    assert received == []
+    bus.deliver()
+    assert received == [("pong", b"x")]
+
+def run_lossy(seed):
+    bus = InprocBus(loss=0.3, lossy_keys=["state/**"], seed=seed)
+    states, maps = subscribe(bus, "state/**"), subscribe(bus, "map/**")
+    for k in range(1000):
+        bus.put(f"state/{k % 4}", str(k))
+        bus.put(f"map/{k % 4}", str(k))
+    bus.deliver()
+    return bus, states, maps
+
+def test_seeded_loss():
+    bus, states, maps = run_lossy(5)
+    # only the lossy keys lose messages, about as often as asked
+    assert len(maps) == 1000
+    assert bus.num_lost == 1000 - len(states)
+    assert 250 < bus.num_lost < 350
+    # the same seed loses the same messages
+    assert run_lossy(5)[1] == states
+    assert run_lossy(6)[1] != states
+
+def test_invalid_options():
+    for options in [dict(delivery="eventually"), dict(delivery="sync", latency=1), dict(latency=-1), dict(loss=1)]:
+        with pytest.raises(ValueError):
+            InprocBus(**options)
@@ -0,0 +1,284 @@
+from API.Vehicle import MyVehicle, Leader, Member, FleetChannel, FleetQueueChannel, CONFLICT_ZONES, SAFETY_GAP, HOLD_MARGIN, MAX_ACCELERATION, MIN_ACCELERATION, STATE_TIMEOUT
+from API.Transport import InprocBus
+from API import Codec
+from multiprocessing import Process, Event, Queue
+import random
+import pytest
+
+## The control of one vehicle against its final assignment, without a session.
+
+def make_vehicle(lane_id, des_lane_id, location, velocity, vehicle_id=0, fleet_id=0):
+    return MyVehicle(None, velocity, location, (0,0), vehicle_id, fleet_id, lane_id, des_lane_id, 0.1)
+
+def test_first_waypoint_keeps_the_safety_gap():
+    ## the entry into the first conflict zone is timed a safety gap after the exit of the vehicle
+    ## scheduled before it there, like the schedule (Simulator.extend_row)
+    vehicle = make_vehicle(0, 2, (10, 2), (-10, 0))
+    vehicle.final_assignment = {(0, 0, 0): [4.0, 5.0, -1, -1], (1, 0, 0): [2.0, -1, -1, 3.0]}
+    waypoints = vehicle.get_waypoints(CONFLICT_ZONES)
+    assert waypoints[0]["time"] == 2.0 + SAFETY_GAP
+    assert [waypoint["time"] for waypoint in waypoints[1:]] == [4.0, 5.0]
+    # nobody before it in its first zone
+    vehicle.final_assignment = {(0, 0, 0): [4.0, 5.0, -1, -1], (1, 0, 0): [6.0, -1, -1, 7.0]}
+    assert vehicle.get_waypoints(CONFLICT_ZONES)[0]["time"] == SAFETY_GAP
+
+def hold_case():
+    ## a vehicle going straight from lane 0 (zones 0 then 1) and a vehicle of lane 1 turning left
+    ## (zones 1 then 2) whose time slot in zone 1 comes first, in zone 1 now
+    vehicle = make_vehicle(0, 2, (10, 2), (-10, 0))
+    vehicle.final_assignment = {(0, 0, 0): [4.0, 5.0, -1, -1], (1, 0, 0): [-1, 3.0, 3.5, -1]}
+    vehicle.fleet_store.put((1, 0, 0), {'location': (-2, 2), 'velocity': (0, -5), 'acceleration': (0, 0), 'des_lane_id': 3})
+    vehicle.sync_fleet_store()
+    return vehicle
+
+def test_hold_before_a_zone_in_use():
+    ## a vehicle does not enter a zone before the vehicles with an earlier slot there have left it
+    vehicle = hold_case()
+    waypoints = vehicle.get_waypoints(CONFLICT_ZONES)
+    assert not vehicle.zone_blocked(0)
+    assert vehicle.zone_blocked(1)
+    # it holds at the zone ahead that is in use, 10 m away
+    assert vehicle.get_hold_point(waypoints, 0) == (waypoints[1]["location"], 10)
+    # the other vehicle has moved on to its next zone
+    vehicle.fleet_store.put((1, 0, 0), {'location': (-2, -2), 'velocity': (0, -5), 'acceleration': (0, 0), 'des_lane_id': 3})
+    vehicle.sync_fleet_store()
+    assert vehicle.get_hold_point(waypoints, 0) is None
+
+def test_hold_until_the_other_vehicle_is_gone():
+    ## a vehicle that has crossed the intersection, or that nothing was heard of for STATE_TIMEOUT, has left
+    vehicle = hold_case()
+    waypoints = vehicle.get_waypoints(CONFLICT_ZONES)
+    vehicle.tick = STATE_TIMEOUT
+    assert vehicle.get_hold_point(waypoints, 0) is not None
+    vehicle.tick = STATE_TIMEOUT + 0.1
+    assert vehicle.get_hold_point(waypoints, 0) is None
+    vehicle = hold_case()
+    vehicle.fleet_store.discard((1, 0, 0))
+    vehicle.sync_fleet_store()
+    assert vehicle.get_hold_point(waypoints, 0) is None
+
+def test_hold_in_the_zone_it_is_in():
+    ## a vehicle inside a zone still in use by a vehicle before it, that has to hold at the next
+    ## zone too, stops where it is rather than moving on across the zone
+    vehicle = hold_case()
+    waypoints = vehicle.get_waypoints(CONFLICT_ZONES)
+    vehicle.location = (2, 2)
+    assert vehicle.get_hold_point(waypoints, 1) == (waypoints[1]["location"], 2)
+    # a vehicle of lane 3 (zones 3 then 0) with an earlier slot in zone 0, not in it yet
+    vehicle.final_assignment[(3, 0, 0)] = [3.8, -1, -1, 3.0]
+    vehicle.fleet_store.put((3, 0, 0), {'location': (2, -2), 'velocity': (0, 5), 'acceleration': (0, 0), 'des_lane_id': 1})
+    vehicle.sync_fleet_store()
+    assert vehicle.get_hold_point(waypoints, 1) == (waypoints[1]["location"], 0)
+
+def test_acceleration_hold():
+    ## far from the hold point the vehicle keeps its acceleration, closer it brakes to stop
+    ## HOLD_MARGIN short of it, within MIN_ACCELERATION
+    vehicle = make_vehicle(0, 2, (30, 2), (-10, 0))
+    vehicle.acceleration = (-1, 0)
+    assert vehicle.get_acceleration_hold((4, 2), 26) == (-1, 0)
+    acceleration = vehicle.get_acceleration_hold((4, 2), 12)
+    room = 12 - HOLD_MARGIN
+    assert acceleration[0] == pytest.approx(10**2/(2*room))
+    assert acceleration[1] == 0
+    acceleration = vehicle.get_acceleration_hold((4, 2), 2)
+    assert acceleration == (-MIN_ACCELERATION, 0)
+    # at the hold point: it stops without backing up
+    vehicle.velocity = (-0.2, 0)
+    acceleration = vehicle.get_acceleration_hold((4, 2), HOLD_MARGIN)
+    assert acceleration[0] == pytest.approx(0.2/vehicle.delta)
+    vehicle.velocity = (0, 0)
+    assert vehicle.get_acceleration_hold((4, 2), HOLD_MARGIN) == (0, 0)
+
+def following(front_location):
+    ## the second vehicle of a fleet, 20 m from its waypoint at 10 m/s, behind the first one
+    vehicle = make_vehicle(0, 2, (24, 2), (-10, 0), vehicle_id=1)
+    vehicle.state_store.put(0, {'location': front_location, 'velocity': (-10, 0), 'acceleration': (0, 0), 'des_lane_id': 2})
+    vehicle.sync_records()
+    return vehicle
+
+def test_front_car_rule():
+    ## a vehicle keeps its distance to the vehicle ahead in its fleet also when it is late (no deadline
+    ## left, it would accelerate at MAX_ACCELERATION), and the rule never brakes less than the plan
+    vehicle = following((4, 2)) # 2 s behind: brake at least MIN_ACCELERATION/2
+    assert vehicle.get_acceleration_linear_motion((4, 2), None) == (-MIN_ACCELERATION/2, 0)
+    # the plan already brakes harder (20 m to cover in 10 s at 10 m/s)
+    assert vehicle.get_acceleration_linear_motion((4, 2), 10) == (-MIN_ACCELERATION, 0)
+    vehicle = following((14, 2)) # 1 s behind: brake at MIN_ACCELERATION
+    assert vehicle.get_acceleration_linear_motion((4, 2), None) == (-MIN_ACCELERATION, 0)
+    vehicle = following((-20, 2)) # far ahead: no effect
+    assert vehicle.get_acceleration_linear_motion((4, 2), None) == (-MAX_ACCELERATION, 0)
+
+def test_right_turn_starts_at_the_zone():
+    ## a right turner behind its plan (already due past its entry) only turns once it gets to its zone
+    vehicle = make_vehicle(0, 1, (20, 2), (-10, 0))
+    vehicle.final_assignment = {(0, 0, 0): [3.0, -1, -1, -1]}
+    vehicle.tick = 1
+    waypt_loc, turning = vehicle.plan_acceleration()
+    assert vehicle.slot_id == 1 and waypt_loc == vehicle.get_plan()[1]["location"]
+    assert not turning
+    vehicle.location = (4.5, 2)
+    assert vehicle.plan_acceleration()[1]
+
+def test_left_turn_waypoints():
+    ## a left turn crosses three zones: every waypoint gets its time (sorted deadlines, the entry a
+    ## safety gap after the vehicles before it)
+    vehicle = make_vehicle(0, 3, (10, 2), (-10, 0))
+    vehicle.final_assignment = {(0, 0, 0): [1.0, 2.0, 3.0, -1]}
+    waypoints = vehicle.get_waypoints(CONFLICT_ZONES)
+    assert [waypoint["time"] for waypoint in waypoints] == [SAFETY_GAP, 1.0, 2.0, 3.0]
+    assert [waypoint["location"] for waypoint in waypoints] == [(4, 2.0), (0, 2.0), (-2.0, 0), (-2.0, -4)]
+
+def test_left_turner_steers_until_its_exit():
+    ## a left turner drives straight through its first zone and steers from its second zone on, up to
+    ## its exit (it overshot its lane when it stopped steering past the second waypoint)
+    vehicle = make_vehicle(0, 3, (10, 2), (-10, 0))
+    vehicle.final_assignment = {(0, 0, 0): [1.0, 2.0, 3.0, -1]}
+    assert not vehicle.plan_acceleration()[1]
+    vehicle.location, vehicle.tick = (2, 2), 0.5
+    turning = vehicle.plan_acceleration()[1]
+    assert vehicle.slot_id == 1 and not turning
+    vehicle.location, vehicle.tick = (-1, 1.5), 1.5
+    turning = vehicle.plan_acceleration()[1]
+    assert vehicle.slot_id == 2 and turning
+    vehicle.location, vehicle.tick = (-1.5, 1), 2.5
+    turning = vehicle.plan_acceleration()[1]
+    assert vehicle.slot_id == 3 and turning
+
+def test_leader_follows_the_previous_fleet_of_its_lane():
+    ## a leader brakes for the last vehicle of the fleet ahead on its lane, with or without the
+    ## streaming mode
+    bus = InprocBus(delivery="sync")
+    ahead = [Leader(bus.open_session(), (-10, 0), (10, 2), (0, 0), 0, 0, 0, 0.1, 2, 2),
+             Member(bus.open_session(), (-10, 0), (18, 2), (0, 0), 1, 0, 0, 2, 0.1)]
+    other_lane = Leader(bus.open_session(), (0, -10), (-2, 20), (0, 0), 0, 0, 1, 0.1, 3, 1)
+    leader = Leader(bus.open_session(), (-10, 0), (30, 2), (0, 0), 0, 1, 0, 0.1, 2, 1)
+    assert not leader.rolling
+    # the member reports to its leader, which publishes the snapshot of the fleet
+    ahead[1].pub_state()
+    ahead[0].sync_records()
+    for vehicle in [ahead[0], other_lane]:
+        vehicle.pub_state()
+    leader.sync_records()
+    assert set(leader.lane_states) == {(0, 0), (0, 1)}
+    assert leader.get_front_veh_state()["location"] == (18, 2)
+    # 12 m behind at 10 m/s: it brakes
+    leader.final_assignment = {(0, 1, 0): [9.0, 10.0, -1, -1]}
+    assert leader.plan_acceleration()[0] is not None
+    assert leader.acceleration[0] == -MIN_ACCELERATION
+    # the fleet ahead has crossed
+    for vehicle in reversed(ahead):
+        vehicle.finish = True
+        vehicle.pub_state()
+        ahead[0].sync_records()
+    leader.sync_records()
+    assert leader.lane_states == {}
+    assert leader.get_front_veh_state() is None
+
+def test_member_subscribes_to_the_fleets_ahead():
+    ## a member only takes the snapshots of the fleets with an earlier time slot in one of its zones
+    bus = InprocBus(delivery="sync")
+    member = Member(bus.open_session(), (-10, 0), (25, 2), (0, 0), 1, 1, 0, 2, 0.1)
+    assert member.fleet_subscribers == {}
+    # zones 0 then 1; lane 1 turning left (zones 1, 2) before it, lane 2 turning right (zone 2) and
+    # lane 3 going straight (zones 3, 0) after it
+    member.final_store.put((0, 1, 1), [4.0, 5.0, -1, -1])
+    member.final_store.put((0, 1, 0), [3.0, 4.0, -1, -1])
+    member.final_store.put((0, 0, 0), [1.0, 2.0, -1, -1])
+    member.final_store.put((1, 0, 0), [-1, 3.0, 3.5, -1])
+    member.final_store.put((2, 0, 0), [-1, -1, 1.0, -1])
+    member.final_store.put((3, 0, 0), [6.0, -1, -1, 5.0])
+    member.sync_records()
+    assert set(member.fleet_subscribers) == {(0, 0), (0, 1), (1, 0)}
+    for lane_id in range(4):
+        bus.put(f"fleet/{lane_id}/0", Codec.encode_fleet_state(lane_id, 0, [(0, {'location': (0, 0), 'velocity': (0, 0),
+            'acceleration': (0, 0), 'des_lane_id': (lane_id+2) % 4}, False)]))
+    member.sync_records()
+    assert set(member.fleet_store.data) == {(0, 0, 0), (1, 0, 0)}
+
+def state_at(x):
+    return {'location': (x, 2), 'velocity': (-10, 0), 'acceleration': (0, 0), 'des_lane_id': 2}
+
+def test_fleet_channel_rounds():
+    ## a round is complete when every vehicle of the fleet that has not crossed has reported
+    channel = FleetChannel(3)
+    assert not channel.report(1, state_at(25), False)
+    assert not channel.report(0, state_at(10), False)
+    assert channel.report(2, state_at(40), False)
+    assert channel.snapshot() == [(0, state_at(10), False), (1, state_at(25), False), (2, state_at(40), False)]
+    # the leader crosses: its finish completes the round with the others
+    assert not channel.report(0, state_at(-5), True)
+    assert not channel.report(2, state_at(39), False)
+    assert channel.report(1, state_at(24), False)
+    # then the round completes without it
+    assert not channel.report(1, state_at(23), False)
+    assert channel.report(2, state_at(38), False)
+    assert channel.snapshot() == [(0, state_at(-5), True), (1, state_at(23), False), (2, state_at(38), False)]
+    # the last vehicle alone
+    assert not channel.report(1, state_at(-5), True)
+    assert channel.report(2, state_at(37), False)
+    assert channel.report(2, state_at(36), False)
+
+def report_from(channel, vehicle_id, x, finish):
+    channel.report(vehicle_id, state_at(x), finish, False)
+
+def take_over(channel, leader_finished, results):
+    ## vehicle 1, once the leader has crossed
+    leader_finished.wait()
+    results.put((channel.report(1, state_at(23), False, True), channel.snapshot()))
+
+def test_fleet_queue_channel():
+    ## the reports of the other processes of the fleet come in the next snapshot of the first vehicle
+    channel = FleetQueueChannel(3)
+    leader_finished, results = Event(), Queue()
+    member = Process(target=take_over, args=(channel, leader_finished, results))
+    member.start()
+    for vehicle_id, x in [(1, 25), (2, 40)]:
+        process = Process(target=report_from, args=(channel, vehicle_id, x, False))
+        process.start()
+        process.join()
+    assert channel.report(0, state_at(10), False)
+    assert channel.snapshot() == [(0, state_at(10), False), (1, state_at(25), False), (2, state_at(40), False)]
+    # only what was reported since
+    assert channel.report(0, state_at(9), False)
+    assert channel.snapshot() == [(0, state_at(9), False)]
+    # the first vehicle publishes its finish once, then the next one takes over
+    assert channel.report(0, state_at(-5), True)
+    assert channel.snapshot() == [(0, state_at(-5), True)]
+    assert not channel.report(0, state_at(-6), True)
+    report_from(channel, 2, 38, False)
+    leader_finished.set()
+    assert results.get(timeout=10) == (True, [(1, state_at(23), False), (2, state_at(38), False)])
+    member.join()
+
+def test_propose_reuses_the_tree(staggered_states):
+    ## a leader searches on from its tree while the states of the group do not change
+    leader = Leader(InprocBus().open_session(), (-10, 0), (18, 2), (0, 0), 0, 0, 0, 0.1, 2, 1)
+    states = staggered_states(8, 2, random.Random(3))
+    for veh, state in states.items():
+        leader.group_state_store.put(veh, state)
+    leader.group_state_store.sync()
+    leader.propose(100, 1.2)
+    scheduler, root = leader.scheduler, leader.scheduler.root
+    assert leader.search_iterations == 100
+    leader.propose(250, 1.2)
+    assert leader.scheduler is scheduler and scheduler.root is root
+    assert leader.search_iterations == 150 and root.visits == 250
+    # done: the proposal is republished without searching, also after the same states again
+    proposal = leader.proposal
+    for veh, state in states.items():
+        leader.group_state_store.put(veh, dict(state))
+    leader.group_state_store.sync()
+    leader.propose(250, 1.2)
+    assert leader.search_iterations == 0 and leader.proposal is proposal
+    # a state changed: the same tree, searched again from scratch
+    veh = next(iter(states))
+    leader.group_state_store.put(veh, dict(states[veh], velocity=(-5, 0)))
+    leader.group_state_store.sync()
+    leader.propose(250, 1.2)
+    assert leader.scheduler is scheduler and scheduler.root is root
+    assert leader.search_iterations == 250 and root.visits == 250
+    # a vehicle more: a new tree
+    leader.group_state_store.put((3, 5, 0), dict(states[(3, 0, 0)], location=(2, -60)))
+    leader.group_state_store.sync()
+    leader.propose(10, 1.2)
+    assert leader.scheduler is not scheduler